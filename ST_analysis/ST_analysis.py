@@ -1,13 +1,22 @@
+import os
+import sys
 import matplotlib.pyplot as plt
 
-#Import input
-x = ['ST2', 'ST571', 'ST1411', 'ST164', 'ST1412']
-y = [6,2,1,1,1]
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from pipeline.mlst import SAMPLES_OUTPUT, ST_OUTPUT, st_frequency, update_samples
+
+#Import input: ST of every sample from mlst/*_mlst.tsv (only new or changed files are read again)
+table, _ = update_samples(os.path.join(HERE, "mlst"), os.path.join(HERE, SAMPLES_OUTPUT))
+frequency = st_frequency(table)
+frequency.to_csv(os.path.join(HERE, ST_OUTPUT), index=False)
+x = frequency["ST"].tolist()
+y = frequency["count"].tolist()
 #Visualization
 plt.bar(x,y)
 plt.xlabel("ST")
 plt.ylabel("Frequency")
 plt.title("Number of ST")
-plt.savefig("ST.png", dpi = 300)
+plt.savefig(os.path.join(HERE, "ST.png"), dpi = 300)
 
-plt.show()
\ No newline at end of file
+plt.show()
@@ -24,8 +24,13 @@ for file in "$INPUT_DIR"/ERR*.fasta; do
     
     echo "Processing: $file"
     
-    # Run MLST and extract columns 1 and 3 (filename and ST)
-    mlst --scheme abaumannii_2 "$file" | cut -f1,3 > "$output_file"
+    # Run MLST and extract columns 1 and 3 (filename and ST);
+    # MLST_FULL=1 keeps the scheme and allele profile, used by pipeline/mlst.py for clonal complexes
+    if [[ "${MLST_FULL:-0}" == "1" ]]; then
+        mlst --scheme abaumannii_2 "$file" > "$output_file"
+    else
+        mlst --scheme abaumannii_2 "$file" | cut -f1,3 > "$output_file"
+    fi
     
     echo "Output saved to: $output_file"
 done
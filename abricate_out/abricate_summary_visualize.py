@@ -1,12 +1,37 @@
+import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import seaborn as sns
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pipeline.abricate import read_abricate
+from pipeline.manifest import Manifest
+from pipeline.presence import PresenceMatrix
+from pipeline.reports import load_reports
+
 # Configuration - Change these paths as needed
+# CSV_FILE may also be a folder of *_vfdb.csv reports; the matrix is then built from them directly
 CSV_FILE = "Gene_Presence_Absence_Matrix.csv"
 OUTPUT_FILE = "gene_visualization.png"
 
+
+def load_matrix(path):
+    """
+    Read the presence/absence matrix, or build it from a folder of ABricate reports
+    """
+    if not os.path.isdir(path):
+        return pd.read_csv(path, index_col=0)
+    files = Manifest(path).refresh().files(tool="abricate")
+    hits, diagnostics = load_reports(files, reader=read_abricate, usecols=["GENE"])
+    for row in diagnostics[diagnostics["status"] == "error"].itertuples(index=False):
+        print(f"Skipping {row.path}: {row.error}")
+    hits = hits.dropna(subset=["GENE"])
+    ok = diagnostics.loc[diagnostics["status"] != "error", "sample"].tolist()
+    matrix = PresenceMatrix.from_pairs(hits["sample"].astype(str), hits["GENE"].str.strip(), sample_order=ok)
+    return matrix.to_frame()
+
 def visualize_gene_matrix():
     """
     Create visualization of gene presence/absence matrix
@@ -14,7 +39,7 @@ def visualize_gene_matrix():
     
     # Read the CSV file
     try:
-        df = pd.read_csv(CSV_FILE, index_col=0)
+        df = load_matrix(CSV_FILE)
         print(f"Loaded matrix with {df.shape[0]} samples and {df.shape[1]} genes")
     except Exception as e:
         print(f"Error reading CSV file: {e}")
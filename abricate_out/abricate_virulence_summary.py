@@ -1,12 +1,26 @@
 import os
+import sys
 import pandas as pd
 import argparse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pipeline.abricate import read_abricate
+from pipeline.cache import ReportCache
+from pipeline.filters import add_filter_arguments, filter_from_args, save_metadata
+from pipeline.incremental import load_state, merge_presence, plan_update, same_matrix, save_state, scan_states
+from pipeline.manifest import Manifest
+from pipeline.presence import PresenceMatrix
+
 # Step 1: Define argument parser
 parser = argparse.ArgumentParser(description="Tạo ma trận sự hiện diện/không hiện diện của gen độc lực từ các file CSV.")
 parser.add_argument("input_path", type=str, help="Đường dẫn đến thư mục chứa các file CSV")
 parser.add_argument("output_path", type=str, help="Đường dẫn file CSV output (bao gồm tên file và .csv)")
+parser.add_argument("--no-cache", action="store_true", help="Đọc lại mọi file, không dùng cache Parquet")
+parser.add_argument("--incremental", action="store_true", help="Chỉ đọc các file mới/thay đổi và cập nhật ma trận đã có")
+parser.add_argument("--verify", action="store_true", help="So sánh ma trận cập nhật với ma trận tạo lại toàn bộ")
+add_filter_arguments(parser, methods=False)
 args = parser.parse_args()
+hit_filter = filter_from_args(args)
 
 # Check if input folder exists
 if not os.path.exists(args.input_path):
@@ -33,20 +47,19 @@ if not args.output_path.lower().endswith('.csv'):
 
 print(f"Input path: {args.input_path}")
 print(f"Output path: {args.output_path}")
+print(f"Bộ lọc: {hit_filter.describe()}")
 
 # Step 2: Trích xuất tên gen từ tất cả các file
-all_gene_names = set()  # Lưu trữ tất cả các gen độc lực
-file_gene_mapping = {}  # Ánh xạ giữa tên file và danh sách gen
-
-# Duyệt qua tất cả các file trong thư mục
-csv_files_found = False
-for filename in os.listdir(args.input_path):
-    if filename.endswith(".csv"):  # Chỉ xử lý các file có đuôi .csv
-        csv_files_found = True
+report_cache = ReportCache(enabled=not args.no_cache)
+
+def extract_genes(file_names):
+    """Đọc các file CSV và trả về ánh xạ tên file -> tập gen"""
+    file_gene_mapping = {}  # Ánh xạ giữa tên file và danh sách gen
+    for filename in file_names:
         file_path = os.path.join(args.input_path, filename)
         
         try:
-            df = pd.read_csv(file_path)  # Đọc file CSV
+            df, _ = report_cache.load(file_path, read_abricate, usecols=["GENE"], hit_filter=hit_filter)  # Đọc report ABricate (hoặc lấy từ cache)
             
             # Kiểm tra xem cột 'GENE' có tồn tại không
             if 'GENE' not in df.columns:
@@ -58,7 +71,6 @@ for filename in os.listdir(args.input_path):
             gene_names = [gene.strip() for gene in gene_names if gene.strip()]  # Loại bỏ chuỗi rỗng
             
             if gene_names:  # Chỉ xử lý nếu có gen
-                all_gene_names.update(gene_names)  # Thêm vào tập hợp tất cả gen
                 file_gene_mapping[filename] = set(gene_names)  # Lưu ánh xạ
                 print(f"Đã xử lý '{filename}': {len(gene_names)} gen")
             else:
@@ -66,32 +78,61 @@ for filename in os.listdir(args.input_path):
                 
         except Exception as e:
             print(f"Lỗi khi đọc file '{filename}': {e}")
+    return file_gene_mapping
+
+def build_matrix(file_gene_mapping):
+    """Tạo ma trận sự hiện diện/không hiện diện (file x gen)"""
+    # Danh sách cặp (file, gen) -> ma trận bit nén, dựng một lần không cần vòng lặp lồng nhau
+    pairs = [(file_name, gene) for file_name, genes in file_gene_mapping.items() for gene in genes]
+    matrix = PresenceMatrix.from_pairs([p[0] for p in pairs], [p[1] for p in pairs],
+                                       sample_order=sorted(file_gene_mapping.keys()))
+    return matrix.to_frame()
+
+# Các file *_vfdb.csv trong thư mục input (lấy từ manifest, trừ chính file output)
+output_abspath = os.path.abspath(args.output_path)
+manifest = Manifest(args.input_path, enabled=not args.no_cache).refresh()
+csv_names = sorted(os.path.relpath(path, manifest.root) for path in manifest.files(tool="abricate")
+                   if os.path.abspath(path) != output_abspath)
 
-if not csv_files_found:
-    print("Không tìm thấy file CSV nào trong thư mục input.")
+if not csv_names:
+    print("Không tìm thấy file *_vfdb.csv nào trong thư mục input.")
     exit(1)
 
-if not file_gene_mapping:
+# Với --incremental chỉ đọc các file mới/thay đổi so với lần chạy trước
+states = scan_states(args.input_path, csv_names)
+previous = load_state(args.output_path, hit_filter.to_params()) if args.incremental else None
+if previous is None:
+    files_to_read, removed = csv_names, []
+else:
+    files_to_read, removed = plan_update(states, previous)
+    print(f"Cập nhật: {len(files_to_read)} file mới/thay đổi, {len(removed)} file đã xoá.")
+
+file_gene_mapping = extract_genes(files_to_read)
+
+if previous is None and not file_gene_mapping:
     print("Không có file nào được xử lý thành công.")
     exit(1)
 
 # Step 3: Tạo ma trận sự hiện diện/không hiện diện
-all_gene_names = sorted(all_gene_names)  # Sắp xếp tên gen
-file_names = sorted(file_gene_mapping.keys())  # Sắp xếp tên file
+presence_matrix = build_matrix(file_gene_mapping)
+if previous is not None:
+    old_matrix = pd.read_csv(args.output_path, index_col=0)
+    presence_matrix = merge_presence(old_matrix, presence_matrix, files_to_read + removed)
 
-print(f"Tạo ma trận với {len(file_names)} file và {len(all_gene_names)} gen...")
+print(f"Ma trận gồm {len(presence_matrix.index)} file và {len(presence_matrix.columns)} gen.")
 
-# Khởi tạo DataFrame với giá trị 0
-presence_matrix = pd.DataFrame(0, index=file_names, columns=all_gene_names, dtype=int)
-
-# Điền giá trị vào DataFrame
-for file_name, genes in file_gene_mapping.items():
-    for gene in genes:
-        presence_matrix.at[file_name, gene] = 1
+if args.verify:
+    full_matrix = build_matrix(extract_genes(csv_names))
+    if not same_matrix(presence_matrix, full_matrix):
+        print("Lỗi: ma trận cập nhật KHÁC với ma trận tạo lại toàn bộ; không ghi file output.")
+        exit(1)
+    print("Ma trận cập nhật giống hệt ma trận tạo lại toàn bộ.")
 
 # Step 4: Xuất ra file CSV
 try:
     presence_matrix.to_csv(args.output_path)
+    save_state(args.output_path, states, hit_filter.to_params())
+    save_metadata(args.output_path, hit_filter, files=len(presence_matrix.index))
     print(f"File CSV '{args.output_path}' đã được tạo thành công.")
     print(f"Kích thước ma trận: {presence_matrix.shape[0]} file x {presence_matrix.shape[1]} gen")
     
@@ -1,19 +1,35 @@
 import os
-import glob
+import sys
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 from collections import Counter
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pipeline.abricate import read_abricate
+from pipeline.cache import ReportCache
+from pipeline.filters import add_filter_arguments, filter_from_args, save_metadata
+from pipeline.manifest import Manifest
+from pipeline.reports import load_reports
+
+parser = argparse.ArgumentParser(description="Tỉ lệ file có mỗi gene độc lực (ABricate VFDB)")
+parser.add_argument("--no-cache", action="store_true", help="Đọc lại mọi file, không dùng cache Parquet")
+add_filter_arguments(parser, methods=False)
+args = parser.parse_args()
+
+# Bộ lọc %IDENTITY/%COVERAGE áp dụng ngay khi đọc từng file
+hit_filter = filter_from_args(args)
+
 # Thư mục chứa các thư mục SRR con, trong đó có file _vfdb.csv
 base_dir = "C:/Users/hoahoa/Documents/DSA_study/Thesis_project/abricate_out"
 
-# Pattern để tìm file
-pattern = os.path.join(base_dir, "**", "*_vfdb.csv")
+# Quét base_dir một lần bằng os.scandir (các thư mục con được quét song song);
+# danh sách file được cache, lần chạy sau chỉ quét lại các thư mục đã thay đổi
+manifest = Manifest(base_dir, enabled=not args.no_cache).refresh()
+print(f"Đã quét {base_dir}: {len(manifest.dirs)} thư mục ({manifest.listed} thư mục được quét lại)")
 
-print(f"Đang tìm kiếm với pattern: {pattern}")
-
-# Tìm tất cả file vfdb.csv với tìm kiếm đệ quy
-vfdb_files = glob.glob(pattern, recursive=True)
+# Tất cả file *_vfdb.csv trong base_dir và các thư mục con
+vfdb_files = manifest.files(suffix="_vfdb.csv")
 num_files = len(vfdb_files)
 print(f"Đã tìm thấy {num_files} file vfdb.csv")
 
@@ -28,154 +44,61 @@ if num_files > 0:
 if num_files == 0:
     print("⚠️ Không tìm thấy file nào. Đang kiểm tra thư mục...")
     
-    # Debug: Kiểm tra cấu trúc thư mục
-    if os.path.exists(base_dir):
+    # Debug: Kiểm tra cấu trúc thư mục (dùng kết quả quét ở trên, không quét lại)
+    if os.path.isdir(base_dir):
         print(f"✅ Thư mục base tồn tại: {base_dir}")
-        subdirs = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
+        subdirs = manifest.dirs.get(".", {}).get("subdirs", [])
         print(f"Các thư mục con: {subdirs[:5]}..." if len(subdirs) > 5 else f"Các thư mục con: {subdirs}")
         
-        # Thử tìm với pattern khác
-        alternative_patterns = [
-            os.path.join(base_dir, "**", "vfdb.csv"),
-            os.path.join(base_dir, "**", "*vfdb*"),
-            os.path.join(base_dir, "*", "*_vfdb.csv"),
-            os.path.join(base_dir, "*", "vfdb.csv")
-        ]
-        
-        print("\nThử các pattern khác:")
-        for alt_pattern in alternative_patterns:
-            alt_files = glob.glob(alt_pattern, recursive=True)
-            print(f"  Pattern: {alt_pattern}")
-            print(f"  Tìm được: {len(alt_files)} file")
-            if len(alt_files) > 0:
-                for f in alt_files[:3]:
-                    print(f"    - {f}")
-                if len(alt_files) > 3:
-                    print(f"    ... và {len(alt_files) - 3} file khác")
+        # Các file có tên gần giống
+        similar = sorted(os.path.join(base_dir, rel) for rel, _, _ in manifest.iter_files()
+                         if "vfdb" in os.path.basename(rel))
+        print(f"\nCác file có 'vfdb' trong tên: {len(similar)} file")
+        for f in similar[:3]:
+            print(f"    - {f}")
+        if len(similar) > 3:
+            print(f"    ... và {len(similar) - 3} file khác")
     else:
         print(f"❌ Thư mục base không tồn tại: {base_dir}")
     
     exit()
 
-# Define proper column names for abricate VFDB output
-# Based on the error output, the columns appear to be:
-column_names = [
-    'FILE', 'SEQUENCE', 'START', 'END', 'STRAND', 'GENE', 
-    'COVERAGE', 'COVERAGE_MAP', 'GAPS', 'PERCENT_COVERAGE', 
-    'PERCENT_IDENTITY', 'DATABASE', 'ACCESSION', 'PRODUCT', 'RESISTANCE'
-]
-
-gene_file_counter = Counter()
-success_files = 0
-failed_files = 0
+# Cache Parquet cho các file đã đọc; chạy với --no-cache để đọc lại toàn bộ
+report_cache = ReportCache(enabled=not args.no_cache)
 
 print(f"\nĐang xử lý {num_files} file...")
+print(f"Bộ lọc: {hit_filter.describe()}")
 
-for i, filepath in enumerate(vfdb_files, 1):
-    try:
-        # Hiển thị tiến trình
-        if i % 10 == 0 or i == num_files:
-            print(f"  Đang xử lý file {i}/{num_files}...")
-        
-        # Read CSV with header, but handle the # symbol and separator detection properly
-        # First, read the file and process the header line to detect separator
-        with open(filepath, 'r') as f:
-            first_line = f.readline().strip()
-            
-        # Detect separator by checking which one gives more columns
-        separator = '\t'  # default
-        if '\t' in first_line:
-            separator = '\t'
-        elif ',' in first_line:
-            separator = ','
-        else:
-            # Try both and see which gives more columns
-            try:
-                df_tab = pd.read_csv(filepath, sep='\t', nrows=1)
-                df_comma = pd.read_csv(filepath, sep=',', nrows=1)
-                if len(df_comma.columns) > len(df_tab.columns):
-                    separator = ','
-            except:
-                pass
-                
-        # Check if first line starts with # (header line)
-        if first_line.startswith('#'):
-            # Read with header, but skip the # symbol
-            df = pd.read_csv(filepath, sep=separator, header=0, comment=None)
-            # Clean the column names by removing the # symbol
-            df.columns = [col.replace('#', '') for col in df.columns]
-        else:
-            # Read without header and assign column names
-            df = pd.read_csv(filepath, sep=separator, header=None)
-            df.columns = column_names[:len(df.columns)]
-            
-        # Debug: Check if we have proper column separation
-        if len(df.columns) == 1 and ',' in df.columns[0]:
-            # The single column contains comma-separated values, try splitting
-            print(f"  🔄 Phát hiện columns không được tách đúng, thử lại với comma separator...")
-            df = pd.read_csv(filepath, sep=',', header=0, comment=None)
-            if first_line.startswith('#'):
-                df.columns = [col.replace('#', '') for col in df.columns]
-        
-        if df.empty:
-            print(f"⚠️ File rỗng: {filepath}")
-            failed_files += 1
-            continue
-            
-        if 'GENE' in df.columns:
-            genes_in_file = set(df['GENE'].dropna().astype(str))
-            # Filter out empty strings and very long strings
-            genes_in_file = {gene.strip() for gene in genes_in_file if gene.strip() and len(gene.strip()) < 50}
-            
-            if genes_in_file:
-                gene_file_counter.update(genes_in_file)
-                success_files += 1
-                print(f"  ✅ File {i}: Tìm được {len(genes_in_file)} gene: {list(genes_in_file)[:5]}...")
-            else:
-                failed_files += 1
-                print(f"  ⚠️ File {i}: Không tìm được gene nào sau khi lọc")
-        else:
-            print(f"⚠️ File {i}: Không có cột GENE. Các cột có sẵn: {list(df.columns)}")
-            failed_files += 1
-            
-    except pd.errors.EmptyDataError:
-        print(f"⚠️ File {i}: File rỗng hoặc chỉ có comment - {os.path.basename(filepath)}")
+# Mỗi file được nhận dạng định dạng (TSV/CSV, có/không header #FILE) một lần và đọc một lượt
+long_df, diagnostics = load_reports(vfdb_files, reader=read_abricate, usecols=["GENE"], hit_filter=hit_filter,
+                                    sample_fn=lambda path: path, cache=report_cache)
+
+# Lọc chuỗi rỗng và tên gene quá dài, mỗi gene chỉ đếm một lần cho mỗi file
+genes = long_df["GENE"].astype("string").str.strip()
+hits = long_df.assign(GENE=genes)[genes.notna() & (genes.str.len() > 0) & (genes.str.len() < 50)]
+hits = hits.drop_duplicates(["sample", "GENE"])
+genes_per_file = hits.groupby("sample", observed=True)["GENE"].agg(list)
+
+success_files = 0
+failed_files = 0
+for i, row in enumerate(diagnostics.itertuples(index=False), 1):
+    if row.status == "error":
+        print(f"❌ Lỗi đọc file {row.path}: {row.error}")
+        failed_files += 1
+    elif row.status == "empty" and (not hit_filter.active or read_abricate(row.path, usecols=["GENE"]).empty):
+        # Chỉ file không có dòng nào (trước khi lọc) mới tính là lỗi
+        print(f"⚠️ File rỗng: {row.path}")
         failed_files += 1
-    except Exception as e:
-        print(f"❌ Lỗi đọc file {filepath}: {e}")
-        # If still having issues, try more aggressive parsing
-        if len(df.columns) == 1 or 'GENE' not in df.columns:
-            try:
-                print(f"  🔄 Thử phương pháp parsing khác...")
-                # Try reading as text and parsing manually
-                with open(filepath, 'r') as f:
-                    lines = f.readlines()
-                
-                if len(lines) > 0:
-                    header_line = lines[0].strip()
-                    if header_line.startswith('#'):
-                        header_line = header_line[1:]  # Remove #
-                    
-                    # Try different separators
-                    for sep in ['\t', ',', ';', '|']:
-                        headers = header_line.split(sep)
-                        if 'GENE' in headers and len(headers) > 10:
-                            print(f"  ✅ Tìm thấy separator phù hợp: '{sep}' với {len(headers)} cột")
-                            df = pd.read_csv(filepath, sep=sep, header=0, comment=None)
-                            if header_line.startswith('#'):
-                                df.columns = [col.replace('#', '') for col in df.columns]
-                            break
-                    
-                if 'GENE' not in df.columns:
-                    print(f"  ❌ Vẫn không tìm được cột GENE sau khi thử tất cả separator")
-                    failed_files += 1
-                    continue
-                    
-            except Exception as parse_error:
-                print(f"  ❌ Lỗi parsing thủ công: {parse_error}")
-                failed_files += 1
-                continue
-            failed_files += 1
+    elif row.sample in genes_per_file.index:
+        genes_in_file = genes_per_file[row.sample]
+        success_files += 1
+        print(f"  ✅ File {i}: Tìm được {len(genes_in_file)} gene: {genes_in_file[:5]}...")
+    else:
+        # Chủng vẫn được tính vào mẫu số, với 0 gene
+        success_files += 1
+        print(f"  ⚠️ File {i}: Không còn gene nào sau khi lọc")
+
+gene_file_counter = Counter(hits["GENE"].tolist())
 
 print(f"✅ Đọc thành công {success_files} file, lỗi {failed_files} file")
 
@@ -204,6 +127,7 @@ for i, (_, row) in enumerate(df_plot.head(10).iterrows(), 1):
 # Lưu dữ liệu ra file CSV
 csv_output = "vfdb_gene_file_frequency.csv"
 df_plot.to_csv(csv_output, index=False)
+save_metadata(csv_output, hit_filter, files=success_files)
 print(f"✅ Đã lưu bảng thống kê (tỉ lệ file có gene): {csv_output}")
 
 # Vẽ biểu đồ cho top 20 gene
@@ -0,0 +1,116 @@
+"""Benchmark pipeline.abricate.read_abricate against the original VFDB reader.
+
+Usage:
+    python benchmarks/bench_abricate_reader.py [--copies 10000] [--workers 8]
+
+Replicates the abricate_out/*_vfdb.csv reports to ``--copies`` files in a
+temporary folder, then reads all of them with the reader that used to live
+in percent_abricate.py, with ``read_abricate`` sequentially, and with
+``load_reports(reader=read_abricate)`` on a thread pool. The gene sets of
+the legacy and new readers are compared and the throughputs printed.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from pipeline.abricate import read_abricate
+from pipeline.reports import load_reports
+
+COLUMN_NAMES = [
+    'FILE', 'SEQUENCE', 'START', 'END', 'STRAND', 'GENE',
+    'COVERAGE', 'COVERAGE_MAP', 'GAPS', 'PERCENT_COVERAGE',
+    'PERCENT_IDENTITY', 'DATABASE', 'ACCESSION', 'PRODUCT', 'RESISTANCE'
+]
+
+
+def legacy_read_vfdb(filepath):
+    """The separator/header sniffing reader that used to live in percent_abricate.py."""
+    with open(filepath, 'r') as f:
+        first_line = f.readline().strip()
+    separator = '\t'
+    if '\t' in first_line:
+        separator = '\t'
+    elif ',' in first_line:
+        separator = ','
+    else:
+        try:
+            df_tab = pd.read_csv(filepath, sep='\t', nrows=1)
+            df_comma = pd.read_csv(filepath, sep=',', nrows=1)
+            if len(df_comma.columns) > len(df_tab.columns):
+                separator = ','
+        except Exception:
+            pass
+    if first_line.startswith('#'):
+        df = pd.read_csv(filepath, sep=separator, header=0, comment=None)
+        df.columns = [col.replace('#', '') for col in df.columns]
+    else:
+        df = pd.read_csv(filepath, sep=separator, header=None)
+        df.columns = COLUMN_NAMES[:len(df.columns)]
+    if len(df.columns) == 1 and ',' in df.columns[0]:
+        df = pd.read_csv(filepath, sep=',', header=0, comment=None)
+        if first_line.startswith('#'):
+            df.columns = [col.replace('#', '') for col in df.columns]
+    return df
+
+
+def replicate(sources, copies, out_dir):
+    paths = []
+    for i in range(copies):
+        src = sources[i % len(sources)]
+        dst = os.path.join(out_dir, f"S{i:06d}_vfdb.csv")
+        shutil.copyfile(src, dst)
+        paths.append(dst)
+    return paths
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ABricate report readers")
+    parser.add_argument("--copies", type=int, default=10000, help="Number of report files to read")
+    parser.add_argument("--workers", type=int, default=None, help="Threads for load_reports")
+    args = parser.parse_args()
+
+    sources = sorted(glob.glob(os.path.join(ROOT, "abricate_out", "*_vfdb.csv")))
+    if not sources:
+        print("No abricate_out/*_vfdb.csv files found")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = replicate(sources, args.copies, tmp)
+        total_mb = sum(os.path.getsize(p) for p in paths) / 1e6
+        print(f"{len(paths)} reports ({len(sources)} distinct), {total_mb:.1f} MB")
+
+        legacy, legacy_frames = timed(lambda: [legacy_read_vfdb(p) for p in paths])
+        single, new_frames = timed(lambda: [read_abricate(p, usecols=["GENE"]) for p in paths])
+        pooled, (long_df, _) = timed(lambda: load_reports(paths, workers=args.workers,
+                                                         reader=read_abricate, usecols=["GENE"]))
+
+        for path, a, b in zip(paths, legacy_frames, new_frames):
+            if set(a["GENE"].dropna()) != set(b["GENE"].dropna()):
+                print(f"Genes differ for {os.path.basename(path)}")
+        if len(long_df) != sum(len(f) for f in legacy_frames):
+            print("load_reports row count differs from the legacy reader")
+
+    n = len(paths)
+    print(f"legacy read_vfdb         : {legacy:.2f} s ({n / legacy:.0f} files/s, {total_mb / legacy:.1f} MB/s)")
+    print(f"read_abricate            : {single:.2f} s ({n / single:.0f} files/s, {total_mb / single:.1f} MB/s)")
+    print(f"load_reports (threads)   : {pooled:.2f} s ({n / pooled:.0f} files/s, {total_mb / pooled:.1f} MB/s)")
+    print(f"speed-up single / pooled : {legacy / single:.1f}x / {legacy / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark pipeline.fasta.wrap_fasta against the original per-line writer.
+
+Usage:
+    python benchmarks/bench_fasta_wrap.py [--repeat 3]
+
+Runs both implementations on every ERR*/ERR*.chromosome.fasta in the
+repository, checks that the outputs are identical and prints the timings.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from pipeline.fasta import wrap_fasta
+
+
+def legacy_wrap_fasta(input_path, output_path, line_length=66):
+    """The wrap_fasta that used to live in platon_*_fasta_convert.py."""
+    with open(input_path, 'r') as infile, open(output_path, 'w') as outfile:
+        for line in infile:
+            line = line.strip()
+            if line.startswith(">"):
+                outfile.write(line + "\n")
+            else:
+                for i in range(0, len(line), line_length):
+                    outfile.write(line[i:i+line_length] + "\n")
+
+
+def best_of(func, files, out_dir, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in files:
+            func(path, os.path.join(out_dir, os.path.basename(path)))
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FASTA re-wrapping")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per implementation (best is kept)")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(ROOT, "ERR*", "ERR*.chromosome.fasta")))
+    if not files:
+        print("No ERR*/ERR*.chromosome.fasta files found")
+        return
+    total_mb = sum(os.path.getsize(f) for f in files) / 1e6
+    print(f"{len(files)} chromosome FASTA files, {total_mb:.1f} MB")
+
+    with tempfile.TemporaryDirectory() as legacy_dir, tempfile.TemporaryDirectory() as new_dir:
+        legacy = best_of(legacy_wrap_fasta, files, legacy_dir, args.repeat)
+        new = best_of(lambda i, o: wrap_fasta(i, o, index=False), files, new_dir, args.repeat)
+
+        for path in files:
+            name = os.path.basename(path)
+            with open(os.path.join(legacy_dir, name)) as a, open(os.path.join(new_dir, name)) as b:
+                if a.read() != b.read():
+                    print(f"Output differs for {name}")
+
+    print(f"legacy wrap_fasta : {legacy:.3f} s ({total_mb / legacy:.1f} MB/s)")
+    print(f"pipeline.fasta    : {new:.3f} s ({total_mb / new:.1f} MB/s)")
+    print(f"speed-up          : {legacy / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
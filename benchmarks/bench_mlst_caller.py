@@ -0,0 +1,127 @@
+"""Benchmark the in-process MLST caller, serial and with a worker pool.
+
+Usage:
+    python benchmarks/bench_mlst_caller.py [--scheme-dir DIR] [--fasta-dir DIR] [--workers 8]
+
+Without ``--fasta-dir`` the sample assemblies are rebuilt from the
+ERR*/ERR*.chromosome.fasta and ERR*/ERR*.plasmid.fasta files of the
+repository. Without ``--scheme-dir`` a synthetic seven-locus scheme is
+made from windows of the first assembly (allele 1, one locus on the
+reverse strand) plus single-substitution decoys of each, with ST1 = all
+allele 1, so that assembly must be typed ST1. With the real scheme the
+STs are compared with ST_analysis/mlst/*_mlst.tsv, and when ``mlst`` is on
+PATH the loop of mlst.sh is timed as well.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from bench_plasmid_typing import rebuild_assemblies
+from pipeline.mlst import read_reports, list_reports
+from pipeline.mlst_caller import MlstScheme, SCHEME, read_assembly, reverse_complement, type_assemblies
+from pipeline.plasmidtyping import list_assemblies
+
+LOCI = ["cpn60", "fusA", "gltA", "pyrG", "recA", "rplB", "rpoB"]
+ALLELE_LENGTH = 450
+DECOYS = 200
+
+
+def synthetic_scheme(fasta, out_dir, seed=0):
+    """Write a scheme of windows of ``fasta`` to ``out_dir/<SCHEME>``; return its folder."""
+    rng = random.Random(seed)
+    scheme_dir = os.path.join(out_dir, SCHEME)
+    os.makedirs(scheme_dir)
+    contig = max((seq for _, seq in read_assembly(fasta)), key=len)
+    step = len(contig) // (len(LOCI) + 1)
+    for index, locus in enumerate(LOCI):
+        allele = contig[(index + 1) * step:(index + 1) * step + ALLELE_LENGTH]
+        if index == 2:
+            allele = reverse_complement(allele)
+        with open(os.path.join(scheme_dir, f"{locus}.tfa"), "w") as handle:
+            handle.write(f">{locus}_1\n{allele.decode()}\n")
+            for number in range(2, DECOYS + 2):
+                pos = rng.randrange(ALLELE_LENGTH)
+                base = rng.choice([b for b in "ACGT" if b != chr(allele[pos])])
+                decoy = allele[:pos].decode() + base + allele[pos + 1:].decode()
+                handle.write(f">{locus}_{number}\n{decoy}\n")
+    with open(os.path.join(scheme_dir, f"{SCHEME}.txt"), "w") as handle:
+        handle.write("\t".join(["ST"] + LOCI + ["clonal_complex"]) + "\n")
+        for st in range(1, DECOYS + 2):
+            handle.write("\t".join([str(st)] + [str(st)] * len(LOCI) + [""]) + "\n")
+    return scheme_dir
+
+
+def legacy_mlst(paths, out_dir):
+    """The loop of mlst.sh (``mlst --scheme ... | cut -f1,3``)."""
+    os.makedirs(out_dir, exist_ok=True)
+    for path in paths:
+        sample = os.path.splitext(os.path.basename(path))[0]
+        result = subprocess.run(["mlst", "--scheme", SCHEME, path], check=True, capture_output=True, text=True)
+        with open(os.path.join(out_dir, f"{sample}_mlst.tsv"), "w") as handle:
+            handle.writelines("\t".join(line.split("\t")[:3:2]) + "\n" for line in result.stdout.splitlines())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark in-process MLST calling")
+    parser.add_argument("--scheme-dir", help=f"mlst scheme folder (db/pubmlst/{SCHEME}); synthetic by default")
+    parser.add_argument("--fasta-dir", help="Folder of <sample>.fasta assemblies")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs of each mode (best is kept)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fasta_dir = args.fasta_dir
+        if fasta_dir is None:
+            fasta_dir = os.path.join(tmp, "fasta")
+            os.makedirs(fasta_dir)
+            rebuild_assemblies(fasta_dir)
+        paths = list(list_assemblies(fasta_dir).values())
+        bases = sum(os.path.getsize(path) for path in paths)
+        scheme_dir = args.scheme_dir or synthetic_scheme(paths[0], tmp)
+
+        start = time.perf_counter()
+        scheme = MlstScheme.load(scheme_dir)
+        print(f"{len(paths)} assemblies ({bases / 1e6:.1f} MB), scheme {scheme.name}: {len(scheme.seqs)} alleles, "
+              f"loaded in {time.perf_counter() - start:.3f} s")
+
+        timings, results = {}, None
+        for name, workers in (("serial", 1), (f"pool ({args.workers} workers)", args.workers)):
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = type_assemblies(scheme, paths, workers)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        if shutil.which("mlst") and args.scheme_dir:
+            start = time.perf_counter()
+            legacy_mlst(paths, os.path.join(tmp, "legacy"))
+            timings["mlst.sh loop"] = time.perf_counter() - start
+
+        for path, (st, calls) in results.items():
+            print(f"  {os.path.basename(path)}: ST {st} " + " ".join(f"{l}({c})" for l, c in zip(scheme.loci, calls)))
+        if args.scheme_dir is None:
+            first = results[paths[0]][0]
+            print(f"synthetic scheme: {os.path.basename(paths[0])} typed ST{first} "
+                  f"({'ok' if first == '1' else 'expected ST1'})")
+        else:
+            reference_dir = os.path.join(ROOT, "ST_analysis", "mlst")
+            reference = read_reports(reference_dir, list_reports(reference_dir)).set_index("sample")["ST"]
+            same = sum(reference.get(os.path.splitext(os.path.basename(p))[0]) == st for p, (st, _) in results.items())
+            print(f"ST identical to ST_analysis/mlst for {same}/{len(results)} assemblies")
+
+        for name, seconds in timings.items():
+            print(f"{name:<22}: {seconds:.3f} s ({len(paths) / seconds:.1f} assemblies/s, "
+                  f"{bases / 1e6 / seconds:.1f} MB/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
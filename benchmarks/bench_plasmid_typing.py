@@ -0,0 +1,110 @@
+"""Benchmark per-sample ``blastn -subject`` typing against the indexed database modes.
+
+Usage:
+    python benchmarks/bench_plasmid_typing.py [--fasta-dir DIR] [--threads 8]
+
+Without ``--fasta-dir`` the sample assemblies are rebuilt from the
+ERR*/ERR*.chromosome.fasta and ERR*/ERR*.plasmid.fasta files of the
+repository. Runs the loop of run_plasmid_type.sh, then
+pipeline.plasmidtyping in ``cohort`` and ``panel`` mode and ``cohort`` with
+the k-mer prefilter (index build included in its time), prints the
+timings and compares the hits (query, subject, identity, length and
+coordinates; e-values depend on the search space and are not compared).
+Needs ``blastn`` and ``makeblastdb`` on PATH.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from pipeline.kmers import KmerIndex
+from pipeline.plasmidtyping import PERC_IDENTITY, REPORT_SUFFIX, list_assemblies, type_samples
+
+QUERY = os.path.join(ROOT, "plasmidtyping_out", "acinetobacterplasmidtype_feb2025.fasta")
+
+
+def rebuild_assemblies(out_dir):
+    for sample_dir in sorted(glob.glob(os.path.join(ROOT, "ERR*"))):
+        sample = os.path.basename(sample_dir)
+        parts = [os.path.join(sample_dir, f"{sample}.{c}.fasta") for c in ("chromosome", "plasmid")]
+        with open(os.path.join(out_dir, f"{sample}.fasta"), "w") as out:
+            for part in parts:
+                if os.path.exists(part):
+                    with open(part) as handle:
+                        shutil.copyfileobj(handle, out)
+
+
+def legacy_typing(assemblies, query, out_dir, threads):
+    """The loop of run_plasmid_type.sh."""
+    os.makedirs(out_dir, exist_ok=True)
+    for sample, fasta in assemblies.items():
+        subprocess.run(["blastn", "-query", query, "-subject", fasta, "-outfmt", "6",
+                        "-out", os.path.join(out_dir, f"{sample}{REPORT_SUFFIX}"),
+                        "-perc_identity", str(PERC_IDENTITY), "-num_threads", str(threads)],
+                       check=True, stderr=subprocess.DEVNULL)
+
+
+def hit_set(path):
+    with open(path) as handle:
+        return {tuple(line.split("\t")[:10]) for line in handle if line.strip()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark plasmid typing with and without a BLAST database")
+    parser.add_argument("--fasta-dir", help="Folder of <sample>.fasta assemblies")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    missing = [tool for tool in ("blastn", "makeblastdb") if shutil.which(tool) is None]
+    if missing:
+        print(f"{', '.join(missing)} not found on PATH")
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fasta_dir = args.fasta_dir
+        if fasta_dir is None:
+            fasta_dir = os.path.join(tmp, "fasta")
+            os.makedirs(fasta_dir)
+            rebuild_assemblies(fasta_dir)
+        assemblies = list_assemblies(fasta_dir)
+        print(f"{len(assemblies)} samples, panel {os.path.basename(QUERY)}, {args.threads} threads")
+
+        timings = {}
+        start = time.perf_counter()
+        legacy_typing(assemblies, QUERY, os.path.join(tmp, "legacy"), args.threads)
+        timings["per-sample -subject"] = time.perf_counter() - start
+        for mode in ("cohort", "panel"):
+            start = time.perf_counter()
+            type_samples(assemblies, QUERY, os.path.join(tmp, mode), mode, args.threads, work_dir=tmp)
+            timings[f"{mode} database"] = time.perf_counter() - start
+        start = time.perf_counter()
+        type_samples(assemblies, QUERY, os.path.join(tmp, "prefilter"), "cohort", args.threads, work_dir=tmp,
+                     prefilter=KmerIndex.from_fasta(QUERY))
+        timings["prefilter database"] = time.perf_counter() - start
+
+        for mode in ("cohort", "panel", "prefilter"):
+            differ = 0
+            for sample in assemblies:
+                name = f"{sample}{REPORT_SUFFIX}"
+                legacy = hit_set(os.path.join(tmp, "legacy", name))
+                new = hit_set(os.path.join(tmp, mode, name))
+                if legacy != new:
+                    differ += 1
+                    print(f"  {mode}: {sample} has {len(legacy - new)} missing / {len(new - legacy)} extra hits")
+            print(f"{mode} database: hits identical for {len(assemblies) - differ}/{len(assemblies)} samples")
+
+    base = timings["per-sample -subject"]
+    for name, seconds in timings.items():
+        print(f"{name:<20}: {seconds:.2f} s ({base / seconds:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,6 @@
+"""Shared helpers for the Acinetobacter baumannii genome analysis scripts.
+
+The per-tool folders (``chromosome_amrfinder``, ``plasmid_amrfinder``,
+``abricate_out`` ...) keep their stand-alone scripts; the reusable parsing
+and conversion logic lives here so every script reads the data the same way.
+"""
@@ -0,0 +1,86 @@
+"""ABricate report reader.
+
+ABricate writes the same 15 columns either tab separated (default) or comma
+separated (``--csv``), normally with a ``#FILE`` header line. ``read_abricate``
+looks at the first line once to decide the separator and whether there is a
+header, then parses the file in a single ``pd.read_csv`` call with fixed
+dtypes for the coordinates and percentages. An optional ``HitFilter`` drops
+low-identity/low-coverage hits before the frame is returned.
+"""
+
+import os
+from collections import namedtuple
+
+import pandas as pd
+
+from pipeline.filters import ABRICATE_FIELDS, NO_FILTER
+
+ABRICATE_COLUMNS = [
+    "FILE", "SEQUENCE", "START", "END", "STRAND", "GENE",
+    "COVERAGE", "COVERAGE_MAP", "GAPS", "%COVERAGE",
+    "%IDENTITY", "DATABASE", "ACCESSION", "PRODUCT", "RESISTANCE",
+]
+# Columns of ABricate releases before STRAND/RESISTANCE were added
+ABRICATE_COLUMNS_OLD = [c for c in ABRICATE_COLUMNS if c not in ("STRAND", "RESISTANCE")]
+
+DTYPES = {"START": "int64", "END": "int64", "%COVERAGE": "float64", "%IDENTITY": "float64"}
+
+REPORT_SUFFIX = "_vfdb.csv"
+
+Dialect = namedtuple("Dialect", ["sep", "names", "header"])
+
+
+def detect_dialect(path):
+    """Inspect the first line of ``path`` and return its ``Dialect``.
+
+    Raises:
+        ValueError: If the file is empty or does not look like an ABricate report.
+    """
+    with open(path, "r") as handle:
+        first_line = handle.readline().rstrip("\r\n")
+    if not first_line:
+        raise ValueError("empty file")
+
+    sep = "\t" if "\t" in first_line else ","
+    fields = first_line.split(sep)
+    if first_line.startswith("#") or "GENE" in fields:
+        names = [f.lstrip("#") for f in fields]
+        if "GENE" not in names:
+            raise ValueError("header has no GENE column")
+        return Dialect(sep, names, True)
+    if len(fields) == len(ABRICATE_COLUMNS):
+        return Dialect(sep, ABRICATE_COLUMNS, False)
+    if len(fields) == len(ABRICATE_COLUMNS_OLD):
+        return Dialect(sep, ABRICATE_COLUMNS_OLD, False)
+    raise ValueError(f"not an ABricate report ({len(fields)} columns, no header)")
+
+
+def read_abricate(path, usecols=None, hit_filter=NO_FILTER):
+    """Parse one ABricate report in a single pass.
+
+    Args:
+        path (str): ``abricate`` output (TSV or ``--csv``).
+        usecols (list[str] | None): Columns to keep, by ABricate name
+            without the leading ``#`` (``GENE``, ``%IDENTITY`` ...).
+        hit_filter (pipeline.filters.HitFilter): Minimum ``%IDENTITY`` /
+            ``%COVERAGE``; rejected rows are dropped right after parsing.
+
+    Returns:
+        pd.DataFrame: Typed report; ``START``/``END`` are integers and
+        ``%COVERAGE``/``%IDENTITY`` floats.
+    """
+    dialect = detect_dialect(path)
+    dtype = {c: DTYPES.get(c, "str") for c in dialect.names}
+    read_cols = usecols
+    if usecols is not None and hit_filter.active:
+        read_cols = list(dict.fromkeys(list(usecols) + hit_filter.columns(ABRICATE_FIELDS)))
+    df = pd.read_csv(path, sep=dialect.sep, header=None, names=dialect.names,
+                     skiprows=1 if dialect.header else 0, usecols=read_cols, dtype=dtype,
+                     keep_default_na=False, na_values=[""])
+    return hit_filter.apply(df, ABRICATE_FIELDS, usecols) if hit_filter.active else df
+
+
+def sample_name(path):
+    """``/x/ERR5770797_vfdb.csv`` -> ``ERR5770797``."""
+    name = os.path.basename(path)
+    return name[: -len(REPORT_SUFFIX)] if name.endswith(REPORT_SUFFIX) else os.path.splitext(name)[0]
@@ -0,0 +1,214 @@
+"""AMRFinderPlus report parsing and the Class/Subclass presence summary.
+
+Usage:
+    python -m pipeline.amrfinder --compartment chromosome
+    python -m pipeline.amrfinder --compartment genome -i amrfinder_out -o amrfinder_summary.csv
+
+The summary has one row per ``*_amrfinder.txt`` report and one column per
+``Class / Subclass`` pair: ``1`` if the pair occurs in the report, ``0`` if
+not and ``-`` if the report could not be read. The same engine serves the
+whole-genome (``amrfinder_out``), chromosome and plasmid folders.
+``--min-identity``, ``--min-coverage`` and ``--methods`` drop hits while the
+reports are parsed (e.g. ``--methods EXACTX ALLELEX BLASTX`` ignores
+partial hits); the filters used are recorded in ``<output>.meta.json``.
+"""
+
+import argparse
+import os
+
+import pandas as pd
+
+from pipeline.cache import ReportCache
+from pipeline.filters import AMRFINDER_FIELDS, NO_FILTER, add_filter_arguments, filter_from_args, save_metadata
+from pipeline.incremental import load_state, merge_presence, plan_update, same_matrix, save_state, scan_states
+from pipeline.manifest import report_names
+from pipeline.presence import PresenceMatrix
+from pipeline.reports import load_reports, read_report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_SUFFIX = "_amrfinder.txt"
+CLASS_COLUMNS = ["Class", "Subclass"]
+
+# Default input folder, output file and CSV encoding per compartment
+COMPARTMENTS = {
+    "genome": ("amrfinder_out", "amrfinder_summary.csv", "utf-8-sig"),
+    "chromosome": ("chromosome_amrfinder", "amrfinder_chromosome_summary.csv", "utf-8"),
+    "plasmid": ("plasmid_amrfinder", "amrfinder_plasmid_summary.csv", "utf-8"),
+}
+
+
+def list_reports(folder_path, suffix=REPORT_SUFFIX):
+    """Return the sorted report paths (relative to ``folder_path``) ending with ``suffix``, from the manifest."""
+    return report_names(folder_path, suffix)
+
+
+def read_amrfinder(path, usecols=None, dtype=None, hit_filter=NO_FILTER):
+    """Read one AMRFinderPlus report, keeping only the hits passing ``hit_filter``.
+
+    The filter columns are read along with ``usecols`` and dropped again
+    after filtering, before ``dtype`` is applied.
+    """
+    if not hit_filter.active:
+        return read_report(path, usecols=usecols, dtype=dtype)
+    read_cols = None if usecols is None else list(dict.fromkeys(list(usecols) + hit_filter.columns(AMRFINDER_FIELDS)))
+    df = hit_filter.apply(read_report(path, usecols=read_cols), AMRFINDER_FIELDS, usecols)
+    return df.astype(dtype) if dtype is not None else df
+
+
+def class_subclass(long_df):
+    """Return the ``Class / Subclass`` label of every row as a categorical Series.
+
+    Missing values become ``NA`` so ``NA / NA`` keeps its own column, as in
+    the original summaries.
+    """
+    parts = [long_df[c].astype(object).where(long_df[c].notna(), "NA").astype(str) for c in CLASS_COLUMNS]
+    return (parts[0] + " / " + parts[1]).astype("category")
+
+
+def presence_matrix(long_df, files, failed=()):
+    """Build the File x Class/Subclass matrix from a long ``File``/``Class_Subclass`` table.
+
+    Args:
+        long_df (pd.DataFrame): One row per hit with ``File`` and ``Class_Subclass``.
+        files (list[str]): All report names, in output order.
+        failed (iterable[str]): Reports that could not be parsed; their row is ``-``.
+
+    Returns:
+        pd.DataFrame: ``File`` column followed by the sorted class columns,
+        holding the strings ``'1'``, ``'0'`` or ``'-'``.
+    """
+    matrix = PresenceMatrix.from_pairs(long_df["File"].astype(str), long_df["Class_Subclass"].astype(str),
+                                       sample_order=list(files), failed=failed)
+    # Only classes seen in a readable report get a column
+    df = matrix.to_frame(present="1", absent="0", failed="-")
+    df.index.name = "File"
+    return df.reset_index()
+
+
+def load_class_table(paths, workers=None, cache=None, hit_filter=NO_FILTER):
+    """Read the Class/Subclass columns of ``paths`` concurrently, keeping hits passing ``hit_filter``.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Long table with ``File`` (report
+        file name) and ``Class_Subclass``, and the loader diagnostics.
+    """
+    long_df, diagnostics = load_reports(paths, workers=workers, sample_fn=os.path.basename, cache=cache,
+                                        reader=read_amrfinder, usecols=CLASS_COLUMNS, dtype="category",
+                                        hit_filter=hit_filter)
+    table = pd.DataFrame({"File": long_df["sample"], "Class_Subclass": class_subclass(long_df)})
+    return table, diagnostics
+
+
+def summarize_reports(folder_path, file_list, workers=None, cache=None, hit_filter=NO_FILTER):
+    """Return the presence matrix of ``file_list`` and the names of unreadable reports."""
+    paths = [os.path.join(folder_path, f) for f in file_list]
+    long_df, diagnostics = load_class_table(paths, workers, cache, hit_filter)
+    if diagnostics["cached"].any():
+        print(f"♻️ {int(diagnostics['cached'].sum())}/{len(paths)} file lấy từ cache")
+    errors = diagnostics[diagnostics["status"] == "error"]
+    for row in errors.itertuples():
+        print(f"⚠️ Bỏ qua file {row.sample}: {row.error}")
+    failed = errors["sample"].tolist()
+    return presence_matrix(long_df, file_list, failed), failed
+
+
+def summarize_folder(folder_path, suffix=REPORT_SUFFIX, workers=None, cache=None, hit_filter=NO_FILTER):
+    """Read every report in ``folder_path`` and return its presence matrix."""
+    matrix, _ = summarize_reports(folder_path, list_reports(folder_path, suffix), workers, cache, hit_filter)
+    return matrix
+
+
+def read_summary(output_file, encoding="utf-8"):
+    """Read a summary CSV written by ``main`` back as a File-indexed string matrix."""
+    return pd.read_csv(output_file, dtype=str, keep_default_na=False, encoding=encoding).set_index("File")
+
+
+def update_summary(folder_path, output_file, encoding="utf-8", workers=None, cache=None, hit_filter=NO_FILTER):
+    """Update an existing summary with only the new/changed reports of ``folder_path``.
+
+    Falls back to a full build when ``output_file`` has no state sidecar or
+    was written with other filters.
+
+    Returns:
+        tuple[pd.DataFrame, dict]: The summary (``File`` column first) and the
+        report states to record with ``save_state``.
+    """
+    file_list = list_reports(folder_path)
+    states = scan_states(folder_path, file_list)
+    previous = load_state(output_file, hit_filter.to_params())
+    if previous is None:
+        print("ℹ️ Chưa có trạng thái của lần chạy trước (hoặc bộ lọc đã đổi), tổng hợp toàn bộ.")
+        matrix, _ = summarize_reports(folder_path, file_list, workers, cache, hit_filter)
+        return matrix, states
+
+    to_read, removed = plan_update(states, previous)
+    print(f"🔁 Cập nhật: {len(to_read)} file mới/thay đổi, {len(removed)} file đã xoá.")
+    new, failed = summarize_reports(folder_path, to_read, workers, cache, hit_filter)
+    merged = merge_presence(read_summary(output_file, encoding), new.set_index("File"), to_read + removed,
+                            present="1", absent="0", failed_value="-", failed=failed)
+    return merged.reset_index(), states
+
+
+def build_parser(default_compartment=None):
+    parser = argparse.ArgumentParser(description='Tổng hợp Class/Subclass từ các file *_amrfinder.txt')
+    parser.add_argument('--compartment', choices=sorted(COMPARTMENTS), default=default_compartment or "genome",
+                        help='Bộ gen toàn phần (genome), nhiễm sắc thể (chromosome) hoặc plasmid')
+    parser.add_argument('--input', '-i', help='Đường dẫn tới folder chứa các file *_amrfinder.txt')
+    parser.add_argument('--output', '-o', help='Đường dẫn và tên file xuất kết quả (.csv)')
+    parser.add_argument('--workers', '-w', type=int, help='Số luồng đọc file song song (mặc định: tự động)')
+    parser.add_argument('--no-cache', action='store_true', help='Đọc lại mọi file, không dùng cache Parquet')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Chỉ đọc các file mới/thay đổi và cập nhật file output đã có')
+    parser.add_argument('--verify', action='store_true',
+                        help='Với --incremental: so sánh kết quả cập nhật với tổng hợp lại toàn bộ')
+    add_filter_arguments(parser)
+    return parser
+
+
+def main(argv=None, default_compartment=None):
+    args = build_parser(default_compartment).parse_args(argv)
+    default_folder, default_output, encoding = COMPARTMENTS[args.compartment]
+    folder_path = os.path.abspath(args.input or os.path.join(ROOT, default_folder))
+    output_file = os.path.abspath(args.output or os.path.join(folder_path, default_output))
+
+    if not os.path.isdir(folder_path):
+        print(f"❌ Thư mục không tồn tại: {folder_path}")
+        return 1
+
+    file_count = len(list_reports(folder_path))
+    if not file_count:
+        print(f"⚠️ Không tìm thấy file nào có hậu tố '{REPORT_SUFFIX}' trong thư mục.")
+        return 1
+    print(f"📁 Tìm thấy {file_count} file cần xử lý ({args.compartment}).")
+    hit_filter = filter_from_args(args)
+    if hit_filter.active:
+        print(f"🔎 Bộ lọc: {hit_filter.describe()}")
+
+    cache = ReportCache(enabled=not args.no_cache)
+    if args.incremental:
+        final_df, states = update_summary(folder_path, output_file, encoding, args.workers, cache, hit_filter)
+    else:
+        final_df = summarize_folder(folder_path, workers=args.workers, cache=cache, hit_filter=hit_filter)
+        states = scan_states(folder_path, list_reports(folder_path))
+
+    if args.verify:
+        full_df = summarize_folder(folder_path, workers=args.workers, cache=None, hit_filter=hit_filter)
+        if not same_matrix(final_df.set_index("File"), full_df.set_index("File")):
+            print("❌ Kết quả cập nhật KHÁC với tổng hợp toàn bộ; không ghi file output.")
+            return 1
+        print("✅ Kết quả cập nhật giống hệt tổng hợp toàn bộ.")
+
+    try:
+        final_df.to_csv(output_file, index=False, encoding=encoding)
+        save_state(output_file, states, hit_filter.to_params())
+        save_metadata(output_file, hit_filter, compartment=args.compartment, reports=len(states))
+        print(f"✅ Hoàn tất! Đã tạo file output: {output_file}")
+    except Exception as e:
+        print(f"❌ Lỗi khi lưu file output {output_file}: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
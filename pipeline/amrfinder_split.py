@@ -0,0 +1,230 @@
+"""Chromosome/plasmid AMRFinderPlus reports split from the whole-genome run.
+
+Usage:
+    python -m pipeline.amrfinder_split                      # -> amrfinder_split/{chromosome,plasmid}_amrfinder/
+    python -m pipeline.amrfinder_split --validate           # diff against the separate runs
+    python -m pipeline.amrfinder_split --consensus consensus_out/contig_consensus.csv
+
+Platon keeps the SPAdes contig names, so every hit of the whole-genome
+``amrfinder_out/<sample>_amrfinder.txt`` belongs to the compartment whose
+Platon FASTA holds its ``Contig id``. The report lines are copied
+unchanged (same header and columns) to
+``<output-root>/chromosome_amrfinder/<sample>_convert_chromosome_amrfinder.txt``
+and ``<output-root>/plasmid_amrfinder/<sample>_convert_plasmid_amrfinder.txt``,
+the names ``percent_amrfinder_*`` and ``pipeline.amrfinder --compartment``
+read. That replaces the two extra AMRFinder runs on the Platon FASTAs
+(``pipeline.scheduler --split-amrfinder`` does the same inside the job
+graph). With ``--consensus``, the ``pipeline.consensus`` labels are used
+instead of Platon's: ``plasmid`` contigs go to the plasmid report and all
+other contigs to the chromosome report.
+
+``--validate`` compares the split reports with the existing separate runs
+sample by sample, both on the hits (contig, coordinates, gene) and on the
+``Class / Subclass`` pairs the summaries count.
+"""
+
+import argparse
+import os
+
+import pandas as pd
+
+from pipeline.consensus import platon_calls
+from pipeline.manifest import Manifest, classify
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMPARTMENTS = ("chromosome", "plasmid")
+DEFAULT_GENOME_DIR = os.path.join(ROOT, "amrfinder_out")
+DEFAULT_OUTPUT_ROOT = os.path.join(ROOT, "amrfinder_split")
+# Output (and existing separate-run) folder and file name of each compartment
+OUTPUT_DIRS = {"chromosome": "chromosome_amrfinder", "plasmid": "plasmid_amrfinder"}
+REPORT_NAME = "{sample}_convert_{compartment}_amrfinder.txt"
+CONTIG_COLUMN = "Contig id"
+# Columns identifying a hit when comparing reports
+HIT_COLUMNS = ["Contig id", "Start", "Stop", "Strand", "Element symbol", "Class", "Subclass"]
+
+
+def report_path(root, sample, compartment):
+    return os.path.join(root, OUTPUT_DIRS[compartment], REPORT_NAME.format(sample=sample, compartment=compartment))
+
+
+def fasta_names(path):
+    """Record names of a FASTA file (first word of every header)."""
+    with open(path, "rb") as handle:
+        return {line[1:].split(None, 1)[0].decode() for line in handle if line.startswith(b">") and len(line) > 2}
+
+
+def split_report(report, contigs, outputs):
+    """Copy the hits of ``report`` to one report per compartment by contig membership.
+
+    Args:
+        report (str): Whole-genome ``*_amrfinder.txt``.
+        contigs (dict): ``{compartment: set of contig names}``.
+        outputs (dict): ``{compartment: output path}`` (any subset of ``contigs``).
+
+    Returns:
+        dict: Hits written per compartment, plus ``unassigned`` (contig in no compartment).
+    """
+    with open(report) as handle:
+        header = handle.readline()
+        lines = handle.readlines()
+    column = header.rstrip("\r\n").split("\t").index(CONTIG_COLUMN)
+    selected = {compartment: [] for compartment in outputs}
+    unassigned = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        contig = line.split("\t")[column]
+        owner = next((c for c, names in contigs.items() if contig in names), None)
+        if owner is None:
+            unassigned += 1
+        elif owner in selected:
+            selected[owner].append(line)
+    for compartment, path in outputs.items():
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as handle:
+            handle.write(header)
+            handle.writelines(selected[compartment])
+        os.replace(tmp, path)
+    counts = {compartment: len(rows) for compartment, rows in selected.items()}
+    counts["unassigned"] = unassigned
+    return counts
+
+
+def split_from_platon(report, platon_fastas, outputs):
+    """``split_report`` with the contigs of ``{compartment: Platon FASTA}`` (missing files = no contigs)."""
+    contigs = {c: fasta_names(path) if os.path.exists(path) else set() for c, path in platon_fastas.items()}
+    return split_report(report, contigs, outputs)
+
+
+def compartment_contigs(table, label_column="platon"):
+    """``{sample: {compartment: contigs}}`` of a ``platon_calls`` or ``pipeline.consensus`` table.
+
+    For a consensus table (``label_column="consensus"``) ``plasmid`` contigs
+    form the plasmid compartment and every other contig the chromosome.
+    """
+    labels = table[label_column].where(table[label_column] == "plasmid", "chromosome")
+    grouped = table.assign(_compartment=labels).groupby(["sample", "_compartment"])["contig"]
+    result = {}
+    for (sample, compartment), names in grouped:
+        result.setdefault(sample, {c: set() for c in COMPARTMENTS})[compartment] = set(names)
+    return result
+
+
+def split_cohort(genome_reports, contigs, output_root):
+    """Split every whole-genome report; return a table of hits per sample and compartment."""
+    rows = []
+    for path in genome_reports:
+        sample = classify(os.path.basename(path))[0]
+        if sample not in contigs:
+            rows.append({"sample": sample, "status": "no Platon contigs"})
+            continue
+        outputs = {c: report_path(output_root, sample, c) for c in COMPARTMENTS}
+        empty = [c for c in COMPARTMENTS if not contigs[sample][c]]
+        status = f"no {' / '.join(empty)} contigs" if empty else "ok"
+        rows.append({"sample": sample, "status": status, **split_report(path, contigs[sample], outputs)})
+    return pd.DataFrame(rows, columns=["sample", "status", *COMPARTMENTS, "unassigned"])
+
+
+def _hits(path):
+    return pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False, usecols=HIT_COLUMNS)
+
+
+def compare_reports(split_path, existing_path):
+    """Hits and ``Class / Subclass`` pairs only in the split or only in the existing report.
+
+    Returns:
+        dict: ``missing_hits``/``extra_hits`` (in the existing run only /
+        in the split only) and ``missing_classes``/``extra_classes``.
+    """
+    split, existing = _hits(split_path), _hits(existing_path)
+    split_keys = set(map(tuple, split[HIT_COLUMNS].to_numpy()))
+    existing_keys = set(map(tuple, existing[HIT_COLUMNS].to_numpy()))
+    split_classes = set(split["Class"] + " / " + split["Subclass"])
+    existing_classes = set(existing["Class"] + " / " + existing["Subclass"])
+    return {"missing_hits": sorted(existing_keys - split_keys), "extra_hits": sorted(split_keys - existing_keys),
+            "missing_classes": sorted(existing_classes - split_classes),
+            "extra_classes": sorted(split_classes - existing_classes)}
+
+
+def validate(output_root, existing_root, samples):
+    """Compare the split reports of ``samples`` with the separate runs under ``existing_root``.
+
+    Returns:
+        pd.DataFrame: One row per sample and compartment with the number of
+        hits in each, the differing hits and the differing classes.
+    """
+    rows = []
+    for sample in samples:
+        for compartment in COMPARTMENTS:
+            split_path = report_path(output_root, sample, compartment)
+            existing_path = report_path(existing_root, sample, compartment)
+            if not (os.path.exists(split_path) and os.path.exists(existing_path)):
+                rows.append((sample, compartment, None, None, "", "", "", "", "missing report"))
+                continue
+            diff = compare_reports(split_path, existing_path)
+            same = not any(diff.values())
+            rows.append((sample, compartment, len(_hits(split_path)), len(_hits(existing_path)),
+                         "; ".join(f"{h[4]}@{h[0]}:{h[1]}-{h[2]}" for h in diff["missing_hits"]),
+                         "; ".join(f"{h[4]}@{h[0]}:{h[1]}-{h[2]}" for h in diff["extra_hits"]),
+                         "; ".join(diff["missing_classes"]), "; ".join(diff["extra_classes"]),
+                         "identical" if same else ("same classes" if not diff["missing_classes"]
+                                                   and not diff["extra_classes"] else "different")))
+    return pd.DataFrame(rows, columns=["sample", "compartment", "split_hits", "existing_hits", "missing_hits",
+                                       "extra_hits", "missing_classes", "extra_classes", "status"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Tách báo cáo AMRFinder toàn bộ gen thành nhiễm sắc thể / plasmid")
+    parser.add_argument("--genome-dir", default=DEFAULT_GENOME_DIR, help="Thư mục chứa các file *_amrfinder.txt")
+    parser.add_argument("--platon-dir", default=ROOT, help="Thư mục chứa <sample>.{chromosome,plasmid}.fasta")
+    parser.add_argument("--consensus", help="Dùng nhãn của bảng pipeline.consensus thay cho Platon")
+    parser.add_argument("--output-root", "-o", default=DEFAULT_OUTPUT_ROOT,
+                        help="Thư mục ghi chromosome_amrfinder/ và plasmid_amrfinder/")
+    parser.add_argument("--validate", action="store_true", help="So sánh với các lần chạy AMRFinder riêng")
+    parser.add_argument("--existing-root", default=ROOT,
+                        help="Thư mục chứa chromosome_amrfinder/ và plasmid_amrfinder/ của lần chạy riêng")
+    parser.add_argument("--report", help="Với --validate: ghi bảng so sánh ra file CSV")
+    parser.add_argument("--no-cache", action="store_true", help="Không dùng danh sách file đã lưu")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.genome_dir):
+        print(f"❌ Thư mục không tồn tại: {args.genome_dir}")
+        return 1
+    genome = Manifest(args.genome_dir, enabled=not args.no_cache).refresh()
+    reports = [e.path for e in genome.entries if e.tool == "amrfinder" and e.compartment == "genome"]
+    if not reports:
+        print(f"⚠️ Không tìm thấy file *_amrfinder.txt trong {args.genome_dir}")
+        return 1
+
+    if args.consensus:
+        contigs = compartment_contigs(pd.read_csv(args.consensus, dtype=str, keep_default_na=False), "consensus")
+    else:
+        contigs = compartment_contigs(platon_calls(Manifest(args.platon_dir, enabled=not args.no_cache).refresh()))
+    table = split_cohort(reports, contigs, args.output_root)
+    print(table.to_string(index=False))
+    for row in table[table["status"] != "ok"].itertuples():
+        print(f"⚠️ {row.sample}: {row.status}")
+    if table["unassigned"].fillna(0).sum():
+        print(f"⚠️ {int(table['unassigned'].sum())} hit nằm trên contig không có trong danh sách contig")
+    print(f"📁 Đã ghi vào {args.output_root}")
+
+    if args.validate:
+        samples = table.loc[table["status"] != "no Platon contigs", "sample"]
+        result = validate(args.output_root, args.existing_root, samples)
+        print(result[["sample", "compartment", "split_hits", "existing_hits", "status"]].to_string(index=False))
+        differing = result[result["status"] != "identical"]
+        for row in differing.itertuples():
+            print(f"  {row.sample} {row.compartment}: {row.status}; chỉ có ở lần chạy riêng: "
+                  f"{row.missing_hits or '-'}; chỉ có ở bản tách: {row.extra_hits or '-'}")
+        if args.report:
+            result.to_csv(args.report, index=False)
+        print(f"✅ {len(result) - len(differing)}/{len(result)} báo cáo giống hệt lần chạy riêng")
+        return 1 if (differing["status"] == "different").any() else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+"""Antibiogram tables (R/I/S calls and MIC values) as isolate x drug matrices.
+
+The sheets in ``Statistic_RS_dataset`` (``11chung_RS.csv``,
+``11chung_MIC.csv``) have two title rows (drug class, full drug name), a
+header row with the drug abbreviations (``No, Commn Name, CIP, LEV ...``)
+and one row per isolate. ``read_block`` locates the header row and returns
+the isolate x drug block as strings plus a table of the drugs;
+``encode_ris`` and ``parse_mic`` then convert the whole block at once:
+the cells are factorized, only the distinct strings (a handful per sheet)
+are parsed, and the results are mapped back with one array lookup.
+"""
+
+import numpy as np
+import pandas as pd
+
+# A cell of the header row (the drug abbreviations)
+HEADER_MARKER = "CIP"
+# Resistance level of each call: S = 0, I = 1, R = 2 (anything else is NaN)
+RIS_LEVELS = ["S", "I", "R"]
+
+# Censoring of a MIC value: the true MIC is <= (-1), = (0) or >= (1) the value
+LEFT_CENSORED, EXACT, RIGHT_CENSORED = -1, 0, 1
+MIC_OPERATORS = {"<=": LEFT_CENSORED, "<": LEFT_CENSORED, "=": EXACT, "": EXACT,
+                 ">=": RIGHT_CENSORED, ">": RIGHT_CENSORED}
+# Optional operator, the value, and for combinations (e.g. ``>4/76``) the partner drug concentration
+MIC_PATTERN = (r"^\s*(?P<op><=|>=|<|>|=)?\s*(?P<value>\d+(?:\.\d*)?|\.\d+)"
+               r"\s*(?:/\s*(?P<partner>\d+(?:\.\d*)?|\.\d+))?\s*$")
+
+
+def read_block(path, marker=HEADER_MARKER):
+    """Read an antibiogram sheet.
+
+    Args:
+        path (str): CSV with title rows, the abbreviation header row and one row per isolate.
+        marker (str): Text found in the header row (and in no title row).
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The isolate x drug block of raw
+        strings (index = isolate name, columns = abbreviations) and one row
+        per drug (``abbreviation``, ``name``, ``class``; class cells left
+        empty by merged spreadsheet cells are filled forward).
+
+    Raises:
+        ValueError: If no row contains ``marker``.
+    """
+    raw = pd.read_csv(path, header=None, dtype=str, keep_default_na=False, na_values=[""],
+                      encoding="utf-8-sig")
+    raw = raw.dropna(axis=1, how="all").dropna(axis=0, how="all").reset_index(drop=True)
+
+    is_header = raw.apply(lambda col: col.str.contains(marker, regex=False, na=False)).any(axis=1)
+    if not is_header.any():
+        raise ValueError(f"{path}: no header row containing {marker!r}")
+    row = int(is_header.idxmax())
+    header = raw.iloc[row]
+    drug_columns = [c for c in raw.columns[2:] if pd.notna(header[c])]
+    abbreviations = header[drug_columns].str.strip().tolist()
+
+    def title(offset):
+        if row - offset < 0:
+            return pd.Series([None] * len(drug_columns), dtype=object)
+        return raw.iloc[row - offset][drug_columns].str.strip().reset_index(drop=True)
+
+    drugs = pd.DataFrame({"abbreviation": abbreviations, "name": title(1), "class": title(2).ffill()})
+
+    data = raw.iloc[row + 1:]
+    data = data[data[raw.columns[1]].notna()]
+    block = data[drug_columns].copy()
+    block.index = pd.Index(data[raw.columns[1]].str.strip(), name="isolate")
+    block.columns = pd.Index(abbreviations, name="drug")
+    return block, drugs
+
+
+def _factorize(block):
+    """Return ``(codes, uniques)``: per-cell index (row-major) into the distinct cell strings."""
+    codes, uniques = pd.factorize(block.to_numpy().ravel(), use_na_sentinel=False)
+    return codes, pd.Series(uniques, dtype="string")
+
+
+def encode_ris(block):
+    """Map R/I/S calls to 2/1/0 (case and surrounding spaces ignored, other values NaN).
+
+    Returns:
+        pd.DataFrame: Float matrix with the labels of ``block``.
+    """
+    cells, uniques = _factorize(block)
+    codes = pd.Categorical(uniques.str.strip().str.upper(), categories=RIS_LEVELS).codes
+    levels = np.where(codes < 0, np.nan, codes)[cells].reshape(block.shape)
+    return pd.DataFrame(levels, index=block.index, columns=block.columns)
+
+
+def parse_mic(block):
+    """Parse MIC cells such as ``<=0.25``, ``=64``, ``>4/76``.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: MIC values in mg/L (float, NaN when
+        unparseable; for combinations the first drug's concentration) and the
+        censoring (``LEFT_CENSORED``/``EXACT``/``RIGHT_CENSORED`` as nullable
+        ``Int8``), both with the labels of ``block``.
+    """
+    cells, uniques = _factorize(block)
+    parts = uniques.str.extract(MIC_PATTERN)
+    values = pd.to_numeric(parts["value"]).to_numpy(dtype=float)[cells].reshape(block.shape)
+    censor = parts["op"].fillna("").map(MIC_OPERATORS).where(parts["value"].notna()).astype("Int8")
+    censor = pd.DataFrame(censor.array.take(cells).reshape(block.shape), index=block.index,
+                          columns=block.columns)
+    return pd.DataFrame(values, index=block.index, columns=block.columns), censor
+
+
+def read_ris(path, marker=HEADER_MARKER):
+    """Return the encoded R/I/S matrix of ``path`` and its drug table."""
+    block, drugs = read_block(path, marker)
+    return encode_ris(block), drugs
+
+
+def read_mic(path, marker=HEADER_MARKER):
+    """Return ``(values, censoring, drugs)`` of a MIC sheet."""
+    block, drugs = read_block(path, marker)
+    values, censor = parse_mic(block)
+    return values, censor, drugs
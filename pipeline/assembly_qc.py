@@ -0,0 +1,193 @@
+"""Assembly QC table (N50, GC, coverage) of a cohort without running QUAST.
+
+Usage:
+    python -m pipeline.assembly_qc --fasta-dir /home/kien1211/Downloads/fasta
+    python -m pipeline.assembly_qc --fasta-dir ... --flagged-list flagged.txt   # samples for full QUAST
+
+``quast.sh`` runs a reference-based QUAST per sample. For routine triage
+only the contig statistics are needed: each FASTA is read once into a
+``uint8`` array, header bytes are masked with a cumulative sum over the
+line-initial ``>`` and header-ending newline positions, and the per-contig length,
+GC and N counts are ``np.bincount`` calls over the contig index of every
+base. The SPAdes k-mer coverage comes from the headers
+(``NODE_1_length_222551_cov_47.006425``). Like QUAST, the summary only
+counts contigs of at least ``min_contig`` bases (500). Samples are
+processed in parallel. A sample is flagged when a metric falls outside
+``QC_LIMITS``, and only flagged samples need a full QUAST run
+(``pipeline.scheduler --quast-flagged-only``).
+"""
+
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pipeline.plasmidtyping import DEFAULT_FASTA_DIR, list_assemblies
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_OUTPUT = os.path.join(ROOT, "quast_out", "assembly_qc.csv")
+MIN_CONTIG = 500
+# Contig size classes counted per sample (QUAST's "# contigs (>= N bp)")
+SIZE_CLASSES = [1000, 5000, 10000, 25000, 50000]
+# Metric -> (minimum, maximum) accepted for an A. baumannii assembly; None = no bound
+QC_LIMITS = {
+    "total_length": (3.6e6, 4.6e6),
+    "contigs": (None, 300),
+    "N50": (20000, None),
+    "GC": (37.5, 41.0),
+    "N_per_100kbp": (None, 100),
+    "mean_coverage": (30, None),
+}
+COVERAGE_PATTERN = re.compile(r"_cov_([0-9.]+)")
+
+# Byte class: 0 = A/T, 1 = G/C, 2 = other sequence letter (N, IUPAC), 3 = not a base (newline, CR, space)
+_CLASS = np.full(256, 3, dtype=np.uint8)
+for _letter in range(ord("A"), ord("Z") + 1):
+    _CLASS[_letter] = _CLASS[_letter + 32] = 2
+for _base, _value in ((b"A", 0), (b"T", 0), (b"G", 1), (b"C", 1)):
+    _CLASS[_base[0]] = _CLASS[_base[0] + 32] = _value
+
+
+def contig_table(path):
+    """Per-contig statistics of one FASTA.
+
+    Returns:
+        pd.DataFrame: ``contig``, ``length``, ``gc`` (G+C count), ``n``
+        (non-ACGT letters) and ``coverage`` (from the SPAdes header, NaN
+        when absent), in file order.
+    """
+    data = np.fromfile(path, dtype=np.uint8)
+    # A record starts with ">" at the beginning of a line; ">" inside a header is part of it
+    is_start = data == ord(">")
+    is_start[1:] &= data[:-1] == ord("\n")
+    starts = np.flatnonzero(is_start)
+    newlines = np.flatnonzero(data == ord("\n"))
+    slot = np.searchsorted(newlines, starts)
+    header_ends = np.where(slot < len(newlines), newlines[np.minimum(slot, len(newlines) - 1)], len(data))
+
+    marker = np.zeros(len(data) + 1, dtype=np.int32)
+    np.add.at(marker, starts, 1)
+    np.add.at(marker, header_ends, -1)
+    contig = np.cumsum(is_start, dtype=np.int32) - 1
+    classes = _CLASS[data]
+    is_base = (np.cumsum(marker[:-1]) == 0) & (contig >= 0) & (classes < 3)
+
+    index, classes = contig[is_base], classes[is_base]
+    n = len(starts)
+    lengths = np.bincount(index, minlength=n)
+    gc = np.bincount(index[classes == 1], minlength=n)
+    ns = np.bincount(index[classes == 2], minlength=n)
+
+    names = [bytes(data[s + 1:e]).decode(errors="replace").split(None, 1)[0] if e > s + 1 else ""
+             for s, e in zip(starts, header_ends)]
+    coverage = [float(m.group(1)) if (m := COVERAGE_PATTERN.search(name)) else np.nan for name in names]
+    return pd.DataFrame({"contig": names, "length": lengths, "gc": gc, "n": ns, "coverage": coverage})
+
+
+def nx(lengths, fraction):
+    """Return ``(Nx, Lx)`` of contig lengths: the contig reaching ``fraction`` of the total, and its rank."""
+    ordered = np.sort(np.asarray(lengths))[::-1]
+    if not len(ordered):
+        return 0, 0
+    rank = int(np.searchsorted(np.cumsum(ordered), fraction * ordered.sum()))
+    return int(ordered[rank]), rank + 1
+
+
+def summarize(contigs, min_contig=MIN_CONTIG):
+    """Assembly statistics of a ``contig_table`` over contigs of at least ``min_contig`` bases."""
+    kept = contigs[contigs["length"] >= min_contig]
+    lengths = kept["length"].to_numpy()
+    total = int(lengths.sum())
+    acgt = total - int(kept["n"].sum())
+    n50, l50 = nx(lengths, 0.5)
+    n90, l90 = nx(lengths, 0.9)
+    covered = kept[kept["coverage"].notna()]
+    stats = {
+        "contigs_all": len(contigs), "length_all": int(contigs["length"].sum()),
+        "contigs": len(kept), "total_length": total, "largest_contig": int(lengths.max()) if total else 0,
+        "N50": n50, "L50": l50, "N90": n90, "L90": l90,
+        "GC": round(100 * kept["gc"].sum() / acgt, 2) if acgt else np.nan,
+        "N_per_100kbp": round(1e5 * kept["n"].sum() / total, 2) if total else np.nan,
+        "mean_coverage": round(float(np.average(covered["coverage"], weights=covered["length"])), 2)
+        if len(covered) else np.nan,
+        "median_coverage": round(float(covered["coverage"].median()), 2) if len(covered) else np.nan,
+    }
+    for size in SIZE_CLASSES:
+        stats[f"contigs_ge_{size}"] = int((lengths >= size).sum())
+    return stats
+
+
+def _sample_stats(item):
+    sample, path, min_contig = item
+    return {"sample": sample, **summarize(contig_table(path), min_contig)}
+
+
+def qc_flags(table, limits=None):
+    """Return the out-of-range metrics of every row, ``;``-joined (empty when all pass)."""
+    limits = QC_LIMITS if limits is None else limits
+    failed = pd.DataFrame(index=table.index)
+    for metric, (low, high) in limits.items():
+        values = table[metric]
+        bad = values.isna()
+        if low is not None:
+            bad |= values < low
+        if high is not None:
+            bad |= values > high
+        failed[metric] = bad
+    return failed.apply(lambda row: ";".join(row.index[row]), axis=1) if len(failed) else pd.Series(dtype=str)
+
+
+def qc_table(assemblies, min_contig=MIN_CONTIG, workers=1, limits=None):
+    """QC statistics of every assembly of ``{sample: path}``, with a ``flags`` column.
+
+    Returns:
+        pd.DataFrame: One row per sample.
+    """
+    items = [(sample, path, min_contig) for sample, path in assemblies.items()]
+    if workers > 1 and len(items) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(items))) as pool:
+            rows = list(pool.map(_sample_stats, items))
+    else:
+        rows = [_sample_stats(item) for item in items]
+    table = pd.DataFrame(rows)
+    if not table.empty:
+        table["flags"] = qc_flags(table, limits)
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Assembly QC statistics (N50, GC, coverage) for all samples")
+    parser.add_argument("--fasta-dir", default=DEFAULT_FASTA_DIR, help="Folder of <sample>.fasta assemblies")
+    parser.add_argument("--output", "-o", default=DEFAULT_OUTPUT, help="QC table to write (CSV)")
+    parser.add_argument("--min-contig", type=int, default=MIN_CONTIG, help="Ignore shorter contigs (QUAST: 500)")
+    parser.add_argument("--workers", "-j", type=int, default=os.cpu_count() or 1, help="Samples processed in parallel")
+    parser.add_argument("--flagged-list", help="Write the FASTA paths of flagged samples here, one per line")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.fasta_dir):
+        print(f"❌ Thư mục không tồn tại: {args.fasta_dir}")
+        return 1
+    assemblies = list_assemblies(args.fasta_dir)
+    if not assemblies:
+        print(f"❌ Không có file .fasta trong {args.fasta_dir}")
+        return 1
+
+    table = qc_table(assemblies, args.min_contig, args.workers)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    table.to_csv(args.output, index=False)
+    columns = ["sample", "contigs", "total_length", "N50", "L50", "GC", "mean_coverage", "flags"]
+    print(table[columns].to_string(index=False))
+    flagged = table[table["flags"] != ""]
+    print(f"📁 Đã ghi {args.output}: {len(table)} mẫu, {len(flagged)} mẫu cần chạy QUAST đầy đủ")
+    if args.flagged_list:
+        with open(args.flagged_list, "w") as handle:
+            handle.writelines(f"{assemblies[sample]}\n" for sample in flagged["sample"])
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
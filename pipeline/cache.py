@@ -0,0 +1,152 @@
+"""Parquet cache of parsed reports, keyed by file path, size and mtime.
+
+Re-running a summary after adding a few isolates should only parse the new
+reports. ``ReportCache.load(path, reader, **params)`` returns the cached
+DataFrame when the file (path + size + mtime, or content hash) and the
+reader parameters are unchanged, and otherwise calls ``reader`` and stores
+the result.
+
+Layout: ``<cache_dir>/<hash of path>/<hash of reader+params>-<hash of file state>.parquet``.
+Writing a new entry removes older entries for the same file and parameters,
+and ``evict`` trims the cache to ``max_bytes`` by removing the least
+recently used entries. The cache is disabled when pyarrow is not installed
+or when ``PIPELINE_NO_CACHE`` is set.
+"""
+
+import hashlib
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bump when the on-disk format of cached frames changes
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.environ.get("PIPELINE_CACHE_DIR", os.path.join(ROOT, ".cache", "reports"))
+DEFAULT_MAX_BYTES = int(float(os.environ.get("PIPELINE_CACHE_MAX_MB", 1024)) * 1024 * 1024)
+
+
+def _digest(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-1 of the file contents."""
+    h = hashlib.sha1()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ReportCache:
+    """Parquet-backed cache of ``reader(path, **params)`` results.
+
+    Args:
+        cache_dir (str): Folder holding the cache entries.
+        max_bytes (int): Size cap enforced by ``evict``.
+        enabled (bool): False turns every lookup into a plain ``reader`` call.
+        hash_content (bool): Key on the file contents instead of size/mtime,
+            for file systems with unreliable timestamps.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True, hash_content=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hash_content = hash_content
+        self.enabled = bool(enabled) and HAS_PYARROW and not os.environ.get("PIPELINE_NO_CACHE")
+
+    def _entry(self, path, reader, params):
+        """Return (entry folder, params prefix, entry file) for ``path``."""
+        abspath = os.path.abspath(path)
+        st = os.stat(abspath)
+        state = file_digest(abspath) if self.hash_content else (st.st_size, st.st_mtime_ns)
+        reader_name = f"{getattr(reader, '__module__', '')}.{getattr(reader, '__qualname__', repr(reader))}"
+        prefix = _digest(CACHE_VERSION, reader_name, sorted(params.items()))
+        folder = os.path.join(self.cache_dir, _digest(abspath))
+        return folder, prefix, os.path.join(folder, f"{prefix}-{_digest(st.st_size, state)}.parquet")
+
+    def get(self, path, reader, **params):
+        """Return the cached frame for ``path`` or None on a miss."""
+        if not self.enabled:
+            return None
+        try:
+            _, _, entry = self._entry(path, reader, params)
+            df = pd.read_parquet(entry)
+        except Exception:
+            return None
+        try:
+            os.utime(entry)  # mark as recently used
+        except OSError:
+            pass
+        return df
+
+    def put(self, path, df, reader, **params):
+        """Store ``df`` for ``path``, dropping stale entries of the same file and params."""
+        if not self.enabled:
+            return
+        try:
+            folder, prefix, entry = self._entry(path, reader, params)
+            os.makedirs(folder, exist_ok=True)
+            tmp = f"{entry}.{os.getpid()}.tmp"
+            df.to_parquet(tmp)
+            os.replace(tmp, entry)
+            for name in os.listdir(folder):
+                if name.startswith(prefix) and os.path.join(folder, name) != entry:
+                    os.remove(os.path.join(folder, name))
+        except Exception:
+            # A cache that cannot be written is just a cache miss next time
+            pass
+
+    def load(self, path, reader, **params):
+        """Return ``(df, hit)``: the cached frame, or ``reader(path, **params)`` stored for next time."""
+        df = self.get(path, reader, **params)
+        if df is not None:
+            return df, True
+        df = reader(path, **params)
+        self.put(path, df, reader, **params)
+        return df, False
+
+    def invalidate(self, path):
+        """Remove every cached entry for ``path``."""
+        shutil.rmtree(os.path.join(self.cache_dir, _digest(os.path.abspath(path))), ignore_errors=True)
+
+    def clear(self):
+        """Remove the whole cache folder."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def evict(self, max_bytes=None):
+        """Delete least recently used entries until the cache fits in ``max_bytes``.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        entries = []
+        for folder in os.scandir(self.cache_dir):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry_path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
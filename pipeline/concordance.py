@@ -0,0 +1,185 @@
+"""Genotype-phenotype concordance of AMRFinder classes with the R/I/S antibiogram.
+
+Usage:
+    python -m pipeline.concordance
+    python -m pipeline.concordance --summary chromosome_amrfinder/amrfinder_chromosome_summary.csv \
+        --intermediate resistant -o concordance.csv
+
+``DRUG_CLASSES`` says which AMRFinder ``Class / Subclass`` columns predict
+resistance to each antibiotic of ``11chung_RS.csv``. ``drug_mapping`` turns
+it into a boolean class x drug matrix (memoized per set of summary
+columns), so the predicted isolate x drug resistance of a whole cohort is
+one boolean matrix product of the sample x class presence matrix with it.
+Comparing that with the phenotype (R = resistant, S = susceptible, I as
+chosen by ``intermediate``) gives per-drug counts and sensitivity,
+specificity, PPV, NPV and concordance from column sums.
+"""
+
+import argparse
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from pipeline.amrfinder import COMPARTMENTS, read_summary
+from pipeline.antibiogram import read_ris
+from pipeline.manifest import classify
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_RIS = os.path.join(ROOT, "Statistic_RS_dataset", "11chung_RS.csv")
+
+# Antibiotic abbreviation -> (Class, Subclass token or None for any subclass) predicting resistance
+DRUG_CLASSES = {
+    "CIP": [("QUINOLONE", None)],
+    "LEV": [("QUINOLONE", None)],
+    "AMK": [("AMINOGLYCOSIDE", "AMIKACIN")],
+    "COL": [("COLISTIN", None)],
+    "CMP": [("PHENICOL", "CHLORAMPHENICOL")],
+    "FOS": [("FOSFOMYCIN", None)],
+    "TGC": [("TETRACYCLINE", "TIGECYCLINE")],
+    "T/S": [("SULFONAMIDE", None), ("TRIMETHOPRIM", None)],
+    "PIP": [("BETA-LACTAM", None)],
+    "PIT": [("BETA-LACTAM", "CEPHALOSPORIN"), ("BETA-LACTAM", "CARBAPENEM")],
+    "CTX": [("BETA-LACTAM", "CEPHALOSPORIN"), ("BETA-LACTAM", "CARBAPENEM")],
+    "CAZ": [("BETA-LACTAM", "CEPHALOSPORIN"), ("BETA-LACTAM", "CARBAPENEM")],
+    "CAA": [("BETA-LACTAM", "CARBAPENEM")],
+    "CTA": [("BETA-LACTAM", "CEPHALOSPORIN"), ("BETA-LACTAM", "CARBAPENEM")],
+    "CEP": [("BETA-LACTAM", "CEPHALOSPORIN"), ("BETA-LACTAM", "CARBAPENEM")],
+    "IMP": [("BETA-LACTAM", "CARBAPENEM")],
+    "MER": [("BETA-LACTAM", "CARBAPENEM")],
+    "ERT": [("BETA-LACTAM", "CARBAPENEM")],
+}
+# How intermediate (I) calls are counted
+INTERMEDIATE = ("exclude", "resistant", "susceptible")
+METRIC_COLUMNS = ["drug", "n", "TP", "FP", "FN", "TN", "sensitivity", "specificity", "ppv", "npv", "concordance"]
+
+
+def _matches(label, rules):
+    klass, _, subclass = label.partition(" / ")
+    classes, subclasses = set(klass.split("/")), set(subclass.split("/"))
+    return any(c in classes and (s is None or s in subclasses) for c, s in rules)
+
+
+@lru_cache(maxsize=32)
+def _mapping(columns, rules):
+    return np.array([[_matches(label, drug_rules) for _, drug_rules in rules] for label in columns], dtype=bool)
+
+
+def drug_mapping(columns, drug_classes=None):
+    """Boolean ``Class / Subclass`` x drug matrix: which classes predict resistance to which drug.
+
+    Args:
+        columns (list[str]): Summary columns (``"CLASS / SUBCLASS"``).
+        drug_classes (dict | None): Rules, ``DRUG_CLASSES`` by default.
+
+    Returns:
+        pd.DataFrame: Indexed by ``columns``, one boolean column per drug.
+    """
+    drug_classes = DRUG_CLASSES if drug_classes is None else drug_classes
+    rules = tuple((drug, tuple(map(tuple, drug_rules))) for drug, drug_rules in drug_classes.items())
+    return pd.DataFrame(_mapping(tuple(columns), rules), index=list(columns), columns=list(drug_classes))
+
+
+def isolate_name(file_name):
+    """Sample name of a report file (``ERR5770797_convert_plasmid_amrfinder.txt`` -> ``ERR5770797``)."""
+    kind = classify(file_name)
+    return kind[0] if kind is not None else file_name
+
+
+def genotype_matrix(summary):
+    """Boolean sample x class matrix from a summary read with ``read_summary``.
+
+    Rows of unreadable reports (``-``) are dropped and the ``File`` names
+    are reduced to isolate names.
+    """
+    summary = summary[~(summary == "-").any(axis=1)]
+    genotype = summary == "1"
+    genotype.index = [isolate_name(name) for name in genotype.index]
+    genotype.index.name = "isolate"
+    return genotype
+
+
+def phenotype_masks(ris, intermediate="exclude"):
+    """Return ``(resistant, susceptible)`` boolean matrices of an encoded R/I/S matrix (2/1/0/NaN)."""
+    if intermediate not in INTERMEDIATE:
+        raise ValueError(f"intermediate must be one of {INTERMEDIATE}")
+    values = ris.to_numpy()
+    resistant = values == 2
+    susceptible = values == 0
+    if intermediate == "resistant":
+        resistant |= values == 1
+    elif intermediate == "susceptible":
+        susceptible |= values == 1
+    return resistant, susceptible
+
+
+def concordance(genotype, ris, drug_classes=None, intermediate="exclude"):
+    """Per-drug agreement of predicted (genotype) and observed (R/I/S) resistance.
+
+    Args:
+        genotype (pd.DataFrame): Boolean sample x ``Class / Subclass`` matrix.
+        ris (pd.DataFrame): Isolate x drug matrix from ``pipeline.antibiogram.encode_ris``.
+        drug_classes (dict | None): Rules, ``DRUG_CLASSES`` by default.
+        intermediate (str): Count ``I`` as ``"resistant"``, ``"susceptible"``
+            or leave it out (``"exclude"``).
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: ``METRIC_COLUMNS`` per drug of the
+        rules found in ``ris``, and the predicted isolate x drug resistance.
+    """
+    drug_classes = DRUG_CLASSES if drug_classes is None else drug_classes
+    isolates = genotype.index.intersection(ris.index)
+    drugs = [d for d in drug_classes if d in ris.columns]
+    mapping = drug_mapping(list(genotype.columns), drug_classes)[drugs]
+
+    genes = genotype.loc[isolates].to_numpy(dtype=np.uint8)
+    predicted = (genes @ mapping.to_numpy(dtype=np.uint8)) > 0
+    resistant, susceptible = phenotype_masks(ris.loc[isolates, drugs], intermediate)
+
+    counts = {"TP": (predicted & resistant).sum(axis=0), "FP": (predicted & susceptible).sum(axis=0),
+              "FN": (~predicted & resistant).sum(axis=0), "TN": (~predicted & susceptible).sum(axis=0)}
+    metrics = pd.DataFrame(counts, index=pd.Index(drugs, name="drug"))
+    metrics.insert(0, "n", metrics.sum(axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metrics["sensitivity"] = metrics["TP"] / (metrics["TP"] + metrics["FN"])
+        metrics["specificity"] = metrics["TN"] / (metrics["TN"] + metrics["FP"])
+        metrics["ppv"] = metrics["TP"] / (metrics["TP"] + metrics["FP"])
+        metrics["npv"] = metrics["TN"] / (metrics["TN"] + metrics["FN"])
+        metrics["concordance"] = (metrics["TP"] + metrics["TN"]) / metrics["n"]
+    predicted = pd.DataFrame(predicted, index=isolates, columns=drugs)
+    return metrics.reset_index()[METRIC_COLUMNS], predicted
+
+
+def main(argv=None):
+    folder, name, encoding = COMPARTMENTS["genome"]
+    parser = argparse.ArgumentParser(description="Genotype-phenotype concordance per antibiotic")
+    parser.add_argument("--summary", default=os.path.join(ROOT, folder, name),
+                        help="AMRFinder Class/Subclass summary CSV (python -m pipeline.amrfinder)")
+    parser.add_argument("--encoding", default=encoding, help="Encoding of the summary CSV")
+    parser.add_argument("--ris", default=DEFAULT_RIS, help="R/I/S antibiogram CSV")
+    parser.add_argument("--intermediate", choices=INTERMEDIATE, default="exclude",
+                        help="How to count intermediate (I) calls")
+    parser.add_argument("--output", "-o", help="Write the per-drug metrics to this CSV")
+    parser.add_argument("--mapping-output", help="Write the class x drug mapping to this CSV")
+    args = parser.parse_args(argv)
+
+    genotype = genotype_matrix(read_summary(args.summary, args.encoding))
+    ris, _ = read_ris(args.ris)
+    matched = genotype.index.intersection(ris.index)
+    print(f"{len(matched)} isolates with genotype and phenotype "
+          f"({len(genotype) - len(matched)} genotype-only, {len(ris) - len(matched)} phenotype-only)")
+    if matched.empty:
+        return 1
+    metrics, _ = concordance(genotype, ris, intermediate=args.intermediate)
+    print(metrics.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    if args.output:
+        metrics.to_csv(args.output, index=False)
+    if args.mapping_output:
+        drug_mapping(list(genotype.columns)).astype(int).to_csv(args.mapping_output, index_label="Class / Subclass")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,218 @@
+"""Consensus plasmid/chromosome call of every contig from Platon, geNomad and replicon BLAST.
+
+Usage:
+    python -m pipeline.consensus                                   # -> consensus_out/contig_consensus.csv
+    python -m pipeline.consensus --min-votes 1 --fasta-out consensus_fasta
+    python -m pipeline.consensus --fasta-dir /home/kien1211/Downloads/fasta --fasta-out consensus_fasta
+
+The three classifiers run on the same SPAdes contigs, so their outputs
+join on (sample, ``NODE_*`` contig):
+
+* Platon: the contig is in ``<sample>.plasmid.fasta`` (plasmid) or
+  ``<sample>.chromosome.fasta`` (chromosome); names and lengths come from
+  ``pipeline.fasta.build_fai``.
+* geNomad: the contig is listed in ``*_plasmid_summary.tsv``, with its
+  ``plasmid_score``.
+* BLAST: a replicon of the typing panel hits the contig
+  (``pipeline.plasmidtyping.best_replicon_hits``).
+
+Each source is read for the whole cohort into one table indexed by
+(sample, contig), and the three are combined with one outer join. A contig
+is ``plasmid`` with at least ``min_votes`` plasmid calls, ``chromosome``
+with none and ``uncertain`` otherwise. ``score`` is the mean of the
+evidence (Platon and BLAST 0/1, geNomad its score). ``--fasta-out`` writes
+``<sample>_consensus_plasmid.fasta`` (consensus plasmids) and
+``<sample>_consensus_chromosome.fasta`` (every other contig); unlike
+Platon's ``<sample>.plasmid.fasta``, these names are not classified by
+``pipeline.manifest``, and the ``--fasta-out`` folder is skipped when the
+Platon FASTAs are collected, so a later run never reads them back as Platon
+calls. The sequences are read through ``FastaIndex`` from the assemblies
+(``--fasta-dir``) or else from the Platon FASTAs.
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline.fasta import FastaIndex, build_fai, write_record
+from pipeline.genomad import load_kind
+from pipeline.manifest import Manifest
+from pipeline.plasmidtyping import best_replicon_hits, fasta_lengths, read_cohort_hits
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_OUTPUT = os.path.join(ROOT, "consensus_out", "contig_consensus.csv")
+DEFAULT_PANEL = os.path.join(ROOT, "plasmidtyping_out", "acinetobacterplasmidtype_feb2025.fasta")
+MIN_VOTES = 2
+LABELS = ["plasmid", "uncertain", "chromosome"]
+FASTA_NAME = "{sample}_consensus_{label}.fasta"
+CONSENSUS_COLUMNS = ["sample", "contig", "length", "platon", "genomad_score", "replicons", "replicon_pident",
+                     "votes", "score", "consensus"]
+
+
+def _inside(path, folders):
+    return any(os.path.commonpath([path, folder]) == folder for folder in folders)
+
+
+def platon_calls(manifest, exclude=()):
+    """``sample``, ``contig``, ``length`` and ``platon`` (plasmid/chromosome) of every Platon FASTA record.
+
+    FASTA files under the ``exclude`` folders are ignored.
+    """
+    exclude = [os.path.abspath(folder) for folder in exclude]
+    frames = []
+    for compartment in ("chromosome", "plasmid"):
+        for entry in (e for e in manifest.entries if e.tool == "platon" and e.compartment == compartment
+                      and not _inside(os.path.abspath(e.path), exclude)):
+            records = build_fai(entry.path)
+            frames.append(pd.DataFrame({"sample": entry.sample, "contig": [r.name for r in records],
+                                        "length": [r.length for r in records], "platon": compartment}))
+    if not frames:
+        return pd.DataFrame(columns=["sample", "contig", "length", "platon"])
+    return pd.concat(frames, ignore_index=True).drop_duplicates(["sample", "contig"])
+
+
+def genomad_calls(manifest, workers=None, cache=None):
+    """Highest geNomad ``plasmid_score`` of every (sample, contig) in the plasmid summaries."""
+    plasmids, _ = load_kind(manifest.files(tool="genomad", compartment="plasmid"), "plasmid", workers, cache)
+    plasmids = plasmids.astype({"sample": str})
+    return plasmids.groupby(["sample", "contig"])["plasmid_score"].max().rename("genomad_score")
+
+
+def blast_calls(manifest, panel=None):
+    """Replicons (``;``-joined) and best identity of every (sample, contig) hit by the typing panel."""
+    paths = manifest.files(tool="plasmidtyping")
+    hits = read_cohort_hits([p for p in paths if os.path.getsize(p)])
+    lengths = fasta_lengths(panel) if panel and os.path.exists(panel) else None
+    best = best_replicon_hits(hits, lengths)
+    grouped = best.groupby(["sample", "contig"])
+    return pd.DataFrame({"replicons": grouped["replicon"].agg(lambda r: ";".join(sorted(set(r)))),
+                         "replicon_pident": grouped["pident"].max()})
+
+
+def consensus(platon, genomad, blast, min_votes=MIN_VOTES):
+    """Join the three sources on (sample, contig) and label every contig.
+
+    Args:
+        platon (pd.DataFrame): Output of ``platon_calls``.
+        genomad (pd.Series): Output of ``genomad_calls``.
+        blast (pd.DataFrame): Output of ``blast_calls``.
+        min_votes (int): Plasmid calls needed for a ``plasmid`` label.
+
+    Returns:
+        pd.DataFrame: ``CONSENSUS_COLUMNS``, sorted by sample and contig.
+    """
+    table = platon.set_index(["sample", "contig"]).join([genomad.to_frame(), blast], how="outer")
+    votes = np.vstack([(table["platon"] == "plasmid").to_numpy(), table["genomad_score"].notna().to_numpy(),
+                       table["replicons"].notna().to_numpy()])
+    table["votes"] = votes.sum(axis=0)
+    evidence = np.vstack([votes[0], table["genomad_score"].fillna(0).to_numpy(), votes[2]])
+    table["score"] = evidence.mean(axis=0).round(4)
+    table["consensus"] = pd.Categorical(
+        np.select([table["votes"] >= min_votes, table["votes"] == 0], ["plasmid", "chromosome"], "uncertain"),
+        categories=LABELS)
+    table["platon"] = table["platon"].fillna("")
+    table["replicons"] = table["replicons"].fillna("")
+    table["length"] = table["length"].astype("Int64")
+    return table.reset_index().sort_values(["sample", "contig"], ignore_index=True)[CONSENSUS_COLUMNS]
+
+
+def _fai_path(out_dir, fasta):
+    return os.path.join(out_dir, ".fai", os.path.basename(fasta) + ".fai")
+
+
+def write_consensus_fasta(table, sources, out_dir):
+    """Write ``<sample>_consensus_plasmid.fasta`` and ``<sample>_consensus_chromosome.fasta`` for every sample.
+
+    Args:
+        table (pd.DataFrame): Output of ``consensus``.
+        sources (dict): ``{sample: [FASTA paths holding its contigs]}``.
+        out_dir (str): Output folder (``.fai`` files go to ``out_dir/.fai``).
+
+    Returns:
+        pd.DataFrame: Contigs written per sample and file, and contigs not found in the sources.
+    """
+    os.makedirs(os.path.join(out_dir, ".fai"), exist_ok=True)
+    written = []
+    for sample, rows in table.groupby("sample", sort=True):
+        indexes = [FastaIndex(path, _fai_path(out_dir, path)) for path in sources.get(sample, [])]
+        try:
+            lookup = {}
+            for index in indexes:
+                for name in index.names:
+                    lookup.setdefault(name, index)
+            plasmid = rows["consensus"] == "plasmid"
+            missing = 0
+            for label, contigs in (("plasmid", rows.loc[plasmid, "contig"]),
+                                   ("chromosome", rows.loc[~plasmid, "contig"])):
+                count = 0
+                with open(os.path.join(out_dir, FASTA_NAME.format(sample=sample, label=label)), "w") as handle:
+                    for contig in contigs:
+                        index = lookup.get(contig)
+                        if index is None:
+                            missing += 1
+                            continue
+                        write_record(handle, contig, index.fetch(contig))
+                        count += 1
+                written.append((sample, label, count))
+            written.append((sample, "missing", missing))
+        finally:
+            for index in indexes:
+                index.close()
+    return pd.DataFrame(written, columns=["sample", "file", "contigs"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nhãn plasmid/nhiễm sắc thể đồng thuận cho mọi contig")
+    parser.add_argument("--platon-dir", default=ROOT, help="Thư mục chứa các file <sample>.{plasmid,chromosome}.fasta")
+    parser.add_argument("--genomad-dir", default=os.path.join(ROOT, "genomad_out"), help="Thư mục kết quả geNomad")
+    parser.add_argument("--plasmidtyping-dir", default=os.path.join(ROOT, "plasmidtyping_out"),
+                        help="Thư mục chứa các báo cáo BLAST <sample>_plasmidtyping.txt")
+    parser.add_argument("--panel", default=DEFAULT_PANEL,
+                        help="FASTA bộ replicon (bỏ qua hit phủ < 60%% trình tự)")
+    parser.add_argument("--min-votes", type=int, default=MIN_VOTES, choices=[1, 2, 3],
+                        help="Số nguồn (Platon, geNomad, BLAST) gọi plasmid cần để gán nhãn plasmid")
+    parser.add_argument("--output", "-o", default=DEFAULT_OUTPUT, help="File CSV ghi bảng đồng thuận")
+    parser.add_argument("--fasta-out", help="Ghi <sample>_consensus_{plasmid,chromosome}.fasta vào thư mục này")
+    parser.add_argument("--fasta-dir", help="Lấy trình tự từ các assembly <sample>.fasta thay vì FASTA của Platon")
+    parser.add_argument("--no-cache", action="store_true", help="Không đọc và không ghi danh sách file đã lưu")
+    args = parser.parse_args(argv)
+
+    def scan(folder):
+        return Manifest(folder, enabled=not args.no_cache).refresh()
+
+    platon_manifest = scan(args.platon_dir)
+    platon = platon_calls(platon_manifest, exclude=[args.fasta_out] if args.fasta_out else ())
+    genomad = genomad_calls(scan(args.genomad_dir))
+    blast = blast_calls(scan(args.plasmidtyping_dir), args.panel)
+    table = consensus(platon, genomad, blast, args.min_votes)
+    if table.empty:
+        print("⚠️ Không tìm thấy kết quả Platon, geNomad hay BLAST nào")
+        return 1
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    table.to_csv(args.output, index=False)
+
+    counts = pd.crosstab(table["sample"], table["consensus"])
+    print(counts.to_string())
+    print(f"📁 Đã ghi {len(table)} contig vào {args.output}")
+
+    if args.fasta_out:
+        if args.fasta_dir:
+            sources = {s: [os.path.join(args.fasta_dir, f"{s}.fasta")] for s in table["sample"].unique()}
+        else:
+            sources = {}
+            for e in platon_manifest.entries:
+                if e.tool == "platon" and not _inside(os.path.abspath(e.path), [os.path.abspath(args.fasta_out)]):
+                    sources.setdefault(e.sample, []).append(e.path)
+        written = write_consensus_fasta(table, sources, args.fasta_out)
+        missing = written[written["file"] == "missing"]
+        print(f"📁 Đã ghi FASTA vào {args.fasta_out}")
+        if missing["contigs"].sum():
+            print(f"⚠️ {int(missing['contigs'].sum())} contig không có trong các file nguồn")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,364 @@
+"""Streaming FASTA re-wrapping with an optional ``.fai`` index.
+
+The Platon ``*.chromosome.fasta`` / ``*.plasmid.fasta`` outputs store every
+contig on one long line; AMRFinder and the downstream tools expect wrapped
+FASTA. ``wrap_fasta`` joins the sequence lines of each record, slices them
+into fixed-width lines and writes them in large blocks, so a 4 MB assembly
+is written with a handful of ``write`` calls instead of one per line.
+
+``FastaIndex`` serves single contigs or regions (``fetch("NODE_69_...",
+100, 900)``) of an uncompressed FASTA from an ``mmap`` through its ``.fai``,
+which is built on first use and reused while it is newer than the FASTA.
+Only the pages holding the requested bases are read.
+
+Usage:
+    python -m pipeline.fasta ERR5770797.fasta NODE_1_length_222551_cov_47.006425:1-120
+    python -m pipeline.fasta --hits abricate_out/ERR5770798_vfdb.csv --fasta-dir /path/to/fasta -o vf.fasta
+"""
+
+import argparse
+import gzip
+import mmap
+import os
+import re
+import sys
+from collections import namedtuple
+
+LINE_LENGTH = 66
+BUFFER_SIZE = 1 << 20
+# Sequence is flushed in blocks of roughly this many bases
+CHUNK_BASES = 1 << 20
+# ABricate columns describing a hit region
+REGION_COLUMNS = ["FILE", "SEQUENCE", "START", "END", "STRAND", "GENE"]
+
+FaiRecord = namedtuple("FaiRecord", ["name", "length", "offset", "linebases", "linebytes"])
+
+
+def is_gzip_path(path):
+    """Return True if ``path`` should be treated as gzip compressed."""
+    if str(path).endswith(".gz"):
+        return True
+    try:
+        with open(path, "rb") as handle:
+            return handle.read(2) == b"\x1f\x8b"
+    except OSError:
+        return False
+
+
+def open_fasta(path, mode="r"):
+    """Open a plain or gzip FASTA file in text mode with a large buffer."""
+    if "r" in mode:
+        compressed = is_gzip_path(path)
+    else:
+        compressed = str(path).endswith(".gz")
+    if compressed:
+        return gzip.open(path, mode.replace("t", "") + "t")
+    return open(path, mode, buffering=BUFFER_SIZE)
+
+
+def _wrap_block(seq, line_length):
+    """Return ``seq`` as newline-terminated lines of ``line_length``."""
+    return "\n".join(seq[i:i + line_length] for i in range(0, len(seq), line_length)) + "\n"
+
+
+def write_fai(records, fai_path):
+    """Write ``FaiRecord`` entries in samtools ``.fai`` layout."""
+    with open(fai_path, "w") as handle:
+        handle.write("".join(
+            f"{r.name}\t{r.length}\t{r.offset}\t{r.linebases}\t{r.linebytes}\n" for r in records
+        ))
+
+
+def wrap_fasta(input_path, output_path, line_length=LINE_LENGTH, index=True):
+    """Re-wrap a FASTA file to a fixed line length.
+
+    Sequence lines belonging to one record are concatenated before wrapping,
+    so multi-line input produces evenly wrapped output. Input and output may
+    be gzip compressed (``.gz``).
+
+    Args:
+        input_path (str): FASTA to read (plain or gzip).
+        output_path (str): FASTA to write; a ``.gz`` suffix enables gzip.
+        line_length (int): Number of bases per output line.
+        index (bool): Write ``<output_path>.fai`` alongside an uncompressed
+            output. Ignored for gzip output, which samtools cannot index.
+
+    Returns:
+        list[FaiRecord]: One entry per record, offsets relative to the
+        uncompressed output.
+    """
+    if line_length <= 0:
+        raise ValueError("line_length must be positive")
+
+    out_dir = os.path.dirname(output_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    records = []
+    offset = 0
+    name = None
+    seq_offset = 0
+    seq_length = 0
+    pieces = []
+    pending = 0
+    flush_at = max(CHUNK_BASES - CHUNK_BASES % line_length, line_length)
+
+    with open_fasta(input_path, "r") as infile, open_fasta(output_path, "w") as outfile:
+
+        def finish_record():
+            nonlocal offset, pieces, pending
+            if name is None:
+                return
+            if pending:
+                block = _wrap_block("".join(pieces), line_length)
+                outfile.write(block)
+                offset += len(block)
+            records.append(FaiRecord(name, seq_length, seq_offset, line_length, line_length + 1))
+            pieces = []
+            pending = 0
+
+        for raw in infile:
+            line = raw.strip()
+            if not line:
+                continue
+            if line[0] == ">":
+                finish_record()
+                header = line + "\n"
+                outfile.write(header)
+                offset += len(header.encode())
+                name = line[1:].split(None, 1)[0] if len(line) > 1 else ""
+                seq_offset = offset
+                seq_length = 0
+                continue
+
+            if name is None:
+                raise ValueError(f"{input_path}: sequence data before the first '>' header")
+            pieces.append(line)
+            pending += len(line)
+            seq_length += len(line)
+            if pending >= flush_at:
+                seq = "".join(pieces)
+                cut = len(seq) - len(seq) % line_length
+                block = _wrap_block(seq[:cut], line_length)
+                outfile.write(block)
+                offset += len(block)
+                pieces = [seq[cut:]] if cut < len(seq) else []
+                pending = len(seq) - cut
+
+        finish_record()
+
+    if index and not str(output_path).endswith(".gz"):
+        write_fai(records, output_path + ".fai")
+    return records
+
+
+def build_fai(path):
+    """Index an uncompressed FASTA whose records use one line length each (samtools rules).
+
+    Returns:
+        list[FaiRecord]: One entry per record.
+
+    Raises:
+        ValueError: If a record has lines of unequal length before its last line.
+    """
+    records = []
+    with open(path, "rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return records
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = data.find(b">")
+            while start != -1:
+                header_end = data.find(b"\n", start)
+                header_end = len(data) if header_end == -1 else header_end
+                end = data.find(b"\n>", header_end)
+                stop = len(data) if end == -1 else end + 1
+                fields = data[start + 1:header_end].split(None, 1)
+                name = fields[0].decode() if fields else ""
+                lines = data[header_end + 1:stop].split(b"\n")
+                while lines and not lines[-1].strip():
+                    lines.pop()
+                if not lines:
+                    records.append(FaiRecord(name, 0, header_end + 1, 0, 0))
+                else:
+                    width = len(lines[0])
+                    crlf = int(lines[0].endswith(b"\r"))
+                    if len(lines) > 1 and (set(map(len, lines[:-1])) != {width} or len(lines[-1]) > width):
+                        raise ValueError(f"{path}: record {name} has lines of different length")
+                    length = sum(map(len, lines)) - crlf * len(lines)
+                    records.append(FaiRecord(name, length, header_end + 1, width - crlf, width + 1))
+                start = -1 if end == -1 else end + 1
+    return records
+
+
+def read_fai(fai_path):
+    """Read a samtools ``.fai`` file into ``FaiRecord`` entries."""
+    with open(fai_path) as handle:
+        return [FaiRecord(f[0], int(f[1]), int(f[2]), int(f[3]), int(f[4]))
+                for f in (line.rstrip("\n").split("\t") for line in handle if line.strip())]
+
+
+_COMPLEMENT = str.maketrans("ACGTNacgtn", "TGCANtgcan")
+
+
+def reverse_complement(seq):
+    return seq.translate(_COMPLEMENT)[::-1]
+
+
+class FastaIndex:
+    """Random access to the records of an uncompressed FASTA through ``mmap`` and a ``.fai``.
+
+    Args:
+        path (str): FASTA file (gzip is not supported: it cannot be mapped).
+        fai_path (str | None): Index file, ``<path>.fai`` by default. It is
+            built (and written when possible) if missing or older than ``path``.
+    """
+
+    def __init__(self, path, fai_path=None):
+        if is_gzip_path(path):
+            raise ValueError(f"{path}: gzip FASTA cannot be memory-mapped; decompress it first")
+        self.path = path
+        self.fai_path = fai_path or f"{path}.fai"
+        if os.path.exists(self.fai_path) and os.path.getmtime(self.fai_path) >= os.path.getmtime(path):
+            records = read_fai(self.fai_path)
+        else:
+            records = build_fai(path)
+            try:
+                write_fai(records, self.fai_path)
+            except OSError:
+                # A read-only folder only means the index is rebuilt next time
+                pass
+        self.records = {r.name: r for r in records}
+        self._handle = open(path, "rb")
+        size = os.fstat(self._handle.fileno()).st_size
+        self._data = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._handle.close()
+
+    def __contains__(self, name):
+        return name in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def names(self):
+        return list(self.records)
+
+    def length(self, name):
+        return self.records[name].length
+
+    def fetch(self, name, start=0, end=None, strand="+"):
+        """Return bases ``[start, end)`` (0-based) of record ``name``.
+
+        Args:
+            name (str): Record name (first word of the header).
+            start (int): First base, 0-based.
+            end (int | None): One past the last base; the record end by default.
+            strand (str): ``"-"`` returns the reverse complement.
+
+        Raises:
+            KeyError: If ``name`` is not in the index.
+        """
+        r = self.records[name]
+        start = max(start, 0)
+        end = r.length if end is None else min(end, r.length)
+        if start >= end:
+            return ""
+        first = r.offset + start // r.linebases * r.linebytes + start % r.linebases
+        last = r.offset + (end - 1) // r.linebases * r.linebytes + (end - 1) % r.linebases + 1
+        seq = self._data[first:last]
+        if r.linebytes != r.linebases:
+            seq = seq.translate(None, b"\r\n")
+        seq = seq.decode()
+        return reverse_complement(seq) if strand == "-" else seq
+
+
+# ``name``, ``name:start`` or ``name:start-end`` (1-based, inclusive, commas allowed)
+REGION_PATTERN = re.compile(r"^(?P<name>.+?)(?::(?P<start>[\d,]+)(?:-(?P<end>[\d,]+))?)?$")
+
+
+def parse_region(region):
+    """samtools-style region -> ``(name, start, end)`` with a 0-based half-open range."""
+    match = REGION_PATTERN.match(region)
+    start = int(match["start"].replace(",", "")) - 1 if match["start"] else 0
+    end = int(match["end"].replace(",", "")) if match["end"] else None
+    return match["name"], start, end
+
+
+def write_record(handle, header, seq, line_length=LINE_LENGTH):
+    handle.write(f">{header}\n")
+    if seq:
+        handle.write(_wrap_block(seq, line_length))
+
+
+def hit_regions(report, fasta_dir=None, hit_filter=None):
+    """Yield ``(assembly, contig, start, end, strand, gene)`` of every hit of an ABRicate report.
+
+    The report is parsed by ``read_abricate`` (with or without the ``#FILE``
+    header; hits failing ``hit_filter`` are dropped). ``start`` is 0-based;
+    the ``FILE`` assembly is looked up by file name in ``fasta_dir`` when
+    given (reports keep the path of the typing machine). Reports of ABricate
+    releases without a ``STRAND`` column give ``+``.
+    """
+    # pandas is only needed for reports, not for the FASTA functions above
+    from pipeline.abricate import detect_dialect, read_abricate
+    from pipeline.filters import NO_FILTER
+    names = detect_dialect(report).names
+    hits = read_abricate(report, usecols=[c for c in REGION_COLUMNS if c in names],
+                         hit_filter=hit_filter or NO_FILTER)
+    strands = hits["STRAND"].fillna("+") if "STRAND" in hits else ["+"] * len(hits)
+    for assembly, contig, start, end, strand, gene in zip(hits["FILE"], hits["SEQUENCE"], hits["START"],
+                                                          hits["END"], strands, hits["GENE"]):
+        if fasta_dir:
+            assembly = os.path.join(fasta_dir, os.path.basename(assembly))
+        yield assembly, contig, int(start) - 1, int(end), strand, gene
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract contigs or regions from indexed FASTA files")
+    parser.add_argument("fasta", nargs="?", help="Assembly to read regions from")
+    parser.add_argument("regions", nargs="*", help="name, name:start or name:start-end (1-based)")
+    parser.add_argument("--hits", nargs="+", default=[], help="ABRicate reports whose hit regions are extracted")
+    parser.add_argument("--fasta-dir", help="Folder of the assemblies named in the reports' #FILE column")
+    parser.add_argument("--output", "-o", help="FASTA to write (standard output by default)")
+    from pipeline.filters import add_filter_arguments, filter_from_args
+    add_filter_arguments(parser, methods=False)
+    args = parser.parse_args(argv)
+    hit_filter = filter_from_args(args)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        if args.fasta:
+            with FastaIndex(args.fasta) as index:
+                for region in args.regions or index.names:
+                    name, start, end = parse_region(region)
+                    write_record(out, region, index.fetch(name, start, end))
+        for report in args.hits:
+            # Usually one assembly per report; close them before the next report
+            indexes = {}
+            try:
+                for assembly, contig, start, end, strand, gene in hit_regions(report, args.fasta_dir, hit_filter):
+                    if assembly not in indexes:
+                        indexes[assembly] = FastaIndex(assembly)
+                    header = f"{gene} {contig}:{start + 1}-{end}({strand})"
+                    write_record(out, header, indexes[assembly].fetch(contig, start, end, strand))
+            finally:
+                for index in indexes.values():
+                    index.close()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""Hit filters (minimum identity/coverage, allowed methods) applied at parse time.
+
+The readers (``pipeline.abricate.read_abricate``, ``pipeline.amrfinder.read_amrfinder``)
+take a ``hit_filter`` and drop rejected rows right after parsing each report,
+before it is cached, concatenated or counted, so partial or low-identity hits
+never reach a summary. ``HitFilter`` is a namedtuple, so it is part of the
+report cache key, and ``to_params`` gives the plain dict recorded in the
+state sidecar and in ``<output>.meta.json`` next to every output.
+"""
+
+import json
+import os
+from collections import namedtuple
+
+import pandas as pd
+
+META_SUFFIX = ".meta.json"
+
+# Filter field -> report column, per report format
+ABRICATE_FIELDS = {"identity": "%IDENTITY", "coverage": "%COVERAGE", "method": None}
+AMRFINDER_FIELDS = {"identity": "% Identity to reference", "coverage": "% Coverage of reference", "method": "Method"}
+
+
+class HitFilter(namedtuple("HitFilter", ["min_identity", "min_coverage", "methods"])):
+    """Keep hits with identity/coverage >= the minimum (percent) and an allowed method.
+
+    ``None`` disables a criterion; ``methods`` is a sorted tuple of allowed
+    AMRFinderPlus ``Method`` values (e.g. ``("ALLELEX", "BLASTX", "EXACTX")``).
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, min_identity=None, min_coverage=None, methods=None):
+        methods = tuple(sorted(set(methods))) if methods else None
+        return super().__new__(cls, min_identity, min_coverage, methods)
+
+    @property
+    def active(self):
+        return any(v is not None for v in self)
+
+    def columns(self, fields):
+        """Report columns this filter needs, for a format's ``fields`` mapping."""
+        needed = []
+        for name, value in zip(("identity", "coverage", "method"), self):
+            if value is None:
+                continue
+            if fields.get(name) is None:
+                raise ValueError(f"this report format has no {name} column to filter on")
+            needed.append(fields[name])
+        return needed
+
+    def mask(self, df, fields):
+        """Boolean Series of the rows of ``df`` that pass."""
+        keep = pd.Series(True, index=df.index)
+        if self.min_identity is not None:
+            keep &= pd.to_numeric(df[fields["identity"]], errors="coerce") >= self.min_identity
+        if self.min_coverage is not None:
+            keep &= pd.to_numeric(df[fields["coverage"]], errors="coerce") >= self.min_coverage
+        if self.methods is not None:
+            keep &= df[fields["method"]].isin(self.methods)
+        return keep
+
+    def apply(self, df, fields, usecols=None):
+        """Return the passing rows of ``df``, restricted to ``usecols`` if given."""
+        if self.active:
+            df = df[self.mask(df, fields)].reset_index(drop=True)
+        return df[list(usecols)] if usecols is not None else df
+
+    def to_params(self):
+        """Plain dict of the active criteria (empty when nothing is filtered)."""
+        return {k: list(v) if isinstance(v, tuple) else v for k, v in self._asdict().items() if v is not None}
+
+    def describe(self):
+        parts = []
+        if self.min_identity is not None:
+            parts.append(f"identity >= {self.min_identity:g}%")
+        if self.min_coverage is not None:
+            parts.append(f"coverage >= {self.min_coverage:g}%")
+        if self.methods is not None:
+            parts.append("method in " + ",".join(self.methods))
+        return ", ".join(parts) or "no filter"
+
+
+NO_FILTER = HitFilter()
+
+
+def add_filter_arguments(parser, methods=True):
+    """Add ``--min-identity``, ``--min-coverage`` (and ``--methods``) to ``parser``."""
+    parser.add_argument('--min-identity', type=float, help='Chỉ giữ hit có %% identity >= giá trị này')
+    parser.add_argument('--min-coverage', type=float, help='Chỉ giữ hit có %% coverage >= giá trị này')
+    if methods:
+        parser.add_argument('--methods', nargs='+', metavar='METHOD',
+                            help='Chỉ giữ hit có Method thuộc danh sách (vd: EXACTX ALLELEX BLASTX)')
+    return parser
+
+
+def filter_from_args(args):
+    """Build a ``HitFilter`` from arguments added by ``add_filter_arguments``."""
+    return HitFilter(args.min_identity, args.min_coverage, getattr(args, "methods", None))
+
+
+def save_metadata(output_path, hit_filter=NO_FILTER, **extra):
+    """Write ``<output_path>.meta.json`` recording the filters (and ``extra`` fields) used."""
+    meta = {"output": os.path.basename(output_path), "filters": hit_filter.to_params()}
+    meta.update(extra)
+    with open(output_path + META_SUFFIX, "w") as handle:
+        json.dump(meta, handle, indent=1)
@@ -0,0 +1,228 @@
+"""Contig-level interval index of AMR genes, virulence factors and replicon hits.
+
+Usage:
+    python -m pipeline.gene_index --colocated                          # AMR genes sharing a contig
+    python -m pipeline.gene_index --colocated --plasmids consensus_out/contig_consensus.csv
+    python -m pipeline.gene_index --near-replicons 10000 -o near_replicons.csv
+    python -m pipeline.gene_index --query ERR5770797 NODE_104_length_2699_cov_66.229782 1 2699
+
+The summaries collapse hits to sample-level presence. Here every hit keeps
+its sample, contig and coordinates (1-based, inclusive, as the tools
+write them): AMRFinder (``Contig id``, ``Start``, ``Stop``), ABricate
+(``SEQUENCE``, ``START``, ``END``) and the best replicon hits of the
+``*_plasmidtyping.txt`` reports. The features are sorted by (sample,
+contig, start). A dict maps every (sample, contig) to its row range, and a
+running maximum of the ends within each contig makes an overlap query two
+``np.searchsorted`` calls on that range. Cohort-wide questions (genes
+sharing a contig, genes within a distance of a replicon) are answered with
+one ``groupby`` or ``merge`` over the feature table.
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline.abricate import read_abricate
+from pipeline.amrfinder import read_amrfinder
+from pipeline.manifest import Manifest, classify
+from pipeline.plasmidtyping import best_replicon_hits, fasta_lengths, read_cohort_hits
+from pipeline.reports import load_reports
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PANEL = os.path.join(ROOT, "plasmidtyping_out", "acinetobacterplasmidtype_feb2025.fasta")
+FEATURE_COLUMNS = ["sample", "contig", "start", "end", "strand", "gene", "source", "detail"]
+SOURCES = ("amrfinder", "abricate", "replicon")
+NEAR_DISTANCE = 10000
+
+
+def _sample(path):
+    kind = classify(os.path.basename(path))
+    return kind[0] if kind else os.path.basename(path)
+
+
+def amrfinder_features(paths, workers=None, cache=None):
+    """Features of AMRFinderPlus reports (``detail`` = ``Class / Subclass``)."""
+    columns = ["Contig id", "Start", "Stop", "Strand", "Element symbol", "Class", "Subclass"]
+    hits, _ = load_reports(paths, workers=workers, sample_fn=_sample, cache=cache, reader=read_amrfinder,
+                           usecols=columns)
+    return pd.DataFrame({"sample": hits["sample"].astype(str), "contig": hits["Contig id"], "start": hits["Start"],
+                         "end": hits["Stop"], "strand": hits["Strand"], "gene": hits["Element symbol"],
+                         "source": "amrfinder", "detail": hits["Class"] + " / " + hits["Subclass"]})
+
+
+def abricate_features(paths, workers=None, cache=None):
+    """Features of ABricate reports (``detail`` = ``PRODUCT``)."""
+    hits, _ = load_reports(paths, workers=workers, sample_fn=_sample, cache=cache, reader=read_abricate,
+                           usecols=["SEQUENCE", "START", "END", "STRAND", "GENE", "PRODUCT"])
+    return pd.DataFrame({"sample": hits["sample"].astype(str), "contig": hits["SEQUENCE"], "start": hits["START"],
+                         "end": hits["END"], "strand": hits["STRAND"], "gene": hits["GENE"],
+                         "source": "abricate", "detail": hits["PRODUCT"]})
+
+
+def replicon_features(paths, panel=None):
+    """Best replicon hit of every contig region (``gene`` = replicon, ``detail`` = panel entry)."""
+    hits = read_cohort_hits([p for p in paths if os.path.getsize(p)])
+    lengths = fasta_lengths(panel) if panel and os.path.exists(panel) else None
+    best = best_replicon_hits(hits, lengths)
+    return pd.DataFrame({"sample": best["sample"], "contig": best["contig"], "start": best["start"],
+                         "end": best["end"], "strand": "", "gene": best["replicon"], "source": "replicon",
+                         "detail": best["reference"]})
+
+
+class GeneIndex:
+    """Features sorted by (sample, contig, start) with per-contig row ranges.
+
+    Args:
+        features (pd.DataFrame): ``FEATURE_COLUMNS`` rows from any sources.
+    """
+
+    def __init__(self, features):
+        features = features.astype({"start": "int64", "end": "int64"})
+        self.features = features.sort_values(["sample", "contig", "start", "end"], ignore_index=True)[FEATURE_COLUMNS]
+        self.starts = self.features["start"].to_numpy()
+        self.ends = self.features["end"].to_numpy()
+        keys = pd.MultiIndex.from_frame(self.features[["sample", "contig"]])
+        codes, uniques = pd.factorize(keys)
+        bounds = np.flatnonzero(np.diff(codes, prepend=-1, append=-1))
+        self.ranges = {key: (int(lo), int(hi)) for key, lo, hi in zip(uniques, bounds[:-1], bounds[1:])}
+        # Running maximum of the end within each contig: sorted inside every range
+        self.max_ends = self.features["end"].groupby(codes).cummax().to_numpy()
+
+    @classmethod
+    def from_folders(cls, amrfinder_dir=None, abricate_dir=None, plasmidtyping_dir=None, panel=DEFAULT_PANEL,
+                     workers=None, cache=None, use_manifest_cache=True):
+        """Index the reports found in the given folders (any of them may be None)."""
+        frames = []
+        if amrfinder_dir:
+            paths = Manifest(amrfinder_dir, enabled=use_manifest_cache).refresh().files(tool="amrfinder")
+            frames.append(amrfinder_features(paths, workers, cache))
+        if abricate_dir:
+            paths = Manifest(abricate_dir, enabled=use_manifest_cache).refresh().files(tool="abricate")
+            frames.append(abricate_features(paths, workers, cache))
+        if plasmidtyping_dir:
+            paths = Manifest(plasmidtyping_dir, enabled=use_manifest_cache).refresh().files(tool="plasmidtyping")
+            frames.append(replicon_features(paths, panel))
+        frames = [f for f in frames if not f.empty]
+        return cls(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FEATURE_COLUMNS))
+
+    def __len__(self):
+        return len(self.features)
+
+    def overlapping_rows(self, sample, contig, start, end):
+        """Row positions of the features on ``contig`` overlapping ``[start, end]`` (1-based, inclusive)."""
+        lo, hi = self.ranges.get((sample, contig), (0, 0))
+        if lo == hi:
+            return np.zeros(0, dtype=np.int64)
+        first = lo + int(np.searchsorted(self.max_ends[lo:hi], start, side="left"))
+        last = lo + int(np.searchsorted(self.starts[lo:hi], end, side="right"))
+        rows = np.arange(first, max(first, last))
+        return rows[self.ends[rows] >= start]
+
+    def overlapping(self, sample, contig, start, end, source=None):
+        """Features on ``contig`` overlapping ``[start, end]``, optionally of one ``source``."""
+        found = self.features.iloc[self.overlapping_rows(sample, contig, start, end)]
+        return found if source is None else found[found["source"] == source]
+
+    def near(self, sample, contig, start, end, distance=NEAR_DISTANCE, source=None):
+        """Features within ``distance`` bp of ``[start, end]`` on the same contig."""
+        return self.overlapping(sample, contig, start - distance, end + distance, source)
+
+    def on_contig(self, sample, contig, source=None):
+        lo, hi = self.ranges.get((sample, contig), (0, 0))
+        found = self.features.iloc[lo:hi]
+        return found if source is None else found[found["source"] == source]
+
+    def colocated(self, source="amrfinder", min_genes=2, contigs=None):
+        """Contigs carrying at least ``min_genes`` distinct genes of ``source``.
+
+        Args:
+            source (str): Feature source to group.
+            min_genes (int): Minimum number of distinct genes per contig.
+            contigs (pd.DataFrame | None): Only these ``sample``/``contig``
+                pairs (e.g. the consensus plasmid contigs).
+
+        Returns:
+            pd.DataFrame: ``sample``, ``contig``, ``n_genes`` and ``genes`` (``;``-joined, sorted).
+        """
+        features = self.features[self.features["source"] == source]
+        if contigs is not None:
+            features = features.merge(contigs[["sample", "contig"]].drop_duplicates(), on=["sample", "contig"])
+        grouped = features.groupby(["sample", "contig"])["gene"]
+        table = pd.DataFrame({"n_genes": grouped.nunique(), "genes": grouped.agg(lambda g: ";".join(sorted(set(g))))})
+        table = table[table["n_genes"] >= min_genes].reset_index()
+        return table.sort_values(["n_genes", "sample", "contig"], ascending=[False, True, True], ignore_index=True)
+
+    def near_features(self, anchor="replicon", source="amrfinder", distance=NEAR_DISTANCE):
+        """Every (``anchor`` feature, ``source`` feature) pair on one contig at most ``distance`` bp apart.
+
+        Returns:
+            pd.DataFrame: ``sample``, ``contig``, the anchor's and the
+            feature's ``gene``/``start``/``end`` and their ``gap`` (0 when overlapping).
+        """
+        anchors = self.features[self.features["source"] == anchor]
+        targets = self.features[self.features["source"] == source]
+        pairs = anchors.merge(targets, on=["sample", "contig"], suffixes=("_anchor", ""))
+        gap = np.maximum(0, np.maximum(pairs["start"], pairs["start_anchor"]) -
+                         np.minimum(pairs["end"], pairs["end_anchor"]) - 1)
+        pairs = pairs.assign(gap=gap)[gap <= distance]
+        columns = ["sample", "contig", "gene_anchor", "start_anchor", "end_anchor", "gene", "start", "end",
+                   "strand", "detail", "gap"]
+        return pairs[columns].rename(columns={"gene_anchor": anchor}).reset_index(drop=True)
+
+
+def read_contig_list(path, label="plasmid"):
+    """``sample``/``contig`` pairs of a ``pipeline.consensus`` table labelled ``label``."""
+    table = pd.read_csv(path, dtype=str, keep_default_na=False)
+    if "consensus" in table.columns:
+        table = table[table["consensus"] == label]
+    return table[["sample", "contig"]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chỉ mục theo contig của các hit AMR, độc lực và replicon")
+    parser.add_argument("--amrfinder-dir", default=os.path.join(ROOT, "amrfinder_out"),
+                        help="Thư mục chứa các file *_amrfinder.txt")
+    parser.add_argument("--abricate-dir", default=os.path.join(ROOT, "abricate_out"),
+                        help="Thư mục chứa các file *_vfdb.csv")
+    parser.add_argument("--plasmidtyping-dir", default=os.path.join(ROOT, "plasmidtyping_out"),
+                        help="Thư mục chứa các báo cáo BLAST *_plasmidtyping.txt")
+    parser.add_argument("--panel", default=DEFAULT_PANEL, help="FASTA bộ replicon (để tính độ phủ replicon)")
+    parser.add_argument("--colocated", action="store_true", help="Các contig mang từ hai gen AMR trở lên")
+    parser.add_argument("--plasmids",
+                        help="Với --colocated: chỉ xét contig plasmid trong bảng CSV của pipeline.consensus")
+    parser.add_argument("--near-replicons", type=int, metavar="BP",
+                        help="Gen AMR và độc lực cách hit replicon không quá BP")
+    parser.add_argument("--query", nargs=4, metavar=("SAMPLE", "CONTIG", "START", "END"),
+                        help="Các gen chồng lấp một vùng (tính từ 1, gồm hai đầu)")
+    parser.add_argument("--output", "-o", help="Ghi bảng kết quả ra file CSV")
+    parser.add_argument("--no-cache", action="store_true", help="Đọc lại mọi file, không dùng cache")
+    args = parser.parse_args(argv)
+
+    from pipeline.cache import ReportCache
+    index = GeneIndex.from_folders(args.amrfinder_dir, args.abricate_dir, args.plasmidtyping_dir, args.panel,
+                                   cache=ReportCache(enabled=not args.no_cache),
+                                   use_manifest_cache=not args.no_cache)
+    counts = index.features["source"].value_counts()
+    print(f"📁 {len(index)} gen trên {len(index.ranges)} contig "
+          f"({', '.join(f'{s}: {counts.get(s, 0)}' for s in SOURCES)})")
+
+    if args.query:
+        sample, contig, start, end = args.query
+        result = index.overlapping(sample, contig, int(start), int(end))
+    elif args.near_replicons is not None:
+        result = pd.concat([index.near_features("replicon", source, args.near_replicons)
+                            for source in ("amrfinder", "abricate")], ignore_index=True)
+    else:
+        contigs = read_contig_list(args.plasmids) if args.plasmids else None
+        result = index.colocated("amrfinder", contigs=contigs)
+    print(result.to_string(index=False) if not result.empty else "⚠️ Không có gen nào thỏa điều kiện")
+    if args.output:
+        result.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,251 @@
+"""Cohort plasmid and virus tables from the geNomad ``*_summary`` folders.
+
+Usage:
+    python -m pipeline.genomad                       # genomad_out -> genomad_out/genomad_*.csv
+    python -m pipeline.genomad -i /path/to/genomad_out --format parquet --no-cache
+
+``genomad_run.sh`` leaves ``genomad_out/<sample>/<sample>_summary/`` with a
+``*_plasmid_summary.tsv``, ``*_virus_summary.tsv``, ``*_plasmid_genes.tsv``
+and ``*_summary.json`` per sample. The reports are found with one ``pipeline.manifest`` scan, read by a thread
+pool with explicit dtypes (parsed frames are reused from the Parquet
+``ReportCache`` while the file is unchanged) and stacked into one typed
+table per kind, with the sample as a categorical column. The per-sample
+statistics and the AMR / conjugation gene frequencies are ``groupby``
+counts of those tables. From ``*_plasmid_genes.tsv`` only the genes with a
+ConjScan or AMR annotation are kept (the genes behind ``conjugation_genes``
+/ ``amr_genes``, with their coordinates); ``*_summary.json`` adds the
+thresholds of each run to the per-sample statistics.
+
+Outputs: ``genomad_plasmids``, ``genomad_viruses`` (one row per contig or
+provirus), ``genomad_samples`` (one row per sample) and
+``genomad_plasmid_genes`` (samples carrying each AMR / conjugation gene on
+a plasmid contig) and ``genomad_plasmid_gene_annotations`` (one row per
+annotated gene).
+"""
+
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from pipeline.assembly_qc import COVERAGE_PATTERN
+from pipeline.cache import ReportCache
+from pipeline.manifest import Manifest, classify
+from pipeline.reports import load_reports
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_INPUT = os.path.join(ROOT, "genomad_out")
+KINDS = ("plasmid", "virus")
+# geNomad writes NA for empty fields
+NA_VALUES = ["NA"]
+TOPOLOGIES = ["No terminal repeats", "DTR", "ITR", "Provirus"]
+# Topologies of contigs geNomad found closed by terminal repeats
+CIRCULAR = ["DTR", "ITR"]
+
+COMMON_DTYPES = {"seq_name": "string", "length": "int64", "n_genes": "int32", "genetic_code": "int8",
+                 "fdr": "float64", "n_hallmarks": "int32", "marker_enrichment": "float64"}
+DTYPES = {
+    "plasmid": {**COMMON_DTYPES, "plasmid_score": "float64", "conjugation_genes": "string", "amr_genes": "string"},
+    "virus": {**COMMON_DTYPES, "coordinates": "string", "virus_score": "float64", "taxonomy": "string"},
+}
+PLASMID_COLUMNS = ["sample", "contig", "length", "coverage", "topology", "plasmid_score", "fdr", "n_genes",
+                   "n_hallmarks", "marker_enrichment", "conjugation_genes", "amr_genes", "n_conjugation_genes",
+                   "n_amr_genes"]
+VIRUS_COLUMNS = ["sample", "contig", "seq_name", "length", "coverage", "topology", "provirus_start",
+                 "provirus_end", "virus_score", "fdr", "n_genes", "n_hallmarks", "marker_enrichment", "taxonomy"]
+GENE_DTYPES = {"gene": "string", "start": "int64", "end": "int64", "strand": "int8", "plasmid_hallmark": "int8",
+               "annotation_conjscan": "string", "annotation_amr": "string", "annotation_accessions": "string",
+               "annotation_description": "string"}
+GENE_COLUMNS = ["sample", "contig", "gene", "start", "end", "strand", "plasmid_hallmark", "conjugation", "amr",
+                "accessions", "description"]
+
+
+def read_genomad(path, kind="plasmid"):
+    """Read one ``*_plasmid_summary.tsv`` / ``*_virus_summary.tsv`` with the ``DTYPES`` of ``kind``."""
+    dtypes = DTYPES[kind]
+    df = pd.read_csv(path, sep="\t", dtype={c: ("float64" if t.startswith("int") else t) for c, t in dtypes.items()},
+                     na_values=NA_VALUES, keep_default_na=False)
+    df["topology"] = pd.Categorical(df["topology"], categories=TOPOLOGIES)
+    # Integer columns are parsed as float (NA-safe) and narrowed here
+    return df.astype({c: t for c, t in dtypes.items() if t.startswith("int")})
+
+
+def read_plasmid_genes(path):
+    """Read the ConjScan / AMR annotated genes of one ``*_plasmid_genes.tsv``."""
+    df = pd.read_csv(path, sep="\t", usecols=list(GENE_DTYPES), dtype=GENE_DTYPES, na_values=NA_VALUES,
+                     keep_default_na=False)
+    return df[df["annotation_conjscan"].notna() | df["annotation_amr"].notna()].reset_index(drop=True)
+
+
+def _sample(path):
+    kind = classify(os.path.basename(path))
+    return kind[0] if kind else os.path.basename(path)
+
+
+def _count_items(values):
+    """Number of ``;``-separated entries of each cell (0 for missing)."""
+    return values.str.count(";").add(1).fillna(0).astype("int32")
+
+
+def contig_names(seq_name):
+    """Contig of every geNomad sequence (``NODE_17_...|provirus_39007_70033`` -> ``NODE_17_...``)."""
+    return seq_name.str.split("|", n=1).str[0]
+
+
+def header_coverage(contig):
+    """SPAdes k-mer coverage of every contig name (NaN when the name has none)."""
+    return pd.to_numeric(contig.str.extract(COVERAGE_PATTERN, expand=False), errors="coerce")
+
+
+def load_kind(paths, kind, workers=None, cache=None):
+    """Stack the ``kind`` summaries of ``paths`` into one typed table.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The table (``PLASMID_COLUMNS`` or
+        ``VIRUS_COLUMNS``) and the loader diagnostics.
+    """
+    long_df, diagnostics = load_reports(paths, workers=workers, sample_fn=_sample, cache=cache,
+                                        reader=read_genomad, kind=kind)
+    if long_df.empty:
+        columns = PLASMID_COLUMNS if kind == "plasmid" else VIRUS_COLUMNS
+        return pd.DataFrame(columns=columns), diagnostics
+    long_df["contig"] = contig_names(long_df["seq_name"])
+    long_df["coverage"] = header_coverage(long_df["contig"])
+    if kind == "plasmid":
+        long_df["n_conjugation_genes"] = _count_items(long_df["conjugation_genes"])
+        long_df["n_amr_genes"] = _count_items(long_df["amr_genes"])
+        return long_df[PLASMID_COLUMNS], diagnostics
+    bounds = long_df["coordinates"].str.extract(r"^(\d+)-(\d+)$").astype("Int64")
+    long_df["provirus_start"], long_df["provirus_end"] = bounds[0], bounds[1]
+    return long_df[VIRUS_COLUMNS], diagnostics
+
+
+def load_plasmid_genes(paths, workers=None, cache=None):
+    """Stack the annotated genes of ``paths`` into one ``GENE_COLUMNS`` table (plus the loader diagnostics)."""
+    long_df, diagnostics = load_reports(paths, workers=workers, sample_fn=_sample, cache=cache,
+                                        reader=read_plasmid_genes)
+    if long_df.empty:
+        return pd.DataFrame(columns=GENE_COLUMNS), diagnostics
+    # Prodigal names genes <contig>_<n>
+    long_df["contig"] = long_df["gene"].str.rsplit("_", n=1).str[0]
+    long_df = long_df.rename(columns={"annotation_conjscan": "conjugation", "annotation_amr": "amr",
+                                      "annotation_accessions": "accessions",
+                                      "annotation_description": "description"})
+    return long_df[GENE_COLUMNS], diagnostics
+
+
+def read_run_parameters(paths):
+    """Start time and filtering thresholds of every ``*_summary.json``, one row per sample."""
+    rows = []
+    for path in paths:
+        with open(path) as handle:
+            run = json.load(handle)
+        rows.append({"sample": _sample(path), "start_time": run.get("start_time"), **run.get("parameters", {})})
+    return pd.DataFrame(rows) if rows else pd.DataFrame(columns=["sample", "start_time"])
+
+
+def sample_statistics(plasmids, viruses, samples, parameters=None):
+    """One row per sample: plasmid/virus counts, bases, circular contigs, gene-carrying contigs.
+
+    ``parameters`` (``read_run_parameters``) adds the run thresholds of each sample.
+    """
+    p = plasmids.assign(circular=plasmids["topology"].isin(CIRCULAR),
+                        conjugative=plasmids["n_conjugation_genes"] > 0, with_amr=plasmids["n_amr_genes"] > 0)
+    plasmid_stats = p.groupby("sample", observed=False).agg(
+        plasmid_contigs=("contig", "size"), plasmid_bp=("length", "sum"), circular_plasmids=("circular", "sum"),
+        conjugative_contigs=("conjugative", "sum"), amr_contigs=("with_amr", "sum"),
+        amr_genes=("n_amr_genes", "sum"), mean_plasmid_score=("plasmid_score", "mean"))
+    v = viruses.assign(provirus=viruses["topology"] == "Provirus")
+    virus_stats = v.groupby("sample", observed=False).agg(
+        virus_sequences=("seq_name", "size"), virus_bp=("length", "sum"), proviruses=("provirus", "sum"),
+        mean_virus_score=("virus_score", "mean"))
+    table = pd.concat([plasmid_stats, virus_stats], axis=1).reindex(samples)
+    counts = [c for c in table.columns if not c.startswith("mean_")]
+    table[counts] = table[counts].fillna(0).astype("int64")
+    table.index.name = "sample"
+    table = table.reset_index()
+    if parameters is not None and len(parameters):
+        table = table.merge(parameters.drop_duplicates("sample"), on="sample", how="left")
+    return table
+
+
+def gene_frequency(plasmids):
+    """Number of samples (and plasmid contigs) carrying each AMR / conjugation gene."""
+    frames = []
+    for column, label in (("amr_genes", "amr"), ("conjugation_genes", "conjugation")):
+        genes = plasmids[["sample", "contig", column]].dropna()
+        genes = genes.assign(gene=genes[column].str.split(";")).explode("gene")
+        counts = genes.groupby("gene").agg(samples=("sample", "nunique"), contigs=("contig", "size"))
+        frames.append(counts.reset_index().assign(type=label))
+    table = pd.concat(frames, ignore_index=True)[["type", "gene", "samples", "contigs"]]
+    return table.sort_values(["type", "samples", "gene"], ascending=[True, False, True], ignore_index=True)
+
+
+def aggregate(root=DEFAULT_INPUT, workers=None, cache=None, use_manifest_cache=True):
+    """Read every geNomad summary under ``root``.
+
+    Returns:
+        dict: ``plasmids``, ``viruses``, ``samples``, ``genes`` and
+        ``annotations`` tables, plus ``diagnostics`` of the loader.
+    """
+    manifest = Manifest(root, enabled=use_manifest_cache).refresh()
+    tables, diagnostics = {}, []
+    for kind in KINDS:
+        paths = manifest.files(tool="genomad", compartment=kind)
+        tables[kind], diag = load_kind(paths, kind, workers, cache)
+        diagnostics.append(diag.assign(kind=kind))
+    annotations, diag = load_plasmid_genes(manifest.files(tool="genomad", compartment="plasmid_genes"), workers,
+                                           cache)
+    diagnostics.append(diag.assign(kind="plasmid_genes"))
+    diagnostics = pd.concat(diagnostics, ignore_index=True)
+    samples = sorted(set(diagnostics["sample"]))
+    parameters = read_run_parameters(manifest.files(tool="genomad", compartment="run"))
+    return {"plasmids": tables["plasmid"], "viruses": tables["virus"],
+            "samples": sample_statistics(tables["plasmid"], tables["virus"], samples, parameters),
+            "genes": gene_frequency(tables["plasmid"]), "annotations": annotations, "diagnostics": diagnostics}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tổng hợp plasmid/virus từ các thư mục *_summary của geNomad")
+    parser.add_argument("--input", "-i", default=DEFAULT_INPUT, help="Thư mục genomad_out")
+    parser.add_argument("--output-dir", "-o", help="Thư mục ghi các bảng (mặc định: thư mục input)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Định dạng các bảng xuất")
+    parser.add_argument("--workers", "-w", type=int, help="Số luồng đọc file song song (mặc định: tự động)")
+    parser.add_argument("--no-cache", action="store_true", help="Đọc lại mọi file, không dùng cache")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input):
+        print(f"❌ Thư mục không tồn tại: {args.input}")
+        return 1
+    result = aggregate(args.input, args.workers, ReportCache(enabled=not args.no_cache), not args.no_cache)
+    diagnostics = result["diagnostics"]
+    if diagnostics.empty:
+        print(f"⚠️ Không tìm thấy file *_plasmid_summary.tsv / *_virus_summary.tsv trong {args.input}")
+        return 1
+    for row in diagnostics[diagnostics["status"] == "error"].itertuples():
+        print(f"⚠️ Bỏ qua file {row.path}: {row.error}")
+    if diagnostics["cached"].any():
+        print(f"♻️ {int(diagnostics['cached'].sum())}/{len(diagnostics)} file lấy từ cache")
+
+    output_dir = args.output_dir or args.input
+    os.makedirs(output_dir, exist_ok=True)
+    names = {"plasmids": "plasmids", "viruses": "viruses", "samples": "samples", "genes": "plasmid_genes",
+             "annotations": "plasmid_gene_annotations"}
+    for name, file_name in names.items():
+        path = os.path.join(output_dir, f"genomad_{file_name}.{args.format}")
+        table = result[name]
+        if args.format == "parquet":
+            table.to_parquet(path, index=False)
+        else:
+            table.to_csv(path, index=False)
+    print(f"📁 {len(result['samples'])} mẫu: {len(result['plasmids'])} contig plasmid, "
+          f"{len(result['viruses'])} trình tự virus -> {output_dir}")
+    # Run thresholds (from *_summary.json) are only written to the table
+    print(result["samples"].loc[:, :"mean_virus_score"].to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+"""Incremental updates of sample x gene (or class) presence matrices.
+
+A summary written with ``save_state`` gets a ``<output>.state.json`` sidecar
+that records the size and mtime of every report it was built from. On the
+next run ``plan_update`` compares that with the reports on disk, only the
+new or changed reports are parsed, and ``merge_presence`` folds their rows
+into the previous matrix: changed rows are replaced, rows of deleted reports
+are dropped, new genes become new columns and genes no longer present in
+any sample are removed, so the result equals a full rebuild.
+"""
+
+import json
+import os
+
+import pandas as pd
+
+STATE_SUFFIX = ".state.json"
+STATE_VERSION = 1
+
+
+def file_state(path):
+    """Return ``[size, mtime_ns]`` for ``path``."""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def scan_states(folder_path, names):
+    """Return ``{name: [size, mtime_ns]}`` for report ``names`` in ``folder_path``."""
+    return {name: file_state(os.path.join(folder_path, name)) for name in names}
+
+
+def state_path(output_path):
+    return output_path + STATE_SUFFIX
+
+
+def load_state(output_path, params=None):
+    """Return the recorded report states of ``output_path``, or None if it must be rebuilt.
+
+    The state is ignored when the output itself is missing or when it was
+    written with different ``params`` (e.g. other filter thresholds).
+    """
+    if not os.path.isfile(output_path):
+        return None
+    try:
+        with open(state_path(output_path)) as handle:
+            state = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if state.get("version") != STATE_VERSION or state.get("params") != (params or {}):
+        return None
+    return state.get("files", {})
+
+
+def save_state(output_path, states, params=None):
+    """Record the report states ``output_path`` was built from."""
+    with open(state_path(output_path), "w") as handle:
+        json.dump({"version": STATE_VERSION, "params": params or {}, "files": states}, handle, indent=1)
+
+
+def plan_update(current, previous):
+    """Compare report states.
+
+    Returns:
+        tuple[list[str], list[str]]: Reports to (re)read, and reports that
+        disappeared since the previous run.
+    """
+    previous = previous or {}
+    to_read = sorted(name for name, st in current.items() if previous.get(name) != st)
+    removed = sorted(name for name in previous if name not in current)
+    return to_read, removed
+
+
+def merge_presence(old, new, replaced, present=1, absent=0, failed_value=None, failed=()):
+    """Fold freshly built rows into a previous presence matrix.
+
+    Args:
+        old (pd.DataFrame): Previous matrix indexed by sample.
+        new (pd.DataFrame): Rows of the re-read samples, same layout.
+        replaced (iterable[str]): Samples whose old row must go (re-read or deleted).
+        present: Cell value meaning "present".
+        absent: Value for genes a sample does not have.
+        failed_value: Value filling rows of unreadable reports (e.g. ``'-'``);
+            such rows receive it in new columns too.
+        failed (iterable[str]): Samples of ``new`` known to be unreadable.
+
+    Returns:
+        pd.DataFrame: Matrix with sorted rows and columns, containing only
+        columns present in at least one sample.
+    """
+    kept = old.drop(index=[s for s in replaced if s in old.index])
+    combined = pd.concat([kept, new])
+    combined = combined.astype(object)
+    if failed_value is not None:
+        failed_rows = (combined == failed_value).any(axis=1) | combined.index.isin(list(failed))
+        combined.loc[failed_rows] = combined.loc[failed_rows].fillna(failed_value)
+    combined = combined.fillna(absent)
+
+    columns = sorted(c for c in combined.columns if (combined[c] == present).any())
+    merged = combined.reindex(index=sorted(combined.index), columns=columns)
+    merged = merged.astype(type(present))
+    merged.index.name = old.index.name or new.index.name
+    return merged
+
+
+def same_matrix(a, b):
+    """True if two matrices have the same labels, order and cell values (dtype-insensitive)."""
+    return (list(a.columns) == list(b.columns) and list(a.index) == list(b.index)
+            and (a.astype(str).to_numpy() == b.astype(str).to_numpy()).all())
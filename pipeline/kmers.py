@@ -0,0 +1,239 @@
+"""NumPy k-mer prefilter for plasmid replicon typing.
+
+Usage:
+    python -m pipeline.kmers --fasta-dir /path/to/fasta --query acinetobacterplasmidtype_feb2025.fasta
+    python -m pipeline.kmers --fasta-dir ... --recall plasmidtyping_out    # compare with a full BLAST run
+
+Most contigs share no sequence with any entry of the typing panel. The
+panel's canonical k-mers (2-bit packed into ``uint64``, default k=21) are
+kept in a sorted array; every sample's contigs are encoded the same way in
+a few vectorized passes and looked up with ``np.searchsorted``, giving the
+(contig, panel entry) pairs that share at least ``min_shared`` k-mers. Only
+those contigs and entries need to go to BLAST (``pipeline.plasmidtyping
+--prefilter``). blastn's default megablast task seeds on exact 28-mers, so
+with k <= 28 and ``min_shared=1`` every BLAST hit is also a candidate pair;
+``--recall`` checks that against existing ``*_plasmidtyping.txt`` reports.
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+K = 21
+MIN_SHARED = 1
+
+# A/C/G/T -> 0..3, anything else -> 4 (breaks k-mers)
+_CODES = np.full(256, 4, dtype=np.uint8)
+for _i, _base in enumerate(b"ACGT"):
+    _CODES[_base] = _i
+    _CODES[_base + 32] = _i
+
+
+def read_fasta(path):
+    """Return ``[(name, sequence bytes)]``; ``name`` is the first word of the header."""
+    records = []
+    name, parts = None, []
+    with open(path, "rb") as handle:
+        for line in handle:
+            if line.startswith(b">"):
+                if name is not None:
+                    records.append((name, b"".join(parts)))
+                fields = line[1:].split(None, 1)
+                name, parts = (fields[0].decode() if fields else ""), []
+            else:
+                parts.append(line.strip())
+    if name is not None:
+        records.append((name, b"".join(parts)))
+    return records
+
+
+def canonical_kmers(records, k=K, positions=False):
+    """Canonical k-mers of ``records`` and the index of the record each one comes from.
+
+    Records are joined with an ``N`` spacer so no k-mer spans two records;
+    k-mers containing a non-ACGT base are dropped.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: ``uint64`` k-mers and ``int64`` record
+        indices, plus (with ``positions``) the start of every k-mer in
+        ``b"N".join(sequences) + b"N"``.
+    """
+    if not 0 < k <= 32:
+        raise ValueError("k must be between 1 and 32")
+    seqs = [seq for _, seq in records]
+    starts = np.cumsum([0] + [len(s) + 1 for s in seqs])[:-1]
+    codes = _CODES[np.frombuffer(b"N".join(seqs) + b"N", dtype=np.uint8)]
+    n = len(codes) - k + 1
+    if n <= 0:
+        empty = (np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64))
+        return empty + (np.zeros(0, dtype=np.int64),) if positions else empty
+
+    bases = (codes & 3).astype(np.uint64)
+    complement = np.uint64(3) - bases
+    forward = np.zeros(n, dtype=np.uint64)
+    reverse = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        forward <<= np.uint64(2)
+        forward |= bases[j:j + n]
+        # The reverse complement reads the window backwards
+        reverse <<= np.uint64(2)
+        reverse |= complement[k - 1 - j:k - 1 - j + n]
+    invalid = np.concatenate(([0], np.cumsum(codes == 4)))
+    valid = (invalid[k:k + n] - invalid[:n]) == 0
+
+    starts_of = np.flatnonzero(valid)
+    kmers = np.minimum(forward[valid], reverse[valid])
+    record_index = np.searchsorted(starts, starts_of, side="right") - 1
+    return (kmers, record_index, starts_of) if positions else (kmers, record_index)
+
+
+class KmerIndex:
+    """Sorted canonical k-mers of a reference panel with the entries containing each one.
+
+    Args:
+        names (list[str]): Panel entry names.
+        kmers (np.ndarray): Sorted unique ``uint64`` k-mers.
+        offsets (np.ndarray): ``entries[offsets[i]:offsets[i + 1]]`` hold k-mer ``i``.
+        entries (np.ndarray): Panel entry indices.
+        k (int): k-mer length.
+    """
+
+    def __init__(self, names, kmers, offsets, entries, k=K):
+        self.names = list(names)
+        self.kmers = kmers
+        self.offsets = offsets
+        self.entries = entries
+        self.k = k
+
+    @classmethod
+    def from_fasta(cls, path, k=K):
+        records = read_fasta(path)
+        kmers, entry = canonical_kmers(records, k)
+        pairs = np.unique(np.stack([kmers, entry.astype(np.uint64)]), axis=1)
+        unique, first = np.unique(pairs[0], return_index=True)
+        offsets = np.append(first, pairs.shape[1]).astype(np.int64)
+        return cls([name for name, _ in records], unique, offsets, pairs[1].astype(np.int32), k)
+
+    @property
+    def nbytes(self):
+        return self.kmers.nbytes + self.offsets.nbytes + self.entries.nbytes
+
+    def candidate_pairs(self, records, min_shared=MIN_SHARED):
+        """(record, panel entry) pairs sharing at least ``min_shared`` canonical k-mers.
+
+        Returns:
+            pd.DataFrame: ``record`` (index into ``records``), ``entry`` (panel
+            index) and ``shared`` (number of shared k-mer positions).
+        """
+        kmers, record_index = canonical_kmers(records, self.k)
+        slot = np.searchsorted(self.kmers, kmers)
+        slot[slot == len(self.kmers)] = 0
+        hit = self.kmers[slot] == kmers if len(self.kmers) else np.zeros(len(kmers), dtype=bool)
+        slot, record_index = slot[hit], record_index[hit]
+
+        # Expand every hit to all panel entries containing that k-mer
+        starts, stops = self.offsets[slot], self.offsets[slot + 1]
+        counts = stops - starts
+        rows = np.repeat(record_index, counts)
+        cumulative = np.cumsum(counts)
+        within = np.arange(cumulative[-1] if len(cumulative) else 0) - np.repeat(cumulative - counts, counts)
+        entries = self.entries[np.repeat(starts, counts) + within]
+
+        pairs = pd.DataFrame({"record": rows, "entry": entries})
+        pairs = pairs.groupby(["record", "entry"]).size().rename("shared").reset_index()
+        return pairs[pairs["shared"] >= min_shared].reset_index(drop=True)
+
+    def save(self, path):
+        np.savez_compressed(path, names=np.array(self.names, dtype=str), kmers=self.kmers,
+                            offsets=self.offsets, entries=self.entries, k=self.k)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["names"].tolist(), data["kmers"], data["offsets"], data["entries"], int(data["k"]))
+
+
+def screen_samples(index, assemblies, min_shared=MIN_SHARED):
+    """Candidate (sample, contig, panel entry) pairs for every assembly.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Candidate pairs (``sample``,
+        ``contig``, ``entry`` name, ``shared``), and per-sample totals
+        (``contigs``, ``bases``, ``candidate_contigs``, ``candidate_bases``).
+    """
+    frames, totals = [], []
+    for sample, path in assemblies.items():
+        records = read_fasta(path)
+        pairs = index.candidate_pairs(records, min_shared)
+        names = np.array([name for name, _ in records], dtype=object)
+        lengths = np.array([len(seq) for _, seq in records], dtype=np.int64)
+        frames.append(pd.DataFrame({"sample": sample, "contig": names[pairs["record"].to_numpy()],
+                                    "entry": np.array(index.names, dtype=object)[pairs["entry"].to_numpy()],
+                                    "shared": pairs["shared"].to_numpy()}))
+        kept = np.unique(pairs["record"].to_numpy())
+        totals.append((sample, len(records), int(lengths.sum()), len(kept), int(lengths[kept].sum())))
+    candidates = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["sample", "contig", "entry", "shared"])
+    return candidates, pd.DataFrame(totals, columns=["sample", "contigs", "bases", "candidate_contigs",
+                                                     "candidate_bases"])
+
+
+def recall(candidates, reports_dir, samples, suffix="_plasmidtyping.txt"):
+    """Fraction of the BLAST hits in ``reports_dir`` whose (sample, contig, entry) is a candidate.
+
+    Returns:
+        tuple[float, pd.DataFrame]: Recall over hits, and the missed hits.
+    """
+    frames = []
+    for sample in samples:
+        path = os.path.join(reports_dir, f"{sample}{suffix}")
+        if os.path.exists(path) and os.path.getsize(path):
+            hits = pd.read_csv(path, sep="\t", header=None, usecols=[0, 1, 2, 3], names=["entry", "contig",
+                                                                                          "pident", "length"])
+            frames.append(hits.assign(sample=sample))
+    if not frames:
+        return float("nan"), pd.DataFrame()
+    hits = pd.concat(frames, ignore_index=True)
+    keys = pd.MultiIndex.from_frame(candidates[["sample", "contig", "entry"]])
+    found = pd.MultiIndex.from_frame(hits[["sample", "contig", "entry"]]).isin(keys)
+    return float(found.mean()), hits[~found]
+
+
+def main(argv=None):
+    from pipeline.plasmidtyping import DEFAULT_FASTA_DIR, DEFAULT_QUERY, list_assemblies
+
+    parser = argparse.ArgumentParser(description="K-mer prefilter for plasmid replicon typing")
+    parser.add_argument("--fasta-dir", default=DEFAULT_FASTA_DIR, help="Folder of <sample>.fasta assemblies")
+    parser.add_argument("--query", default=DEFAULT_QUERY, help="Plasmid typing panel FASTA")
+    parser.add_argument("-k", type=int, default=K, help="k-mer length (<= 28 keeps every megablast hit)")
+    parser.add_argument("--min-shared", type=int, default=MIN_SHARED, help="Minimum shared k-mers per pair")
+    parser.add_argument("--output", "-o", help="Write the candidate pairs to this TSV")
+    parser.add_argument("--recall", metavar="REPORTS_DIR",
+                        help="Folder of full-BLAST *_plasmidtyping.txt reports to measure recall against")
+    args = parser.parse_args(argv)
+
+    assemblies = list_assemblies(args.fasta_dir)
+    if not assemblies:
+        print(f"Error: No .fasta files found in {args.fasta_dir}")
+        return 1
+    index = KmerIndex.from_fasta(args.query, args.k)
+    print(f"Panel: {len(index.names)} entries, {len(index.kmers)} distinct {args.k}-mers "
+          f"({index.nbytes / 1e6:.1f} MB)")
+    candidates, totals = screen_samples(index, assemblies, args.min_shared)
+    print(f"Candidate contigs: {totals['candidate_contigs'].sum()}/{totals['contigs'].sum()} "
+          f"({totals['candidate_bases'].sum() / max(totals['bases'].sum(), 1):.1%} of bases), "
+          f"{len(candidates)} contig/entry pairs")
+    if args.output:
+        candidates.to_csv(args.output, sep="\t", index=False)
+    if args.recall:
+        value, missed = recall(candidates, args.recall, list(assemblies))
+        print(f"Recall against {args.recall}: {value:.2%} of the BLAST hits ({len(missed)} missed)")
+        if len(missed):
+            print(missed.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,241 @@
+"""Sample manifest: every tool output of the project tree found in one scan.
+
+Usage:
+    python -m pipeline.manifest [ROOT]          # print sample x tool/compartment counts
+    python -m pipeline.manifest ROOT --full     # re-list every folder
+
+``Manifest(root).refresh()`` walks ``root`` once with ``os.scandir``, listing
+the folders of each level concurrently (network file systems answer many
+small requests in parallel much faster than one after another), and
+classifies every file by its name into (sample, compartment, tool), e.g.
+``ERR5770797_convert_plasmid_amrfinder.txt`` -> (``ERR5770797``,
+``plasmid``, ``amrfinder``). The listing is cached as JSON with the mtime
+of every folder; the next ``refresh`` only re-lists folders whose mtime
+changed (a file was added, removed or renamed), so an unchanged tree costs
+one ``stat`` per folder. Sizes/mtimes of files in unchanged folders are
+those of the last listing; ``refresh(full=True)`` re-lists everything.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_DIR = os.environ.get("PIPELINE_MANIFEST_DIR", os.path.join(ROOT, ".cache", "manifest"))
+WORKERS = 16
+
+# File name suffix -> (tool, compartment); the longest matching suffix wins
+RULES = {
+    "_convert_chromosome_amrfinder.txt": ("amrfinder", "chromosome"),
+    "_convert_plasmid_amrfinder.txt": ("amrfinder", "plasmid"),
+    "_chromosome_amrfinder.txt": ("amrfinder", "chromosome"),
+    "_plasmid_amrfinder.txt": ("amrfinder", "plasmid"),
+    "_amrfinder.txt": ("amrfinder", "genome"),
+    "_vfdb.csv": ("abricate", "genome"),
+    "_plasmidtyping.txt": ("plasmidtyping", "genome"),
+    "_mlst.tsv": ("mlst", "genome"),
+    ".chromosome.fasta": ("platon", "chromosome"),
+    ".plasmid.fasta": ("platon", "plasmid"),
+    "_convert_chromosome.fasta": ("platon_convert", "chromosome"),
+    "_convert_plasmid.fasta": ("platon_convert", "plasmid"),
+    "_plasmid_summary.tsv": ("genomad", "plasmid"),
+    "_virus_summary.tsv": ("genomad", "virus"),
+    "_plasmid_genes.tsv": ("genomad", "plasmid_genes"),
+    "_summary.json": ("genomad", "run"),
+}
+_SUFFIXES = sorted(RULES, key=len, reverse=True)
+# Folders never descended into
+SKIP_DIRS = {"__pycache__", "node_modules"}
+
+ManifestEntry = namedtuple("ManifestEntry", ["sample", "compartment", "tool", "path", "size", "mtime_ns"])
+
+
+def classify(rel_path):
+    """Return ``(sample, compartment, tool)`` for a path relative to the root, or None."""
+    folder, name = os.path.split(rel_path)
+    for suffix in _SUFFIXES:
+        if name.endswith(suffix) and len(name) > len(suffix):
+            tool, compartment = RULES[suffix]
+            return name[: -len(suffix)], compartment, tool
+    parent = os.path.basename(folder)
+    if name == "report.tsv" and parent.endswith("_quast"):
+        return parent[: -len("_quast")], "genome", "quast"
+    return None
+
+
+def _list_dir(path):
+    """Return ``(mtime_ns, {file: [size, mtime_ns]}, [subdirs])`` of one folder."""
+    files, subdirs = {}, []
+    mtime = os.stat(path).st_mtime_ns
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not entry.name.startswith(".") and entry.name not in SKIP_DIRS:
+                    subdirs.append(entry.name)
+            elif entry.is_file():
+                st = entry.stat()
+                files[entry.name] = [st.st_size, st.st_mtime_ns]
+    return mtime, files, sorted(subdirs)
+
+
+class Manifest:
+    """Cached listing of the tool outputs under ``root``.
+
+    Args:
+        root (str): Project or tool output folder.
+        cache_path (str | None): JSON file of the cached listing; by default
+            one file per root in ``DEFAULT_MANIFEST_DIR``.
+        enabled (bool): False ignores (and does not write) the cached listing.
+        workers (int): Folders listed concurrently.
+    """
+
+    def __init__(self, root, cache_path=None, enabled=True, workers=WORKERS):
+        self.root = os.path.abspath(root)
+        if cache_path is None:
+            digest = hashlib.sha1(self.root.encode()).hexdigest()[:20]
+            cache_path = os.path.join(DEFAULT_MANIFEST_DIR, f"{digest}.json")
+        self.cache_path = cache_path
+        self.enabled = enabled
+        self.workers = workers
+        self.dirs = {}
+        self.listed = 0
+        if enabled:
+            try:
+                with open(cache_path) as handle:
+                    data = json.load(handle)
+                if data.get("version") == MANIFEST_VERSION and data.get("root") == self.root:
+                    self.dirs = data["dirs"]
+            except (OSError, ValueError, KeyError):
+                self.dirs = {}
+
+    def refresh(self, full=False):
+        """Re-list new or changed folders, drop vanished ones and save the cache.
+
+        Returns:
+            Manifest: ``self``; ``self.listed`` is the number of folders listed.
+        """
+        previous = {} if full else self.dirs
+        dirs, level, self.listed = {}, ["."], 0
+
+        def visit(rel):
+            path = os.path.normpath(os.path.join(self.root, rel))
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                return rel, None, False
+            known = previous.get(rel)
+            if known is not None and known["mtime_ns"] == mtime:
+                return rel, known, False
+            try:
+                mtime, files, subdirs = _list_dir(path)
+            except OSError:
+                return rel, None, False
+            return rel, {"mtime_ns": mtime, "files": files, "subdirs": subdirs}, True
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while level:
+                next_level = []
+                for rel, info, listed in pool.map(visit, level):
+                    if info is None:
+                        continue
+                    dirs[rel] = info
+                    self.listed += listed
+                    next_level.extend(os.path.normpath(os.path.join(rel, name)) for name in info["subdirs"])
+                level = next_level
+        self.dirs = dirs
+        self.save()
+        return self
+
+    def save(self):
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as handle:
+                json.dump({"version": MANIFEST_VERSION, "root": self.root, "dirs": self.dirs}, handle)
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            # An unwritable cache only means a full scan next time
+            pass
+
+    def iter_files(self):
+        """Yield ``(relative path, size, mtime_ns)`` of every listed file."""
+        for rel, info in self.dirs.items():
+            for name, (size, mtime) in info["files"].items():
+                yield os.path.normpath(os.path.join(rel, name)), size, mtime
+
+    @property
+    def entries(self):
+        """Classified files as ``ManifestEntry`` tuples sorted by path."""
+        entries = []
+        for rel, size, mtime in self.iter_files():
+            kind = classify(rel)
+            if kind is not None:
+                entries.append(ManifestEntry(*kind, os.path.join(self.root, rel), size, mtime))
+        return sorted(entries, key=lambda e: e.path)
+
+    def files(self, tool=None, compartment=None, sample=None, suffix=None):
+        """Paths of the entries matching every given field (``suffix`` matches the file name)."""
+        if suffix is not None:
+            return sorted(os.path.join(self.root, rel) for rel, _, _ in self.iter_files() if rel.endswith(suffix)
+                          and len(os.path.basename(rel)) > len(suffix))
+        return [e.path for e in self.entries
+                if (tool is None or e.tool == tool) and (compartment is None or e.compartment == compartment)
+                and (sample is None or e.sample == sample)]
+
+    def nested(self):
+        """``{sample: {compartment: {tool: [ManifestEntry, ...]}}}``."""
+        tree = {}
+        for e in self.entries:
+            tree.setdefault(e.sample, {}).setdefault(e.compartment, {}).setdefault(e.tool, []).append(e)
+        return tree
+
+    def table(self):
+        """Number of files per sample (rows) and ``tool/compartment`` (columns)."""
+        entries = pd.DataFrame(self.entries, columns=ManifestEntry._fields)
+        if entries.empty:
+            return pd.DataFrame()
+        entries["output"] = entries["tool"] + "/" + entries["compartment"]
+        return pd.crosstab(entries["sample"], entries["output"])
+
+
+def report_names(folder, suffix, use_cache=True):
+    """Sorted paths, relative to ``folder``, of the files under ``folder`` whose name ends with ``suffix``."""
+    manifest = Manifest(folder, enabled=use_cache).refresh()
+    return sorted(os.path.relpath(path, manifest.root) for path in manifest.files(suffix=suffix))
+
+
+def scan(root, use_cache=True, full=False):
+    """Return the refreshed ``Manifest`` of ``root``."""
+    return Manifest(root, enabled=use_cache).refresh(full=full)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List the tool outputs of every sample")
+    parser.add_argument("root", nargs="?", default=ROOT, help="Project or tool output folder")
+    parser.add_argument("--full", action="store_true", help="Re-list every folder instead of only changed ones")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the cached listing")
+    parser.add_argument("--output", "-o", help="Write every classified file (with size/mtime) to this CSV")
+    args = parser.parse_args(argv)
+
+    manifest = Manifest(args.root, enabled=not args.no_cache).refresh(full=args.full)
+    entries = manifest.entries
+    print(f"{manifest.root}: {len(manifest.dirs)} folders ({manifest.listed} listed), {len(entries)} tool outputs")
+    table = manifest.table()
+    if not table.empty:
+        print(table.to_string())
+    if args.output:
+        pd.DataFrame(entries, columns=ManifestEntry._fields).to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
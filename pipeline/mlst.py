@@ -0,0 +1,237 @@
+"""MLST typing table and ST / clonal complex frequencies from ``*_mlst.tsv`` files.
+
+Usage:
+    python -m pipeline.mlst                          # ST_analysis/mlst -> ST_analysis/st_*.csv
+    python -m pipeline.mlst --full                   # re-read every file
+    python -m pipeline.mlst --cc-map cc.csv          # ST,CC table instead of the computed complexes
+
+``mlst.sh`` keeps only the file and ST columns (``cut -f1,3``); the full
+``mlst`` output (file, scheme, ST, ``gpi(1)``-style alleles) is read too,
+and its allele profiles are used to group STs into clonal complexes: STs
+differing at no more than ``max_diff`` loci (single-locus variants by
+default) are linked and every connected group is named after its most
+frequent ST (``CC2``). The per-sample table is written with an
+``incremental`` state sidecar, so a new sample costs one small file read;
+the frequency tables are ``groupby`` counts of that table.
+"""
+
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from pipeline.incremental import load_state, plan_update, save_state, scan_states
+from pipeline.manifest import classify, report_names
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_SUFFIX = "_mlst.tsv"
+DEFAULT_INPUT = os.path.join(ROOT, "ST_analysis", "mlst")
+DEFAULT_OUTPUT_DIR = os.path.join(ROOT, "ST_analysis")
+SAMPLES_OUTPUT = "st_samples.csv"
+ST_OUTPUT = "st_frequency.csv"
+CC_OUTPUT = "cc_frequency.csv"
+
+BASE_COLUMNS = ["report", "sample", "file", "scheme", "ST"]
+UNTYPED = "untyped"
+SINGLETON = "singleton"
+# One allele call of the full mlst output, e.g. ``gpi(1)``, ``gdhB(~3)``, ``cpn60(-)``
+ALLELE_PATTERN = re.compile(r"^(?P<locus>[^()]+)\((?P<allele>[^()]*)\)$")
+
+
+def read_mlst(path):
+    """Read one mlst output file (``cut -f1,3`` or full) into one row per typed assembly.
+
+    Returns:
+        pd.DataFrame: ``BASE_COLUMNS`` plus one string column per locus of
+        the full output.
+    """
+    report = os.path.basename(path)
+    kind = classify(report)
+    rows = []
+    with open(path) as handle:
+        for line in handle:
+            fields = line.rstrip("\r\n").split("\t")
+            if not line.strip() or fields[0] == "FILE":
+                continue
+            sample = kind[0] if kind else os.path.splitext(os.path.basename(fields[0]))[0]
+            if len(fields) == 2:
+                row = {"file": fields[0], "scheme": "", "ST": fields[1]}
+            else:
+                row = {"file": fields[0], "scheme": fields[1], "ST": fields[2] if len(fields) > 2 else ""}
+                for call in fields[3:]:
+                    match = ALLELE_PATTERN.match(call)
+                    if match:
+                        row[match["locus"]] = match["allele"]
+            rows.append(dict(report=report, sample=sample, **row))
+    return pd.DataFrame(rows, columns=BASE_COLUMNS if not rows else None).astype(str)
+
+
+def st_label(st):
+    """``"2"`` -> ``"ST2"``; novel/failed calls (``-``, ``~``, empty) -> ``UNTYPED``."""
+    st = str(st).strip()
+    return f"ST{st}" if st.isdigit() else UNTYPED
+
+
+def list_reports(folder_path, suffix=REPORT_SUFFIX):
+    return report_names(folder_path, suffix)
+
+
+def read_reports(folder_path, names):
+    frames = [read_mlst(os.path.join(folder_path, name)) for name in names]
+    frames = [f for f in frames if not f.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=BASE_COLUMNS)
+
+
+def update_samples(folder_path, output_file, incremental=True):
+    """Per-sample typing table of ``folder_path``, re-reading only new/changed reports.
+
+    The table is written to ``output_file`` with a state sidecar; without
+    a usable previous state every report is read.
+
+    Returns:
+        tuple[pd.DataFrame, int]: The table sorted by report, and the number
+        of reports read.
+    """
+    names = list_reports(folder_path)
+    states = scan_states(folder_path, names)
+    previous = load_state(output_file) if incremental else None
+    if previous is None:
+        to_read, old = names, pd.DataFrame(columns=BASE_COLUMNS)
+    else:
+        to_read, removed = plan_update(states, previous)
+        old = pd.read_csv(output_file, dtype=str, keep_default_na=False)
+        old = old[~old["report"].isin(to_read + removed)]
+    table = pd.concat([old, read_reports(folder_path, to_read)], ignore_index=True).fillna("")
+    table = table.sort_values("report", kind="stable").reset_index(drop=True)
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    table.to_csv(output_file, index=False)
+    save_state(output_file, states)
+    return table, len(to_read)
+
+
+def allele_profiles(table):
+    """Numeric allele profile (rows = ST number) of every typed ST with a complete profile."""
+    loci = [c for c in table.columns if c not in BASE_COLUMNS]
+    if not loci:
+        return pd.DataFrame()
+    typed = table[table["ST"].str.fullmatch(r"\d+")]
+    profiles = typed.drop_duplicates("ST").set_index("ST")[loci].apply(pd.to_numeric, errors="coerce")
+    profiles = profiles.dropna()
+    profiles.index = profiles.index.astype(int)
+    return profiles.astype(np.int64).sort_index()
+
+
+def clonal_complexes(profiles, counts, max_diff=1):
+    """Group STs linked through profiles differing at <= ``max_diff`` loci.
+
+    Args:
+        profiles (pd.DataFrame): ST number x locus allele numbers.
+        counts (pd.Series): Number of samples per ST number (names the groups).
+        max_diff (int): Maximum differing loci for a link (1 = single-locus variants).
+
+    Returns:
+        pd.Series: ST number -> ``CC<founder>``, or ``SINGLETON`` for STs without links.
+    """
+    sts = profiles.index.to_numpy()
+    values = profiles.to_numpy()
+    parent = np.arange(len(sts))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Pairwise differing loci, in row blocks to bound memory
+    for start in range(0, len(sts), 1024):
+        diff = (values[start:start + 1024, None, :] != values[None, :, :]).sum(axis=2)
+        for i, j in zip(*np.nonzero(diff <= max_diff)):
+            a, b = root(start + i), root(j)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+
+    groups = pd.DataFrame({"ST": sts, "group": [root(i) for i in range(len(sts))],
+                           "count": counts.reindex(sts).fillna(0).to_numpy()})
+    founders = (groups.sort_values(["group", "count", "ST"], ascending=[True, False, True])
+                .drop_duplicates("group").set_index("group")["ST"])
+    sizes = groups["group"].map(groups["group"].value_counts())
+    labels = np.where(sizes > 1, "CC" + groups["group"].map(founders).astype(str), SINGLETON)
+    return pd.Series(labels, index=sts, name="CC")
+
+
+def assign_cc(table, cc_map=None, max_diff=1):
+    """Return the clonal complex of every row of ``table`` (empty when unknown).
+
+    ``cc_map`` (ST number -> CC) takes precedence over complexes computed
+    from the allele profiles.
+    """
+    st_numbers = pd.to_numeric(table["ST"].where(table["ST"].str.fullmatch(r"\d+")), errors="coerce")
+    cc = pd.Series("", index=table.index, dtype=object)
+    profiles = allele_profiles(table)
+    if not profiles.empty:
+        computed = clonal_complexes(profiles, st_numbers.value_counts(), max_diff)
+        cc = st_numbers.map(computed).fillna("")
+    if cc_map is not None:
+        cc = st_numbers.map(cc_map).fillna(cc).fillna("")
+    return cc
+
+
+def frequency(labels, name):
+    """Count and percentage of every label, most frequent first (ties in order of first appearance)."""
+    counts = labels.groupby(labels, sort=False).size()
+    counts = counts.sort_values(ascending=False, kind="stable")
+    return pd.DataFrame({name: counts.index, "count": counts.to_numpy(),
+                         "percent": (100 * counts / counts.sum()).round(2).to_numpy()})
+
+
+def st_frequency(table):
+    """ST frequency table (``ST``, ``count``, ``percent``) of a per-sample table."""
+    return frequency(table["ST"].map(st_label), "ST")
+
+
+def cc_frequency(table, cc_map=None, max_diff=1):
+    """Clonal complex frequency table; empty without allele profiles or ``cc_map``."""
+    cc = assign_cc(table, cc_map, max_diff)
+    cc = cc[cc != ""]
+    return frequency(cc, "CC") if not cc.empty else pd.DataFrame(columns=["CC", "count", "percent"])
+
+
+def read_cc_map(path):
+    """Read a two-column ``ST,CC`` CSV into an ST number -> CC Series."""
+    df = pd.read_csv(path, dtype=str)
+    st = pd.to_numeric(df.iloc[:, 0].str.replace("ST", "", regex=False), errors="coerce")
+    return pd.Series(df.iloc[:, 1].to_numpy(), index=st).dropna()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tần suất ST và clonal complex từ các file *_mlst.tsv")
+    parser.add_argument("--input", "-i", default=DEFAULT_INPUT, help="Thư mục chứa các file *_mlst.tsv")
+    parser.add_argument("--output-dir", "-o", default=DEFAULT_OUTPUT_DIR, help="Thư mục ghi các bảng kết quả")
+    parser.add_argument("--full", action="store_true", help="Đọc lại mọi file thay vì chỉ file mới/thay đổi")
+    parser.add_argument("--cc-map", help="File CSV hai cột ST,CC (ưu tiên hơn CC tính từ allele)")
+    parser.add_argument("--max-diff", type=int, default=1, help="Số locus khác nhau tối đa để nối hai ST")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input):
+        print(f"❌ Thư mục không tồn tại: {args.input}")
+        return 1
+    table, read = update_samples(args.input, os.path.join(args.output_dir, SAMPLES_OUTPUT), not args.full)
+    print(f"📁 {len(table)} mẫu ({read} file mới/thay đổi được đọc)")
+    sts = st_frequency(table)
+    sts.to_csv(os.path.join(args.output_dir, ST_OUTPUT), index=False)
+    print(sts.to_string(index=False))
+
+    ccs = cc_frequency(table, read_cc_map(args.cc_map) if args.cc_map else None, args.max_diff)
+    if ccs.empty:
+        print("ℹ️ Không có allele profile (mlst.sh dùng cut -f1,3) hay --cc-map: bỏ qua clonal complex.")
+    else:
+        ccs.to_csv(os.path.join(args.output_dir, CC_OUTPUT), index=False)
+        print(ccs.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,273 @@
+"""In-process MLST allele calling of a batch of assemblies (exact matches).
+
+Usage:
+    python -m pipeline.mlst_caller --scheme-dir /path/to/mlst/db/pubmlst/abaumannii_2
+    python -m pipeline.mlst_caller --fasta-dir /home/kien1211/Downloads/fasta --workers 8 --full
+
+``mlst.sh`` starts ``mlst`` (and its BLAST search) once per assembly. Here
+the scheme (``<locus>.tfa`` allele files and the ``<scheme>.txt`` profile
+table of the mlst database) is loaded once: the canonical k-mer of the
+first ``k`` bases of every allele goes into a sorted array. Each assembly
+is read through ``mmap``, its canonical k-mers are screened with a bitmap
+of the anchors' low bits, the survivors looked up with ``np.searchsorted``
+and every anchor hit is checked by comparing the
+allele (forward, or reverse complement on the other strand) with the bytes
+at that position. A locus is called when one or more alleles match exactly
+(``1,4`` when several do, ``-`` when none); the ST is looked up in the
+profiles when every locus has exactly one allele. Novel or partial alleles
+are not searched for: where mlst writes ``~1`` (novel allele) or ``1?``
+(partial match) in the ``--full`` allele columns, this caller writes ``-``,
+and the ST is ``-`` for those samples.
+Assemblies are typed in parallel by a process pool whose workers each
+receive the scheme once.
+
+Outputs are ``<output-dir>/<sample>_mlst.tsv`` like mlst.sh (file and ST,
+or the full mlst line with ``--full``). The default output folder is
+``ST_analysis/mlst_inprocess``, so the committed ``ST_analysis/mlst``
+reports of the mlst tool, which ``benchmarks/bench_mlst_caller.py`` compares
+against, are never overwritten.
+"""
+
+import argparse
+import mmap
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from pipeline.kmers import K, canonical_kmers
+from pipeline.mlst import DEFAULT_INPUT, REPORT_SUFFIX
+from pipeline.plasmidtyping import DEFAULT_FASTA_DIR, list_assemblies
+
+SCHEME = "abaumannii_2"
+# Next to the mlst reports, not over them
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(DEFAULT_INPUT), "mlst_inprocess")
+NO_CALL = "-"
+# Low bits of an anchor k-mer marked in a bitmap that screens assembly k-mers before the binary search
+BUCKET_BITS = 22
+_COMPLEMENT = bytes.maketrans(b"ACGTN", b"TGCAN")
+
+
+def reverse_complement(seq):
+    return seq.translate(_COMPLEMENT)[::-1]
+
+
+def read_assembly(path):
+    """Return ``[(name, uppercase sequence bytes)]`` of a FASTA file read through ``mmap``."""
+    records = []
+    with open(path, "rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return records
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = data.find(b">")
+            while start != -1:
+                header_end = data.find(b"\n", start)
+                if header_end == -1:
+                    header_end = len(data)
+                end = data.find(b"\n>", header_end)
+                stop = len(data) if end == -1 else end
+                fields = data[start + 1:header_end].split(None, 1)
+                seq = data[header_end + 1:stop].translate(None, b"\r\n\t ").upper()
+                records.append((fields[0].decode() if fields else "", seq))
+                start = -1 if end == -1 else end + 1
+    return records
+
+
+def read_alleles(path):
+    """Return ``[(allele number, sequence)]`` of a ``<locus>.tfa`` file (headers ``>cpn60_12``)."""
+    with open(path, "rb") as handle:
+        records, name, parts = [], None, []
+        for line in handle:
+            if line.startswith(b">"):
+                if name is not None:
+                    records.append((name, b"".join(parts).upper()))
+                name, parts = line[1:].split()[0].decode().rsplit("_", 1)[-1], []
+            else:
+                parts.append(line.strip())
+        if name is not None:
+            records.append((name, b"".join(parts).upper()))
+    return records
+
+
+def find_scheme_dir(scheme=SCHEME):
+    """Locate ``db/pubmlst/<scheme>`` of the installed ``mlst``, or None."""
+    executable = shutil.which("mlst")
+    if executable is None:
+        return None
+    base = os.path.dirname(os.path.dirname(os.path.realpath(executable)))
+    for folder in (os.path.join(base, "db", "pubmlst", scheme),
+                   os.path.join(base, "share", "mlst", "db", "pubmlst", scheme)):
+        if os.path.isdir(folder):
+            return folder
+    return None
+
+
+def scheme_files(scheme=SCHEME):
+    """``<scheme>.txt`` and the ``*.tfa`` files of the installed scheme (empty when not found)."""
+    scheme_dir = find_scheme_dir(scheme)
+    if scheme_dir is None:
+        return []
+    names = sorted(n for n in os.listdir(scheme_dir) if n.endswith(".tfa") or n == f"{scheme}.txt")
+    return [os.path.join(scheme_dir, n) for n in names]
+
+
+def _allele_order(allele):
+    return (0, int(allele), "") if allele.isdigit() else (1, 0, allele)
+
+
+class MlstScheme:
+    """Alleles and profiles of one MLST scheme with an exact-match anchor index.
+
+    Args:
+        name (str): Scheme name (second column of the full output).
+        loci (list[str]): Loci in profile order.
+        alleles (dict): ``{locus: [(allele number, sequence bytes)]}``.
+        profiles (dict): ``{(allele numbers in locus order): ST}``.
+        k (int): Anchor k-mer length; shorter alleles are ignored.
+    """
+
+    def __init__(self, name, loci, alleles, profiles, k=K):
+        self.name = name
+        self.loci = list(loci)
+        self.profiles = profiles
+        self.k = k
+        self.locus, self.allele, self.seqs = [], [], []
+        for index, locus in enumerate(self.loci):
+            for allele, seq in alleles.get(locus, []):
+                if len(seq) >= k:
+                    self.locus.append(index)
+                    self.allele.append(allele)
+                    self.seqs.append(seq)
+        self.revcomps = [reverse_complement(seq) for seq in self.seqs]
+
+        anchors, entry = canonical_kmers([("", seq[:k]) for seq in self.seqs], k)
+        order = np.argsort(anchors, kind="stable")
+        self.anchors, self.entries = anchors[order], entry[order]
+        self.buckets = np.zeros(1 << BUCKET_BITS, dtype=bool)
+        self.buckets[self.anchors & np.uint64((1 << BUCKET_BITS) - 1)] = True
+
+    @classmethod
+    def load(cls, scheme_dir, k=K):
+        """Read ``<scheme_dir>/<scheme>.txt`` and the ``<locus>.tfa`` file of every locus."""
+        name = os.path.basename(os.path.normpath(scheme_dir))
+        with open(os.path.join(scheme_dir, f"{name}.txt")) as handle:
+            header = handle.readline().rstrip("\r\n").split("\t")
+            loci = [c for c in header[1:] if os.path.exists(os.path.join(scheme_dir, f"{c}.tfa"))]
+            columns = [header.index(locus) for locus in loci]
+            profiles = {}
+            for line in handle:
+                fields = line.rstrip("\r\n").split("\t")
+                if len(fields) > max(columns):
+                    profiles[tuple(fields[c] for c in columns)] = fields[0]
+        alleles = {locus: read_alleles(os.path.join(scheme_dir, f"{locus}.tfa")) for locus in loci}
+        return cls(name, loci, alleles, profiles, k)
+
+    def call(self, records):
+        """Call every locus of one assembly.
+
+        Returns:
+            tuple[str, list[str]]: The ST (``-`` when untyped) and the allele
+            call of each locus (``"3"``, ``"3,7"`` or ``-``).
+        """
+        joined = b"N".join(seq for _, seq in records) + b"N"
+        kmers, _, positions = canonical_kmers(records, self.k, positions=True)
+        screened = np.flatnonzero(self.buckets[kmers & np.uint64((1 << BUCKET_BITS) - 1)])
+        kmers, positions = kmers[screened], positions[screened]
+        left = np.searchsorted(self.anchors, kmers, side="left")
+        right = np.searchsorted(self.anchors, kmers, side="right")
+
+        found = [set() for _ in self.loci]
+        k = self.k
+        for i in np.flatnonzero(right > left):
+            pos = int(positions[i])
+            for entry in self.entries[left[i]:right[i]]:
+                seq, size = self.seqs[entry], len(self.seqs[entry])
+                if joined[pos:pos + size] == seq or (
+                        pos + k >= size and joined[pos + k - size:pos + k] == self.revcomps[entry]):
+                    found[self.locus[entry]].add(self.allele[entry])
+
+        calls = [",".join(sorted(alleles, key=_allele_order)) if alleles else NO_CALL for alleles in found]
+        st = NO_CALL
+        if all(len(alleles) == 1 for alleles in found):
+            st = self.profiles.get(tuple(calls), NO_CALL)
+        return st, calls
+
+    def format(self, path, st, calls, full=False):
+        """One mlst output line: ``FILE<TAB>ST`` (mlst.sh's ``cut -f1,3``) or the full line."""
+        if not full:
+            return f"{path}\t{st}\n"
+        alleles = "\t".join(f"{locus}({call})" for locus, call in zip(self.loci, calls))
+        return f"{path}\t{self.name}\t{st}\t{alleles}\n"
+
+
+_WORKER_SCHEME = None
+
+
+def _init_worker(scheme):
+    global _WORKER_SCHEME
+    _WORKER_SCHEME = scheme
+
+
+def _type_file(path):
+    return path, _WORKER_SCHEME.call(read_assembly(path))
+
+
+def type_assemblies(scheme, paths, workers=1):
+    """Type every assembly of ``paths``.
+
+    Returns:
+        dict: ``{path: (ST, allele calls)}`` in the order of ``paths``.
+    """
+    if workers <= 1 or len(paths) <= 1:
+        return {path: scheme.call(read_assembly(path)) for path in paths}
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths)), initializer=_init_worker,
+                             initargs=(scheme,)) as pool:
+        return dict(pool.map(_type_file, paths))
+
+
+def write_reports(scheme, results, output_dir, full=False):
+    """Write ``<output_dir>/<sample>_mlst.tsv`` for every typed assembly; return the paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for path, (st, calls) in results.items():
+        sample = os.path.splitext(os.path.basename(path))[0]
+        output = os.path.join(output_dir, f"{sample}{REPORT_SUFFIX}")
+        with open(output, "w") as handle:
+            handle.write(scheme.format(path, st, calls, full))
+        written.append(output)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gọi allele MLST và ST cho cả lô assembly trong một tiến trình")
+    parser.add_argument("--scheme-dir", default=find_scheme_dir(),
+                        help=f"Thư mục scheme của mlst (db/pubmlst/{SCHEME}: <locus>.tfa và {SCHEME}.txt)")
+    parser.add_argument("--fasta-dir", default=DEFAULT_FASTA_DIR, help="Thư mục chứa các file <sample>.fasta")
+    parser.add_argument("--pattern", default="ERR", help="Chỉ gõ các file bắt đầu bằng tiền tố này (như ERR*.fasta)")
+    parser.add_argument("--output-dir", "-o", default=DEFAULT_OUTPUT, help="Thư mục ghi các file *_mlst.tsv")
+    parser.add_argument("--workers", "-j", type=int, default=os.cpu_count() or 1, help="Số tiến trình song song")
+    parser.add_argument("--full", action="store_true", help="Ghi cả scheme và allele (như mlst không qua cut)")
+    parser.add_argument("-k", type=int, default=K, help="Độ dài k-mer neo đầu mỗi allele")
+    args = parser.parse_args(argv)
+
+    if not args.scheme_dir or not os.path.isdir(args.scheme_dir):
+        print(f"❌ Không tìm thấy thư mục scheme: {args.scheme_dir} (dùng --scheme-dir)")
+        return 1
+    paths = [path for sample, path in list_assemblies(args.fasta_dir).items() if sample.startswith(args.pattern)]
+    if not paths:
+        print(f"❌ Không có file {args.pattern}*.fasta trong {args.fasta_dir}")
+        return 1
+
+    scheme = MlstScheme.load(args.scheme_dir, args.k)
+    print(f"📚 {scheme.name}: {len(scheme.loci)} locus, {len(scheme.seqs)} allele, {len(scheme.profiles)} ST")
+    results = type_assemblies(scheme, paths, args.workers)
+    write_reports(scheme, results, args.output_dir, args.full)
+    for path, (st, calls) in results.items():
+        print(f"✅ {os.path.basename(path)}: ST {st} ({', '.join(f'{l}({c})' for l, c in zip(scheme.loci, calls))})")
+    print(f"📁 Đã ghi {len(results)} file vào {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,334 @@
+"""Plasmid (replicon) typing of all samples against an indexed BLAST database.
+
+Usage:
+    python -m pipeline.plasmidtyping --fasta-dir /path/to/fasta --output-dir plasmidtyping_out
+    python -m pipeline.plasmidtyping --mode panel --threads 16
+
+``run_plasmid_type.sh`` runs ``blastn -query <panel> -subject <sample>.fasta``
+once per sample; with ``-subject`` BLAST builds its lookup structures from
+scratch on every call and ignores ``-num_threads``. Here ``makeblastdb`` is
+run once and all samples are searched in a single multi-threaded ``blastn``:
+
+- ``cohort`` (default): a database over every sample's contigs, queried with
+  the typing panel (the same query/subject roles as the shell script);
+- ``panel``: a database over the typing panel, queried with every sample's
+  contigs; query/subject columns are swapped back afterwards.
+
+Sequences are renamed to short ordinal ids for ``makeblastdb -parse_seqids``
+and mapped back to (sample, contig id) when the hits are split into the
+per-sample ``<sample>_plasmidtyping.txt`` files read by
+``plasmidtyping_addheader.py``, in the shell script's outfmt 6 column order.
+``-dbsize`` is set to the mean assembly length so e-values stay close to
+those of a per-sample search; hits are selected by ``-perc_identity`` as before.
+
+With ``--prefilter`` the contigs and panel entries sharing no k-mer
+(``pipeline.kmers``) are left out of both FASTA files before BLAST.
+
+``read_cohort_hits`` and ``best_replicon_hits`` turn the per-sample reports
+into one typed cohort table (used by ``plasmidtyping_addheader.py``).
+"""
+
+import argparse
+import io
+import os
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from pipeline.kmers import K, KmerIndex, read_fasta, screen_samples
+
+OUTFMT6_COLUMNS = ["qseqid", "sseqid", "pident", "length", "mismatch", "gapopen",
+                   "qstart", "qend", "sstart", "send", "evalue", "bitscore"]
+REPORT_SUFFIX = "_plasmidtyping.txt"
+PERC_IDENTITY = 95
+MODES = ("cohort", "panel")
+HIT_DTYPES = {"qseqid": str, "sseqid": str, "pident": "float64", "length": "int64", "mismatch": "int64",
+              "gapopen": "int64", "qstart": "int64", "qend": "int64", "sstart": "int64", "send": "int64",
+              "evalue": "float64", "bitscore": "float64"}
+# Minimum % of the panel entry covered by a hit to call the replicon
+MIN_REF_COVERAGE = 60.0
+REPLICON_COLUMNS = ["sample", "contig", "replicon", "pident", "coverage", "reference", "start", "end",
+                    "length", "evalue", "bitscore"]
+
+DEFAULT_FASTA_DIR = "/home/kien1211/Downloads/fasta"
+DEFAULT_QUERY = "/home/kien1211/Downloads/acinetobacterplasmidtype_feb2025.fasta"
+
+
+def list_assemblies(fasta_dir):
+    """Return ``{sample: path}`` for the ``*.fasta`` files of ``fasta_dir``."""
+    with os.scandir(fasta_dir) as entries:
+        return dict(sorted((e.name[: -len(".fasta")], e.path) for e in entries
+                           if e.is_file() and e.name.endswith(".fasta")))
+
+
+def write_renamed_fasta(sources, output_path, prefix, keep=None):
+    """Concatenate FASTA ``sources`` renaming records to ``<prefix><n>``.
+
+    Args:
+        sources (dict[str, str]): Label (sample name) -> FASTA path.
+        output_path (str): Combined FASTA to write.
+        prefix (str): Prefix of the ordinal ids.
+        keep (set[tuple[str, str]] | None): Only write these (label, name)
+            records; lengths still count every record.
+
+    Returns:
+        tuple[pd.DataFrame, dict[str, int]]: One row per record (``id``,
+        ``label``, ``name`` = first word of the original header), and the
+        total sequence length per label.
+    """
+    ids, labels, names = [], [], []
+    lengths = {label: 0 for label in sources}
+    with open(output_path, "w") as out:
+        for label, path in sources.items():
+            with open(path) as handle:
+                write = True
+                for line in handle:
+                    if line.startswith(">"):
+                        name = line[1:].split(None, 1)[0] if line[1:].strip() else ""
+                        write = keep is None or (label, name) in keep
+                        if write:
+                            seq_id = f"{prefix}{len(ids)}"
+                            ids.append(seq_id)
+                            labels.append(label)
+                            names.append(name)
+                            out.write(f">{seq_id}\n")
+                    else:
+                        if write:
+                            out.write(line)
+                        lengths[label] += len(line.strip())
+    return pd.DataFrame({"id": ids, "label": labels, "name": names}), lengths
+
+
+def make_blast_db(fasta_path, db_prefix):
+    """Build a nucleotide BLAST database from ``fasta_path``."""
+    subprocess.run(["makeblastdb", "-in", fasta_path, "-dbtype", "nucl", "-parse_seqids", "-out", db_prefix],
+                   check=True, stdout=subprocess.DEVNULL)
+
+
+def run_blastn(query, db, output_path, threads=1, perc_identity=PERC_IDENTITY, max_target_seqs=500, dbsize=None):
+    """Run ``blastn`` with outfmt 6 into ``output_path``."""
+    cmd = ["blastn", "-query", query, "-db", db, "-outfmt", "6", "-out", output_path,
+           "-perc_identity", str(perc_identity), "-num_threads", str(threads),
+           "-max_target_seqs", str(max_target_seqs)]
+    if dbsize:
+        cmd += ["-dbsize", str(int(dbsize))]
+    subprocess.run(cmd, check=True)
+
+
+def read_hits(path):
+    """Read a BLAST outfmt 6 file; coordinates as integers, other fields kept as written by BLAST."""
+    dtype = {c: str for c in OUTFMT6_COLUMNS}
+    dtype.update({c: "int64" for c in ("qstart", "qend", "sstart", "send")})
+    return pd.read_csv(path, sep="\t", header=None, names=OUTFMT6_COLUMNS, dtype=dtype)
+
+
+def read_cohort_hits(paths):
+    """Read many outfmt 6 reports with one typed ``read_csv`` call.
+
+    Args:
+        paths (list[str]): ``<sample>_plasmidtyping.txt`` files.
+
+    Returns:
+        pd.DataFrame: ``sample`` plus the ``OUTFMT6_COLUMNS`` (``HIT_DTYPES``).
+    """
+    chunks, samples, counts = [], [], []
+    for path in paths:
+        with open(path, "rb") as handle:
+            lines = [line for line in handle.read().splitlines() if line.strip()]
+        if lines:
+            chunks.append(b"\n".join(lines))
+            samples.append(os.path.basename(path)[: -len(REPORT_SUFFIX)] if path.endswith(REPORT_SUFFIX)
+                           else os.path.splitext(os.path.basename(path))[0])
+            counts.append(len(lines))
+    if not chunks:
+        return pd.DataFrame({"sample": pd.Series(dtype=str),
+                             **{c: pd.Series(dtype=t) for c, t in HIT_DTYPES.items()}})
+    hits = pd.read_csv(io.BytesIO(b"\n".join(chunks)), sep="\t", header=None, names=OUTFMT6_COLUMNS,
+                       dtype=HIT_DTYPES)
+    hits.insert(0, "sample", np.repeat(samples, counts))
+    return hits
+
+
+def fasta_lengths(path):
+    """Return ``{record name: sequence length}`` of a FASTA file."""
+    return {name: len(seq) for name, seq in read_fasta(path)}
+
+
+def best_replicon_hits(hits, reference_lengths=None, min_coverage=MIN_REF_COVERAGE):
+    """Keep the best hit of every contig region.
+
+    Hits covering less than ``min_coverage`` % of their panel entry are
+    dropped (when ``reference_lengths`` is given). The remaining hits of a
+    contig whose subject intervals overlap form one region; the region is
+    called by the hit with the highest bitscore (then identity, coverage).
+
+    Args:
+        hits (pd.DataFrame): Output of ``read_cohort_hits``.
+        reference_lengths (dict[str, int] | None): Panel entry lengths.
+        min_coverage (float): Minimum % of the reference length.
+
+    Returns:
+        pd.DataFrame: ``REPLICON_COLUMNS``, one row per region.
+    """
+    hits = hits.assign(start=np.minimum(hits["sstart"], hits["send"]),
+                       end=np.maximum(hits["sstart"], hits["send"]))
+    aligned = (hits["qend"] - hits["qstart"]).abs() + 1
+    if reference_lengths is not None:
+        hits = hits.assign(coverage=100 * aligned / hits["qseqid"].map(reference_lengths))
+        hits = hits[hits["coverage"] >= min_coverage]
+    else:
+        hits = hits.assign(coverage=np.nan)
+
+    hits = hits.sort_values(["sample", "sseqid", "start", "end"], kind="stable")
+    keys = [hits["sample"], hits["sseqid"]]
+    previous_end = hits["end"].groupby(keys, sort=False).cummax().groupby(keys, sort=False).shift()
+    region = (previous_end.isna() | (hits["start"] > previous_end)).cumsum()
+    best = (hits.assign(_region=region)
+            .sort_values(["_region", "bitscore", "pident", "coverage"], ascending=[True, False, False, False],
+                         kind="stable")
+            .drop_duplicates("_region"))
+    best = best.rename(columns={"sseqid": "contig", "qseqid": "reference"})
+    best["replicon"] = best["reference"].str.split("_", n=1).str[0]
+    return best[REPLICON_COLUMNS].reset_index(drop=True)
+
+
+def restore_hits(hits, panel_ids, contig_ids, mode):
+    """Map ordinal ids back and return hits in the shell script's orientation.
+
+    The result has ``sample`` plus the ``OUTFMT6_COLUMNS`` with the panel
+    entry as query and the sample contig as subject, ordered by panel entry
+    and decreasing bitscore.
+    """
+    if mode == "panel":
+        # query = contig, subject = panel entry: swap the roles back
+        hits = hits.rename(columns={"qseqid": "sseqid", "sseqid": "qseqid", "qstart": "sstart", "qend": "send",
+                                    "sstart": "qstart", "send": "qend"})
+        # BLAST reports query coordinates ascending; keep that convention for the panel entry
+        minus = hits["qstart"] > hits["qend"]
+        for a, b in (("qstart", "qend"), ("sstart", "send")):
+            hits.loc[minus, [a, b]] = hits.loc[minus, [b, a]].to_numpy()
+    panel = panel_ids.set_index("id")
+    contigs = contig_ids.set_index("id")
+    order = pd.Series(range(len(panel_ids)), index=panel_ids["id"])
+    hits = hits.assign(sample=contigs["label"].reindex(hits["sseqid"]).to_numpy(),
+                       _order=order.reindex(hits["qseqid"]).to_numpy(),
+                       _score=pd.to_numeric(hits["bitscore"]))
+    hits["qseqid"] = panel["name"].reindex(hits["qseqid"]).to_numpy()
+    hits["sseqid"] = contigs["name"].reindex(hits["sseqid"]).to_numpy()
+    hits = hits.sort_values(["_order", "_score"], ascending=[True, False], kind="stable")
+    return hits[["sample"] + OUTFMT6_COLUMNS].reset_index(drop=True)
+
+
+def write_sample_reports(hits, samples, output_dir):
+    """Write ``<sample>_plasmidtyping.txt`` for every sample (empty when it has no hit)."""
+    os.makedirs(output_dir, exist_ok=True)
+    groups = dict(tuple(hits.groupby("sample", sort=False)))
+    paths = []
+    for sample in samples:
+        path = os.path.join(output_dir, f"{sample}{REPORT_SUFFIX}")
+        rows = groups.get(sample)
+        if rows is None:
+            open(path, "w").close()
+        else:
+            rows[OUTFMT6_COLUMNS].to_csv(path, sep="\t", header=False, index=False)
+        paths.append(path)
+    return paths
+
+
+def type_samples(assemblies, query, output_dir, mode="cohort", threads=1, perc_identity=PERC_IDENTITY,
+                 work_dir=None, prefilter=None):
+    """Type every assembly with one indexed BLAST search.
+
+    Args:
+        assemblies (dict[str, str]): Sample -> assembly FASTA.
+        query (str): Typing panel FASTA.
+        output_dir (str): Folder receiving ``<sample>_plasmidtyping.txt``.
+        mode (str): ``"cohort"`` or ``"panel"`` (which side is indexed).
+        threads (int): ``blastn -num_threads``.
+        work_dir (str | None): Folder for the renamed FASTA and the database
+            (a temporary folder by default).
+        prefilter (pipeline.kmers.KmerIndex | None): Only BLAST the contigs
+            and panel entries of its candidate pairs.
+
+    Returns:
+        pd.DataFrame: All hits with a leading ``sample`` column.
+    """
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        panel_fasta = os.path.join(tmp, "panel.fasta")
+        cohort_fasta = os.path.join(tmp, "cohort.fasta")
+        panel_keep = contig_keep = None
+        if prefilter is not None:
+            candidates, _ = screen_samples(prefilter, assemblies)
+            panel_keep = {("panel", name) for name in candidates["entry"]}
+            contig_keep = set(zip(candidates["sample"], candidates["contig"]))
+        panel_ids, _ = write_renamed_fasta({"panel": query}, panel_fasta, "p", panel_keep)
+        contig_ids, lengths = write_renamed_fasta(assemblies, cohort_fasta, "c", contig_keep)
+        if prefilter is not None and (panel_ids.empty or contig_ids.empty):
+            hits = pd.DataFrame(columns=["sample"] + OUTFMT6_COLUMNS)
+            write_sample_reports(hits, list(assemblies), output_dir)
+            return hits
+        mean_length = sum(lengths.values()) / max(len(lengths), 1)
+
+        hits_path = os.path.join(tmp, "hits.tsv")
+        if mode == "cohort":
+            make_blast_db(cohort_fasta, os.path.join(tmp, "cohort"))
+            run_blastn(panel_fasta, os.path.join(tmp, "cohort"), hits_path, threads, perc_identity,
+                       max_target_seqs=max(len(contig_ids), 1), dbsize=mean_length)
+        else:
+            make_blast_db(panel_fasta, os.path.join(tmp, "panel"))
+            run_blastn(cohort_fasta, os.path.join(tmp, "panel"), hits_path, threads, perc_identity,
+                       max_target_seqs=max(len(panel_ids), 1), dbsize=mean_length)
+        hits = restore_hits(read_hits(hits_path), panel_ids, contig_ids, mode)
+
+    write_sample_reports(hits, list(assemblies), output_dir)
+    return hits
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Plasmid typing of all samples with one indexed BLAST search")
+    parser.add_argument("--fasta-dir", default=DEFAULT_FASTA_DIR, help="Folder of <sample>.fasta assemblies")
+    parser.add_argument("--query", default=DEFAULT_QUERY, help="Plasmid typing panel FASTA")
+    parser.add_argument("--output-dir", default="plasmidtyping_out", help="Folder for <sample>_plasmidtyping.txt")
+    parser.add_argument("--mode", choices=MODES, default="cohort",
+                        help="Index the sample contigs (cohort) or the typing panel (panel)")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="blastn -num_threads")
+    parser.add_argument("--perc-identity", type=float, default=PERC_IDENTITY, help="blastn -perc_identity")
+    parser.add_argument("--work-dir", help="Folder for temporary FASTA/database files")
+    parser.add_argument("--prefilter", action="store_true",
+                        help="Only BLAST contigs/panel entries sharing a k-mer (see pipeline.kmers)")
+    parser.add_argument("-k", type=int, default=K, help="k-mer length of --prefilter")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    for path, kind in ((args.query, "Query file"), (args.fasta_dir, "Input directory")):
+        if not os.path.exists(path):
+            print(f"Error: {kind} {path} not found!")
+            return 1
+    assemblies = list_assemblies(args.fasta_dir)
+    if not assemblies:
+        print(f"Error: No .fasta files found in {args.fasta_dir}")
+        return 1
+
+    print(f"Typing {len(assemblies)} samples ({args.mode} database, {args.threads} threads)...")
+    start = time.perf_counter()
+    prefilter = KmerIndex.from_fasta(args.query, args.k) if args.prefilter else None
+    try:
+        hits = type_samples(assemblies, args.query, args.output_dir, args.mode, args.threads,
+                            args.perc_identity, args.work_dir, prefilter)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Error running BLAST: {e}")
+        return 1
+    counts = hits["sample"].value_counts()
+    for sample in assemblies:
+        print(f"  {sample}: {counts.get(sample, 0)} BLAST hits")
+    print(f"Finished in {time.perf_counter() - start:.1f} s, output in {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+"""Convert Platon chromosome/plasmid FASTA files for every sample in parallel.
+
+Usage:
+    python -m pipeline.platon_convert /path/to/platon_out --jobs 8
+
+Platon writes ``<root>/<sample>/<sample>.chromosome.fasta`` and
+``<sample>.plasmid.fasta``. Each one is re-wrapped to
+``<root>/<sample>/<compartment>/<sample>_convert_<compartment>.fasta``, the
+layout ``run_amrfinder_chromosome.sh`` globs for. Each output is written to a
+temporary file and renamed into place once complete, so an existing output
+is never a partial one; outputs newer than their input are skipped unless
+``--force`` is given.
+"""
+
+import argparse
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pipeline.fasta import LINE_LENGTH, wrap_fasta, write_fai
+
+COMPARTMENTS = ("chromosome", "plasmid")
+
+ConvertJob = namedtuple("ConvertJob", ["sample", "compartment", "input_path", "output_path"])
+
+
+def discover_jobs(platon_root, compartments=COMPARTMENTS):
+    """Return one ``ConvertJob`` per sample and compartment found under ``platon_root``."""
+    jobs = []
+    with os.scandir(platon_root) as entries:
+        sample_dirs = sorted((e for e in entries if e.is_dir()), key=lambda e: e.name)
+    for sample_dir in sample_dirs:
+        with os.scandir(sample_dir.path) as entries:
+            names = sorted(e.name for e in entries if e.is_file())
+        for compartment in compartments:
+            suffix = f".{compartment}.fasta"
+            for name in names:
+                if name.endswith(suffix):
+                    output_path = os.path.join(
+                        sample_dir.path, compartment, f"{sample_dir.name}_convert_{compartment}.fasta"
+                    )
+                    jobs.append(ConvertJob(sample_dir.name, compartment,
+                                           os.path.join(sample_dir.path, name), output_path))
+                    break
+    return jobs
+
+
+def is_up_to_date(job):
+    """True if the converted FASTA exists and is newer than its input.
+
+    ``convert_one`` only renames finished outputs into place, so an
+    interrupted conversion leaves no output behind.
+    """
+    try:
+        src = os.stat(job.input_path)
+        dst = os.stat(job.output_path)
+    except FileNotFoundError:
+        return False
+    return dst.st_mtime >= src.st_mtime
+
+
+def convert_one(job, line_length=LINE_LENGTH):
+    """Wrap a single Platon FASTA; returns the job and the number of records."""
+    tmp = f"{job.output_path}.{os.getpid()}.tmp"
+    try:
+        records = wrap_fasta(job.input_path, tmp, line_length=line_length, index=False)
+        write_fai(records, job.output_path + ".fai")
+        os.replace(tmp, job.output_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return job, len(records)
+
+
+def convert_all(jobs, n_jobs=1, line_length=LINE_LENGTH):
+    """Run ``convert_one`` over ``jobs`` with a process pool; returns the number of failures."""
+    failures = 0
+    if n_jobs <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            try:
+                _, n_records = convert_one(job, line_length)
+                print(f"✅ Wrapped: {job.sample} ({job.compartment}, {n_records} contigs) -> {job.output_path}")
+            except Exception as e:
+                print(f"❌ Error processing {job.sample} ({job.compartment}): {e}")
+                failures += 1
+        return failures
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = {executor.submit(convert_one, job, line_length): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                _, n_records = future.result()
+                print(f"✅ Wrapped: {job.sample} ({job.compartment}, {n_records} contigs) -> {job.output_path}")
+            except Exception as e:
+                print(f"❌ Error processing {job.sample} ({job.compartment}): {e}")
+                failures += 1
+    return failures
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Re-wrap Platon chromosome/plasmid FASTA files for all samples")
+    parser.add_argument("platon_root", nargs="?", help="Platon output folder containing one sub-folder per sample")
+    parser.add_argument("--compartment", "-c", nargs="+", choices=COMPARTMENTS, default=list(COMPARTMENTS),
+                        help="Compartments to convert (default: both)")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: all cores)")
+    parser.add_argument("--line-length", type=int, default=LINE_LENGTH, help="Bases per output line")
+    parser.add_argument("--force", action="store_true", help="Convert even if the output is up to date")
+    return parser
+
+
+def main(argv=None, default_root=None, default_compartments=None):
+    parser = build_parser()
+    if default_root:
+        parser.set_defaults(platon_root=default_root)
+    if default_compartments:
+        parser.set_defaults(compartment=list(default_compartments))
+    args = parser.parse_args(argv)
+
+    if not args.platon_root:
+        parser.error("platon_root is required")
+    if not os.path.isdir(args.platon_root):
+        print(f"❌ Input directory does not exist: {args.platon_root}")
+        return 1
+
+    jobs = discover_jobs(args.platon_root, args.compartment)
+    print(f"Found {len(jobs)} FASTA files ({', '.join(args.compartment)}) in {args.platon_root}")
+    if not jobs:
+        return 1
+
+    todo = jobs if args.force else [job for job in jobs if not is_up_to_date(job)]
+    skipped = len(jobs) - len(todo)
+    if skipped:
+        print(f"Skipping {skipped} files that are already up to date")
+
+    failures = convert_all(todo, n_jobs=args.jobs, line_length=args.line_length)
+    print(f"Finished: {len(todo) - failures} converted, {skipped} up to date, {failures} failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
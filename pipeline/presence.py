@@ -0,0 +1,126 @@
+"""Compact sample x gene presence matrix stored as bit-packed NumPy rows.
+
+A dense int64 DataFrame spends 8 bytes per cell; ``PresenceMatrix`` packs
+eight cells per byte (``np.packbits`` layout, most significant bit first),
+so 50,000 isolates x 5,000 genes take ~31 MB instead of 2 GB. It is built
+in one vectorized step from (sample, gene) pairs, answers row/column sums
+without unpacking the whole matrix, and exports to the CSV layouts the
+existing summaries write (``0/1`` integers for ABricate, ``'1'/'0'/'-'``
+strings for AMRFinder).
+"""
+
+import numpy as np
+import pandas as pd
+
+# Number of set bits for every byte value
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.int64)
+
+
+class PresenceMatrix:
+    """Bit-packed boolean matrix with sample (row) and feature (column) labels.
+
+    Args:
+        samples (list[str]): Row labels.
+        features (list[str]): Column labels.
+        bits (np.ndarray): ``uint8`` array of shape ``(len(samples), ceil(len(features) / 8))``.
+        failed (iterable[str]): Samples whose report could not be read; they
+            export as the ``failed`` marker instead of 0/1.
+    """
+
+    def __init__(self, samples, features, bits, failed=()):
+        self.samples = list(samples)
+        self.features = list(features)
+        self.bits = bits
+        self.failed = set(failed) & set(self.samples)
+
+    @classmethod
+    def from_pairs(cls, samples, features, sample_order=None, feature_order=None, failed=()):
+        """Build the matrix from parallel (sample, feature) arrays.
+
+        Args:
+            samples (array-like): Sample of every hit.
+            features (array-like): Feature (gene, class) of every hit.
+            sample_order (list[str] | None): Rows to keep, in order; samples
+                without hits get an empty row. Default: sorted samples seen.
+            feature_order (list[str] | None): Columns in order. Default:
+                sorted features seen.
+            failed (iterable[str]): Samples to mark as unreadable.
+        """
+        samples = np.asarray(samples, dtype=object)
+        features = np.asarray(features, dtype=object)
+        if sample_order is None:
+            sample_order = sorted(set(samples.tolist()))
+        if feature_order is None:
+            feature_order = sorted(set(features.tolist()))
+
+        rows = pd.Index(sample_order).get_indexer(samples)
+        cols = pd.Index(feature_order).get_indexer(features)
+        keep = (rows >= 0) & (cols >= 0)
+        rows, cols = rows[keep], cols[keep]
+
+        bits = np.zeros((len(sample_order), (len(feature_order) + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(bits, (rows, cols >> 3), (0x80 >> (cols & 7)).astype(np.uint8))
+        return cls(sample_order, feature_order, bits, failed)
+
+    @classmethod
+    def from_frame(cls, df, present=1, failed_value=None):
+        """Build from a dense DataFrame indexed by sample (e.g. a summary CSV read back)."""
+        values = df.to_numpy()
+        dense = values == present
+        failed = []
+        if failed_value is not None:
+            failed = df.index[(values == failed_value).any(axis=1)].tolist()
+        return cls(df.index, df.columns, np.packbits(dense, axis=1), failed)
+
+    @property
+    def shape(self):
+        return len(self.samples), len(self.features)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def to_dense(self):
+        """Unpacked boolean array of shape ``(n_samples, n_features)``."""
+        return np.unpackbits(self.bits, axis=1, count=len(self.features)).astype(bool)
+
+    def row_sums(self):
+        """Number of features present per sample, as a Series."""
+        return pd.Series(_POPCOUNT[self.bits].sum(axis=1), index=self.samples)
+
+    def column_sums(self, chunk_rows=4096):
+        """Number of samples carrying each feature, as a Series (unpacks ``chunk_rows`` rows at a time)."""
+        totals = np.zeros(len(self.features), dtype=np.int64)
+        for start in range(0, len(self.samples), chunk_rows):
+            block = self.bits[start:start + chunk_rows]
+            totals += np.unpackbits(block, axis=1, count=len(self.features)).sum(axis=0, dtype=np.int64)
+        return pd.Series(totals, index=self.features)
+
+    def contains(self, sample, feature):
+        """True if ``feature`` is present in ``sample``."""
+        row = self.samples.index(sample)
+        col = self.features.index(feature)
+        return bool(self.bits[row, col >> 3] & (0x80 >> (col & 7)))
+
+    def to_frame(self, present=1, absent=0, failed=None):
+        """Dense DataFrame with the given cell values; failed rows become ``failed`` if given."""
+        dense = self.to_dense()
+        values = np.where(dense, present, absent)
+        if isinstance(present, str):
+            values = values.astype(object)
+        df = pd.DataFrame(values, index=pd.Index(self.samples), columns=pd.Index(self.features))
+        if failed is not None and self.failed:
+            df.loc[[s for s in self.samples if s in self.failed], :] = failed
+        return df
+
+    def save(self, path):
+        """Write the matrix to a compressed ``.npz`` sidecar."""
+        np.savez_compressed(path, bits=self.bits, samples=np.array(self.samples, dtype=str),
+                            features=np.array(self.features, dtype=str),
+                            failed=np.array(sorted(self.failed), dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        """Read a matrix written by ``save``."""
+        with np.load(path) as data:
+            return cls(data["samples"].tolist(), data["features"].tolist(), data["bits"], data["failed"].tolist())
@@ -0,0 +1,168 @@
+"""Skip tool runs whose inputs, tool/database versions and arguments are unchanged.
+
+Every job of ``pipeline.scheduler`` gets a key: the SHA-1 of its tool, the
+output of the tool's version command (for AMRFinderPlus this includes the
+database version, for ABricate the ``--list`` of databases), fingerprints of
+its database paths, the contents of its input files and its arguments
+(thread counts excluded). ``mlst --version`` does not change with the
+PubMLST data, so the mlst job lists the allele and profile files of its
+scheme as databases. After a successful run the key and the provenance
+are written next to each output as ``<output>.meta.json``; a later run with
+the same key and the outputs still present is skipped. Updating one database
+therefore only re-runs the tool that uses it.
+
+File contents are hashed once and remembered by size/mtime in
+``<state_dir>/hashes.json``, so unchanged FASTA files are not re-read.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import time
+
+from pipeline.cache import file_digest
+from pipeline.filters import META_SUFFIX
+
+CACHE_VERSION = 1
+
+THREAD_FLAGS = ("--threads", "-num_threads")
+
+# Arguments printing the version of each executable (and of its database where the tool can tell)
+VERSION_ARGS = {
+    "amrfinder": [["--version"], ["--database_version"]],
+    "abricate": [["--version"], ["--list"]],
+    "blastn": [["-version"]],
+    "mlst": [["--version"]],
+    "platon": [["--version"]],
+    "genomad": [["--version"]],
+    "quast.py": [["--version"]],
+}
+
+
+def command_key(cmd, inputs=()):
+    """``cmd`` without its thread count, with input paths replaced by placeholders."""
+    if cmd is None:
+        return None
+    positions = {path: f"<input{i}>" for i, path in enumerate(inputs)}
+    return [("*" if i and cmd[i - 1] in THREAD_FLAGS else positions.get(arg, arg)) for i, arg in enumerate(cmd)]
+
+
+def meta_path(output_path):
+    return output_path + META_SUFFIX
+
+
+class RunCache:
+    """Run keys and provenance records for scheduler jobs.
+
+    Args:
+        state_dir (str): Folder holding ``hashes.json``.
+        enabled (bool): False makes every job look out of date (``--no-resume``).
+    """
+
+    def __init__(self, state_dir, enabled=True):
+        self.enabled = enabled
+        self.hash_path = os.path.join(state_dir, "hashes.json")
+        self._versions = {}
+        self._databases = {}
+        try:
+            with open(self.hash_path) as handle:
+                self._hashes = json.load(handle)
+        except (OSError, ValueError):
+            self._hashes = {}
+
+    def content_hash(self, path):
+        """SHA-1 of ``path``, reused while its size and mtime do not change."""
+        abspath = os.path.abspath(path)
+        st = os.stat(abspath)
+        state = [st.st_size, st.st_mtime_ns]
+        known = self._hashes.get(abspath)
+        if known and known[0] == state:
+            return known[1]
+        digest = file_digest(abspath)
+        self._hashes[abspath] = [state, digest]
+        return digest
+
+    def database_fingerprint(self, value):
+        """Content hash of a database file, a listing digest of a folder, or ``value`` itself (a name)."""
+        if value not in self._databases:
+            if os.path.isfile(value):
+                fingerprint = self.content_hash(value)
+            elif os.path.isdir(value):
+                listing = []
+                for folder, _, names in os.walk(value):
+                    for name in sorted(names):
+                        st = os.stat(os.path.join(folder, name))
+                        listing.append((os.path.relpath(os.path.join(folder, name), value), st.st_size,
+                                        st.st_mtime_ns))
+                fingerprint = hashlib.sha1(repr(sorted(listing)).encode()).hexdigest()
+            else:
+                fingerprint = value
+            self._databases[value] = fingerprint
+        return self._databases[value]
+
+    def tool_version(self, executable):
+        """Combined output of the version commands of ``executable`` (memoized for the run)."""
+        if executable not in self._versions:
+            outputs = []
+            for args in VERSION_ARGS.get(os.path.basename(executable), [["--version"]]):
+                try:
+                    result = subprocess.run([executable] + args, capture_output=True, text=True, timeout=120)
+                    outputs.append((result.stdout + result.stderr).strip())
+                except (OSError, subprocess.SubprocessError) as e:
+                    outputs.append(f"unavailable: {type(e).__name__}")
+            self._versions[executable] = "\n".join(outputs)
+        return self._versions[executable]
+
+    def describe(self, job):
+        """Return ``(key, provenance)`` of ``job``; its input files must exist."""
+        version = self.tool_version(job.cmd[0]) if job.cmd else f"{job.tool} (in-process)"
+        inputs = {path: self.content_hash(path) for path in job.inputs or ()}
+        databases = {db: self.database_fingerprint(db) for db in job.databases or ()}
+        args = command_key(job.cmd, list(inputs)) if job.cmd else [job.tool]
+        key = hashlib.sha1(json.dumps([CACHE_VERSION, job.tool, version, sorted(databases.values()),
+                                       list(inputs.values()), args]).encode()).hexdigest()
+        provenance = {"key": key, "job": job.name, "tool": job.tool, "version": version,
+                      "command": job.cmd, "inputs": inputs, "databases": databases}
+        return key, provenance
+
+    def is_current(self, job, key):
+        """True if every output of ``job`` exists and was produced by a run with ``key``."""
+        if not self.enabled:
+            return False
+        for output in job.outputs:
+            try:
+                with open(meta_path(output)) as handle:
+                    if json.load(handle).get("key") != key or not os.path.exists(output):
+                        return False
+            except (OSError, ValueError):
+                return False
+        return True
+
+    def forget(self, job):
+        """Remove the provenance of ``job``'s outputs before it runs again."""
+        for output in job.outputs:
+            try:
+                os.remove(meta_path(output))
+            except FileNotFoundError:
+                pass
+
+    def record(self, job, provenance, seconds):
+        """Write ``<output>.meta.json`` for every output of a successful run."""
+        for output in job.outputs:
+            if not os.path.isfile(output):
+                continue
+            meta = dict(provenance, output=os.path.basename(output), output_sha1=self.content_hash(output),
+                        seconds=round(seconds, 3), finished=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        host=socket.gethostname())
+            with open(meta_path(output), "w") as handle:
+                json.dump(meta, handle, indent=1)
+
+    def save(self):
+        """Persist the remembered file hashes."""
+        os.makedirs(os.path.dirname(self.hash_path), exist_ok=True)
+        tmp = f"{self.hash_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as handle:
+            json.dump(self._hashes, handle)
+        os.replace(tmp, self.hash_path)
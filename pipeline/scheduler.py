@@ -0,0 +1,446 @@
+"""Run the external tools for every sample as a dependency graph on a fixed core budget.
+
+Usage:
+    python -m pipeline.scheduler --fasta-dir /path/to/fasta --output-root /path/to/out --cores 16
+    python -m pipeline.scheduler --tools abricate mlst --samples ERR5770797 ERR5770798
+    python -m pipeline.scheduler --stub --output-root /tmp/run   # fake tools, see pipeline.stubs
+
+Replaces the serial loops of ``platon.sh``, ``run_amrfinder*.sh``,
+``abricate.sh``, ``mlst.sh``, ``run_plasmid_type.sh``, ``genomad_run.sh`` and
+``quast.sh``. Per sample the graph is::
+
+    platon -> convert_chromosome -> amrfinder_chromosome
+           -> convert_plasmid    -> amrfinder_plasmid
+    amrfinder, abricate, mlst, plasmidtyping, genomad, quast   (independent)
+
+With ``--split-amrfinder`` AMRFinder runs once per sample: the
+``amrfinder_chromosome`` / ``amrfinder_plasmid`` jobs split the
+whole-genome report by the Platon contigs (``pipeline.amrfinder_split``)
+and depend on ``platon`` and ``amrfinder`` instead of the conversions,
+which are left out unless named in ``--tools``.
+
+Every job asks for a number of threads (``TOOL_THREADS``, capped at
+``--cores``); ready jobs are started, longest dependency chain first, as
+long as their threads fit in the free cores, so small jobs fill the gaps
+left by large ones. Outputs keep the folder layout of the shell scripts
+under ``--output-root``. A job whose inputs, tool/database versions and
+arguments are unchanged since its outputs were written is skipped (see
+``pipeline.runcache``; ``--no-resume`` runs everything again), so an
+interrupted run resumes where it stopped. Per-job logs go to
+``<output-root>/.scheduler/logs``.
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from pipeline.amrfinder_split import split_from_platon
+from pipeline.mlst_caller import scheme_files
+from pipeline.platon_convert import ConvertJob, convert_one
+from pipeline.runcache import RunCache
+
+# Tools in graph order; upstream tools are added automatically when a downstream one is requested
+TOOLS = ["platon", "convert_chromosome", "convert_plasmid", "amrfinder_chromosome", "amrfinder_plasmid",
+         "amrfinder", "abricate", "mlst", "plasmidtyping", "genomad", "quast"]
+REQUIRES = {
+    "convert_chromosome": ["platon"],
+    "convert_plasmid": ["platon"],
+    "amrfinder_chromosome": ["convert_chromosome"],
+    "amrfinder_plasmid": ["convert_plasmid"],
+}
+# Dependencies with --split-amrfinder (compartment reports cut from the whole-genome run)
+SPLIT_REQUIRES = {**REQUIRES, "amrfinder_chromosome": ["platon", "amrfinder"],
+                  "amrfinder_plasmid": ["platon", "amrfinder"]}
+
+# Threads requested per job (before capping at the core budget)
+TOOL_THREADS = {
+    "platon": 8, "convert_chromosome": 1, "convert_plasmid": 1, "amrfinder_chromosome": 4,
+    "amrfinder_plasmid": 2, "amrfinder": 4, "abricate": 2, "mlst": 1, "plasmidtyping": 2,
+    "genomad": 8, "quast": 4,
+}
+
+# Output folder of each tool under the output root (as in the shell scripts)
+OUTPUT_DIRS = {
+    "platon": "platon_out", "amrfinder_chromosome": "chromosome_amrfinder",
+    "amrfinder_plasmid": "plasmid_amrfinder", "amrfinder": "amrfinder_out", "abricate": "abricate_out",
+    "mlst": "mlst", "plasmidtyping": "plasmidtyping_out", "genomad": "genomad_out", "quast": "quast_out",
+}
+
+# Defaults taken from the shell drivers
+DEFAULTS = {
+    "fasta_dir": "/home/kien1211/Downloads/fasta",
+    "output_root": "/home/kien1211/Downloads",
+    "platon_db": "/home/kien1211/Downloads/db",
+    "genomad_db": "/home/kien1211/Downloads/genomad_db",
+    "plasmid_query": "/home/kien1211/Downloads/acinetobacterplasmidtype_feb2025.fasta",
+    "quast_ref": "/home/kien1211/Downloads/Ab_ATCC19606/Ab_ATCC19606.fasta.gz",
+    "quast_gff": "/home/kien1211/Downloads/Ab_ATCC19606/genomic.gff",
+    "organism": "Acinetobacter baumannii",
+    "mlst_scheme": "abaumannii_2",
+    "abricate_db": "vfdb",
+}
+
+# One tool invocation: ``cmd`` is run with subprocess, or ``func()`` is called when ``cmd`` is None.
+# ``outputs`` mark the job as done; ``stdout`` receives the command output (only ``columns``, like cut -f).
+# ``inputs`` (hashed by content) and ``databases`` (paths or names) are part of the run-cache key.
+Job = namedtuple("Job", ["name", "tool", "sample", "cmd", "threads", "deps", "outputs", "stdout", "columns", "func",
+                         "inputs", "databases"],
+                 defaults=(None, None, None, (), ()))
+
+
+def list_samples(fasta_dir, samples=None):
+    """Return ``{sample: fasta path}`` for the ``*.fasta`` files of ``fasta_dir``."""
+    with os.scandir(fasta_dir) as entries:
+        found = {e.name[: -len(".fasta")]: e.path for e in entries if e.is_file() and e.name.endswith(".fasta")}
+    if samples:
+        missing = sorted(set(samples) - set(found))
+        if missing:
+            raise ValueError(f"no FASTA for sample(s): {', '.join(missing)}")
+        found = {s: found[s] for s in samples}
+    return dict(sorted(found.items()))
+
+
+def expand_tools(tools, requires=REQUIRES):
+    """Add the upstream tools ``tools`` depend on, keeping graph order."""
+    wanted = set(tools)
+    stack = list(tools)
+    while stack:
+        for dep in requires.get(stack.pop(), []):
+            if dep not in wanted:
+                wanted.add(dep)
+                stack.append(dep)
+    return [t for t in TOOLS if t in wanted]
+
+
+def job_threads(tool, cores, overrides=None):
+    """Threads for one ``tool`` job: its preferred count, capped at ``cores``."""
+    preferred = (overrides or {}).get(tool, TOOL_THREADS[tool])
+    return max(1, min(int(preferred), cores))
+
+
+def sample_jobs(sample, fasta, config, tools, cores, overrides=None):
+    """Build the jobs of one sample for the selected ``tools``."""
+    root = config["output_root"]
+
+    def out(tool, *parts):
+        return os.path.join(root, OUTPUT_DIRS[tool], *parts)
+
+    def make(tool, cmd, outputs, deps=(), **kwargs):
+        return Job(f"{tool}:{sample}", tool, sample, cmd, job_threads(tool, cores, overrides),
+                   [f"{d}:{sample}" for d in deps], outputs, **kwargs)
+
+    platon_dir = out("platon", sample)
+    converted = {c: os.path.join(platon_dir, c, f"{sample}_convert_{c}.fasta") for c in ("chromosome", "plasmid")}
+    jobs = []
+    for tool in tools:
+        threads = job_threads(tool, cores, overrides)
+        if tool == "platon":
+            jobs.append(make(tool, ["platon", "--db", config["platon_db"], "--output", platon_dir, "--verbose",
+                                    "--threads", str(threads), fasta],
+                             [os.path.join(platon_dir, f"{sample}.{c}.fasta") for c in ("chromosome", "plasmid")],
+                             inputs=[fasta], databases=[config["platon_db"]]))
+        elif tool.startswith("convert_"):
+            compartment = tool[len("convert_"):]
+            convert = ConvertJob(sample, compartment, os.path.join(platon_dir, f"{sample}.{compartment}.fasta"),
+                                 converted[compartment])
+            jobs.append(make(tool, None, [converted[compartment]], deps=["platon"],
+                             func=lambda job=convert: convert_one(job), inputs=[convert.input_path]))
+        elif tool in ("amrfinder_chromosome", "amrfinder_plasmid"):
+            compartment = tool[len("amrfinder_"):]
+            output = out(tool, f"{sample}_convert_{compartment}_amrfinder.txt")
+            if config.get("split_amrfinder"):
+                report = out("amrfinder", f"{sample}_amrfinder.txt")
+                platon = {c: os.path.join(platon_dir, f"{sample}.{c}.fasta") for c in ("chromosome", "plasmid")}
+                jobs.append(make(tool, None, [output], deps=["platon", "amrfinder"],
+                                 func=lambda r=report, p=platon, o={compartment: output}: split_from_platon(r, p, o),
+                                 inputs=[report, *platon.values()])._replace(threads=1))
+                continue
+            jobs.append(make(tool, ["amrfinder", "-n", converted[compartment], "-O", config["organism"], "--plus",
+                                    "--threads", str(threads), "-o", output],
+                             [output], deps=[f"convert_{compartment}"], inputs=[converted[compartment]]))
+        elif tool == "amrfinder":
+            output = out(tool, f"{sample}_amrfinder.txt")
+            jobs.append(make(tool, ["amrfinder", "-n", fasta, "-O", config["organism"], "--plus",
+                                    "--threads", str(threads), "-o", output], [output], inputs=[fasta]))
+        elif tool == "abricate":
+            output = out(tool, f"{sample}_vfdb.csv")
+            jobs.append(make(tool, ["abricate", "--db", config["abricate_db"], "--csv", "--threads", str(threads),
+                                    fasta], [output], stdout=output, inputs=[fasta],
+                             databases=[config["abricate_db"]]))
+        elif tool == "mlst":
+            output = out(tool, f"{sample}_mlst.tsv")
+            jobs.append(make(tool, ["mlst", "--scheme", config["mlst_scheme"], "--threads", str(threads), fasta],
+                             [output], stdout=output, columns=(0, 2), inputs=[fasta],
+                             databases=scheme_files(config["mlst_scheme"]) or [config["mlst_scheme"]]))
+        elif tool == "plasmidtyping":
+            output = out(tool, f"{sample}_plasmidtyping.txt")
+            jobs.append(make(tool, ["blastn", "-query", config["plasmid_query"], "-subject", fasta, "-outfmt", "6",
+                                    "-out", output, "-perc_identity", "95", "-num_threads", str(threads)], [output],
+                             inputs=[fasta, config["plasmid_query"]]))
+        elif tool == "genomad":
+            sample_dir = out(tool, sample)
+            jobs.append(make(tool, ["genomad", "end-to-end", "--cleanup", "--splits", "8",
+                                    "--enable-score-calibration", "--threads", str(threads), fasta, sample_dir,
+                                    config["genomad_db"]],
+                             [os.path.join(sample_dir, f"{sample}_summary", f"{sample}_plasmid_summary.tsv")],
+                             inputs=[fasta], databases=[config["genomad_db"]]))
+        elif tool == "quast":
+            quast_dir = out(tool, f"{sample}_quast")
+            jobs.append(make(tool, ["quast.py", "-r", config["quast_ref"], "-g", config["quast_gff"],
+                                    "--threads", str(threads), "-o", quast_dir, fasta],
+                             [os.path.join(quast_dir, "report.tsv")],
+                             inputs=[fasta, config["quast_ref"], config["quast_gff"]]))
+    return jobs
+
+
+def default_tools(split_amrfinder=False):
+    """Every tool, without the Platon conversions when the AMRFinder reports are split."""
+    return [t for t in TOOLS if not (split_amrfinder and t.startswith("convert_"))]
+
+
+def build_jobs(samples, config, tools=None, cores=None, overrides=None):
+    """Build the whole graph for ``samples`` (``{sample: fasta}``; ``tools`` defaults to ``default_tools``)."""
+    cores = cores or os.cpu_count() or 1
+    tools = tools or default_tools(config.get("split_amrfinder"))
+    tools = expand_tools(tools, SPLIT_REQUIRES if config.get("split_amrfinder") else REQUIRES)
+    jobs = []
+    for sample, fasta in samples.items():
+        jobs.extend(sample_jobs(sample, fasta, config, tools, cores, overrides))
+    return jobs
+
+
+def chain_lengths(jobs):
+    """Length of the longest chain of dependents below each job (its scheduling priority)."""
+    dependents = {job.name: [] for job in jobs}
+    for job in jobs:
+        for dep in job.deps:
+            dependents.setdefault(dep, []).append(job.name)
+    lengths = {}
+
+    def length(name):
+        if name not in lengths:
+            lengths[name] = 1 + max((length(d) for d in dependents.get(name, [])), default=0)
+        return lengths[name]
+
+    return {job.name: length(job.name) for job in jobs}
+
+
+def execute(job, log_dir):
+    """Run one job; returns its exit code (0 on success)."""
+    for path in job.outputs:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    log_path = os.path.join(log_dir, job.name.replace(":", "_") + ".log")
+    with open(log_path, "w") as log:
+        if job.cmd is None:
+            try:
+                job.func()
+            except Exception as e:
+                log.write(f"{type(e).__name__}: {e}\n")
+                return 1
+            return 0
+        log.write(" ".join(job.cmd) + "\n")
+        log.flush()
+        if job.stdout is None:
+            return subprocess.run(job.cmd, stdout=log, stderr=subprocess.STDOUT).returncode
+        # Capture to a temporary file so an interrupted run never leaves a partial output
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(job.stdout), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as handle:
+                code = subprocess.run(job.cmd, stdout=handle, stderr=log).returncode
+            if code == 0:
+                if job.columns is not None:
+                    cut_columns(tmp, job.columns)
+                os.replace(tmp, job.stdout)
+            return code
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def cut_columns(path, columns):
+    """Keep only the tab-separated ``columns`` (0-based) of ``path``, in place."""
+    with open(path) as handle:
+        lines = [line.rstrip("\n").split("\t") for line in handle]
+    with open(path, "w") as handle:
+        for fields in lines:
+            handle.write("\t".join(fields[i] for i in columns if i < len(fields)) + "\n")
+
+
+def run_jobs(jobs, cores, state_dir, resume=True, dry_run=False):
+    """Run ``jobs`` respecting dependencies and the ``cores`` budget.
+
+    Returns:
+        dict[str, str]: Final status of every job: ``done``, ``cached``
+        (unchanged since its last run), ``failed`` or ``skipped`` (a
+        dependency failed).
+    """
+    log_dir = os.path.join(state_dir, "logs")
+    run_cache = RunCache(state_dir, enabled=resume)
+    priority = chain_lengths(jobs)
+    pending = {job.name: job for job in jobs}
+    status = {}
+
+    if dry_run:
+        for job in jobs:
+            # Jobs below one that must run cannot be checked before it has produced its outputs
+            if all(status.get(d) == "cached" for d in job.deps) and all(map(os.path.exists, job.inputs)):
+                key, _ = run_cache.describe(job)
+                status[job.name] = "cached" if run_cache.is_current(job, key) else "to run"
+            else:
+                status[job.name] = "to run"
+        todo = [j for j in jobs if status[j.name] == "to run"]
+        print(f"{len(jobs)} jobs, {len(jobs) - len(todo)} unchanged, {len(todo)} to run on {cores} cores")
+        for job in sorted(todo, key=lambda j: (-priority[j.name], j.name)):
+            print(f"  [{job.threads}t] {job.name}: {' '.join(job.cmd) if job.cmd else 'in-process'}")
+        run_cache.save()
+        return status
+
+    print(f"{len(jobs)} jobs on {cores} cores")
+    os.makedirs(log_dir, exist_ok=True)
+    free = cores
+    running = {}
+    try:
+        with ThreadPoolExecutor(max_workers=cores) as pool:
+            while pending or running:
+                changed = True
+                while changed:
+                    changed = False
+                    for job in list(pending.values()):
+                        if any(status.get(d) in ("failed", "skipped") for d in job.deps):
+                            status[job.name] = "skipped"
+                            del pending[job.name]
+                            print(f"⏭️  {job.name}: skipped (dependency failed)")
+
+                    ready = [j for j in pending.values() if all(status.get(d) in ("done", "cached") for d in j.deps)]
+                    ready.sort(key=lambda j: (-priority[j.name], -j.threads, j.name))
+                    for job in ready:
+                        try:
+                            key, provenance = run_cache.describe(job)
+                        except OSError as e:
+                            status[job.name] = "failed"
+                            del pending[job.name]
+                            print(f"❌ {job.name}: {e}")
+                            changed = True
+                            continue
+                        if run_cache.is_current(job, key):
+                            status[job.name] = "cached"
+                            del pending[job.name]
+                            print(f"♻️  {job.name}: unchanged, skipped")
+                            changed = True
+                        elif job.threads <= free:
+                            free -= job.threads
+                            del pending[job.name]
+                            run_cache.forget(job)
+                            running[pool.submit(execute, job, log_dir)] = (job, provenance, time.perf_counter())
+                            print(f"▶️  {job.name} ({job.threads} threads, {free} cores free)")
+
+                if not running:
+                    for name in pending:
+                        status[name] = "skipped"
+                        print(f"⏭️  {name}: skipped (unknown dependency)")
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job, provenance, start = running.pop(future)
+                    free += job.threads
+                    try:
+                        code = future.result()
+                    except Exception as e:
+                        print(f"❌ {job.name}: {e}")
+                        code = 1
+                    seconds = time.perf_counter() - start
+                    if code == 0:
+                        status[job.name] = "done"
+                        run_cache.record(job, provenance, seconds)
+                        print(f"✅ {job.name} ({seconds:.1f} s)")
+                    else:
+                        status[job.name] = "failed"
+                        print(f"❌ {job.name} failed (exit {code}), see {log_dir}")
+    finally:
+        run_cache.save()
+    return status
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run the external tools for all samples as a parallel job graph")
+    parser.add_argument("--fasta-dir", default=DEFAULTS["fasta_dir"], help="Folder of <sample>.fasta assemblies")
+    parser.add_argument("--output-root", default=DEFAULTS["output_root"],
+                        help="Folder receiving platon_out/, amrfinder_out/, abricate_out/ ...")
+    parser.add_argument("--samples", nargs="+", help="Only these samples (default: every FASTA)")
+    parser.add_argument("--tools", nargs="+", choices=TOOLS,
+                        help="Tools to run (default: all; upstream tools are added automatically)")
+    parser.add_argument("--cores", type=int, default=os.cpu_count() or 1, help="Core budget (default: all cores)")
+    parser.add_argument("--threads", nargs="+", default=[], metavar="TOOL=N",
+                        help="Override threads per job, e.g. platon=4 genomad=16")
+    for key in ("platon_db", "genomad_db", "plasmid_query", "quast_ref", "quast_gff", "organism",
+                "mlst_scheme", "abricate_db"):
+        parser.add_argument("--" + key.replace("_", "-"), default=DEFAULTS[key])
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Run every job even if its inputs, versions and arguments are unchanged")
+    parser.add_argument("--quast-flagged-only", action="store_true",
+                        help="Run QUAST only for samples flagged by pipeline.assembly_qc")
+    parser.add_argument("--split-amrfinder", action="store_true",
+                        help="Cut the chromosome/plasmid AMRFinder reports from the whole-genome run")
+    parser.add_argument("--dry-run", action="store_true", help="Print the jobs that would run and exit")
+    parser.add_argument("--stub", action="store_true", help="Use the fake tools of pipeline.stubs (for testing)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    overrides = {}
+    for item in args.threads:
+        tool, _, value = item.partition("=")
+        if tool not in TOOL_THREADS or not value.isdigit():
+            print(f"❌ Invalid --threads value: {item}")
+            return 1
+        overrides[tool] = int(value)
+
+    if args.stub:
+        from pipeline.stubs import install_stubs
+        stub_dir = install_stubs(os.path.join(args.output_root, ".scheduler", "stubs"))
+        os.environ["PATH"] = stub_dir + os.pathsep + os.environ.get("PATH", "")
+        print(f"Using stub tools from {stub_dir}")
+
+    if not os.path.isdir(args.fasta_dir):
+        print(f"❌ Input directory does not exist: {args.fasta_dir}")
+        return 1
+    try:
+        samples = list_samples(args.fasta_dir, args.samples)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if not samples:
+        print(f"❌ No .fasta files found in {args.fasta_dir}")
+        return 1
+
+    config = {key: getattr(args, key) for key in DEFAULTS}
+    config["split_amrfinder"] = args.split_amrfinder
+    tools = args.tools or default_tools(args.split_amrfinder)
+    jobs = build_jobs(samples, config, tools, args.cores, overrides)
+    if args.quast_flagged_only and "quast" in tools:
+        from pipeline.assembly_qc import qc_table
+        qc = qc_table(samples, workers=args.cores)
+        os.makedirs(os.path.join(args.output_root, OUTPUT_DIRS["quast"]), exist_ok=True)
+        qc.to_csv(os.path.join(args.output_root, OUTPUT_DIRS["quast"], "assembly_qc.csv"), index=False)
+        flagged = set(qc.loc[qc["flags"] != "", "sample"])
+        print(f"Assembly QC: QUAST for {len(flagged)}/{len(samples)} flagged samples")
+        jobs = [job for job in jobs if job.tool != "quast" or job.sample in flagged]
+    status = run_jobs(jobs, args.cores, os.path.join(args.output_root, ".scheduler"),
+                      resume=not args.no_resume, dry_run=args.dry_run)
+    if args.dry_run:
+        return 0
+
+    counts = {s: sum(1 for v in status.values() if v == s) for s in ("done", "cached", "failed", "skipped")}
+    print(f"Finished: {counts['done']} run, {counts['cached']} unchanged, "
+          f"{counts['failed']} failed, {counts['skipped']} skipped")
+    return 1 if counts["failed"] or counts["skipped"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
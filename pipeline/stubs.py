@@ -0,0 +1,163 @@
+"""Fake versions of the external tools, for testing ``pipeline.scheduler`` without the real binaries.
+
+Usage:
+    python -m pipeline.scheduler --stub --fasta-dir ERR_fastas --output-root /tmp/run
+
+``install_stubs(folder)`` writes one executable per tool (``platon``,
+``amrfinder``, ``abricate``, ``mlst``, ``blastn``, ``genomad``,
+``quast.py``) that accepts the arguments the scheduler passes and writes
+small outputs in the real tools' formats (headers only, or a trivial split
+for Platon) and answer the version commands used by ``pipeline.runcache``.
+These environment variables control them:
+
+- ``PIPELINE_STUB_SLEEP``: seconds each call sleeps (default 0), to watch the packing.
+- ``PIPELINE_STUB_FAIL``: comma-separated tool names that exit with status 1, to test resume.
+- ``PIPELINE_STUB_DB_VERSION``: e.g. ``amrfinder=2,abricate=3``, the database
+  versions reported by ``--database_version``/``--list``, to test that a
+  database update re-runs only that tool.
+"""
+
+import os
+import stat
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXECUTABLES = {
+    "platon": "platon", "amrfinder": "amrfinder", "abricate": "abricate", "mlst": "mlst",
+    "blastn": "blastn", "genomad": "genomad", "quast.py": "quast",
+}
+
+AMRFINDER_HEADER = [
+    "Protein id", "Contig id", "Start", "Stop", "Strand", "Element symbol", "Element name", "Scope", "Type",
+    "Subtype", "Class", "Subclass", "Method", "Target length", "Reference sequence length",
+    "% Coverage of reference", "% Identity to reference", "Alignment length", "Closest reference accession",
+    "Closest reference name", "HMM accession", "HMM description",
+]
+ABRICATE_HEADER = ("#FILE,SEQUENCE,START,END,STRAND,GENE,COVERAGE,COVERAGE_MAP,GAPS,%COVERAGE,"
+                   "%IDENTITY,DATABASE,ACCESSION,PRODUCT,RESISTANCE")
+GENOMAD_PLASMID_HEADER = ["seq_name", "length", "topology", "n_genes", "genetic_code", "plasmid_score",
+                          "fdr", "n_hallmarks", "marker_enrichment", "conjugation_genes", "amr_genes"]
+GENOMAD_VIRUS_HEADER = ["seq_name", "length", "topology", "coordinates", "n_genes", "genetic_code", "virus_score",
+                        "fdr", "n_hallmarks", "marker_enrichment", "taxonomy"]
+
+# Contigs shorter than this go to the plasmid FASTA of the fake Platon
+PLASMID_MAX_LENGTH = 20000
+
+
+def install_stubs(folder):
+    """Write the stub executables into ``folder`` and return it."""
+    os.makedirs(folder, exist_ok=True)
+    for executable, tool in EXECUTABLES.items():
+        path = os.path.join(folder, executable)
+        with open(path, "w") as handle:
+            handle.write(f"#!{sys.executable}\n"
+                         "import sys\n"
+                         f"sys.path.insert(0, {ROOT!r})\n"
+                         "from pipeline.stubs import main\n"
+                         f"sys.exit(main({tool!r}, sys.argv[1:]))\n")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return folder
+
+
+def option(argv, *names, default=None):
+    """Value following the first of ``names`` in ``argv``."""
+    for name in names:
+        if name in argv:
+            return argv[argv.index(name) + 1]
+    return default
+
+
+def read_records(path):
+    """Return ``[(header, sequence)]`` of a FASTA file."""
+    records = []
+    with open(path) as handle:
+        for line in handle:
+            line = line.rstrip("\n")
+            if line.startswith(">"):
+                records.append([line, []])
+            elif records:
+                records[-1][1].append(line)
+    return [(header, "".join(parts)) for header, parts in records]
+
+
+def write_tsv(path, header, rows=()):
+    with open(path, "w") as handle:
+        handle.write("\t".join(header) + "\n")
+        for row in rows:
+            handle.write("\t".join(map(str, row)) + "\n")
+
+
+def fake_platon(argv):
+    fasta, output = argv[-1], option(argv, "--output")
+    sample = os.path.splitext(os.path.basename(fasta))[0]
+    os.makedirs(output, exist_ok=True)
+    records = read_records(fasta)
+    for compartment, keep in (("chromosome", lambda s: len(s) >= PLASMID_MAX_LENGTH),
+                              ("plasmid", lambda s: len(s) < PLASMID_MAX_LENGTH)):
+        with open(os.path.join(output, f"{sample}.{compartment}.fasta"), "w") as handle:
+            for header, seq in records:
+                if keep(seq):
+                    handle.write(f"{header}\n{seq}\n")
+    write_tsv(os.path.join(output, f"{sample}.tsv"), ["ID", "Length"],
+              [(h[1:].split()[0], len(s)) for h, s in records if len(s) < PLASMID_MAX_LENGTH])
+
+
+def fake_amrfinder(argv):
+    write_tsv(option(argv, "-o"), AMRFINDER_HEADER)
+
+
+def fake_abricate(argv):
+    print(ABRICATE_HEADER)
+
+
+def fake_mlst(argv):
+    print("\t".join([argv[-1], option(argv, "--scheme", default="-"), "-"]))
+
+
+def fake_blastn(argv):
+    open(option(argv, "-out"), "w").close()
+
+
+def fake_genomad(argv):
+    fasta, output = argv[-3], argv[-2]
+    sample = os.path.splitext(os.path.basename(fasta))[0]
+    summary = os.path.join(output, f"{sample}_summary")
+    os.makedirs(summary, exist_ok=True)
+    write_tsv(os.path.join(summary, f"{sample}_plasmid_summary.tsv"), GENOMAD_PLASMID_HEADER)
+    write_tsv(os.path.join(summary, f"{sample}_virus_summary.tsv"), GENOMAD_VIRUS_HEADER)
+
+
+def fake_quast(argv):
+    fasta, output = argv[-1], option(argv, "-o")
+    os.makedirs(output, exist_ok=True)
+    lengths = sorted((len(s) for _, s in read_records(fasta)), reverse=True)
+    write_tsv(os.path.join(output, "report.tsv"), ["Assembly", os.path.splitext(os.path.basename(fasta))[0]],
+              [("# contigs", len(lengths)), ("Total length", sum(lengths))])
+
+
+FAKES = {
+    "platon": fake_platon, "amrfinder": fake_amrfinder, "abricate": fake_abricate, "mlst": fake_mlst,
+    "blastn": fake_blastn, "genomad": fake_genomad, "quast": fake_quast,
+}
+
+
+VERSION_FLAGS = ("--version", "-version", "--database_version", "--list")
+
+
+def main(tool, argv):
+    if argv and argv[0] in VERSION_FLAGS:
+        versions = dict(item.split("=", 1) for item in os.environ.get("PIPELINE_STUB_DB_VERSION", "").split(",")
+                        if "=" in item)
+        if argv[0] in ("--database_version", "--list"):
+            print(f"{tool} stub database {versions.get(tool, '1')}")
+        else:
+            print(f"{tool} stub 1.0")
+        return 0
+    time.sleep(float(os.environ.get("PIPELINE_STUB_SLEEP", 0)))
+    if tool in os.environ.get("PIPELINE_STUB_FAIL", "").split(","):
+        print(f"stub {tool}: failing on request", file=sys.stderr)
+        return 1
+    FAKES[tool](argv)
+    return 0
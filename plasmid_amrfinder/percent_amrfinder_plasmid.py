@@ -1,21 +1,41 @@
 import os
-import glob
+import sys
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 from collections import Counter
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pipeline.amrfinder import read_amrfinder
+from pipeline.cache import ReportCache
+from pipeline.filters import add_filter_arguments, filter_from_args, save_metadata
+from pipeline.manifest import Manifest
+from pipeline.reports import load_reports, sample_from_path
+
 # Thư mục chứa các thư mục SRR con, trong đó có file amrfinder.txt
 base_dir = "C:/Users/hoahoa/Documents/DSA_study/Thesis_project/plasmid_amrfinder"
 
-# FIX: Sử dụng pattern đúng để tìm file trong tất cả thư mục con
-# Thay vì: pattern = os.path.join(base_dir, "_amrfinder.txt")
-# Sử dụng: pattern với ** để tìm đệ quy trong tất cả thư mục con
-pattern = os.path.join(base_dir, "**", "*_amrfinder.txt")
+# Số luồng đọc file song song (None = tự động)
+WORKERS = None
+
+parser = argparse.ArgumentParser(description="Tỉ lệ file có mỗi gene kháng kháng sinh (AMRFinderPlus)")
+parser.add_argument("--no-cache", action="store_true", help="Đọc lại mọi file, không dùng cache Parquet")
+add_filter_arguments(parser)
+args = parser.parse_args()
+
+# Bộ lọc identity/coverage/Method áp dụng ngay khi đọc từng file
+hit_filter = filter_from_args(args)
+
+# Cache Parquet cho các file đã đọc; chạy với --no-cache để đọc lại toàn bộ
+report_cache = ReportCache(enabled=not args.no_cache)
 
-print(f"Đang tìm kiếm với pattern: {pattern}")
+# Quét base_dir một lần bằng os.scandir (các thư mục con được quét song song);
+# danh sách file được cache, lần chạy sau chỉ quét lại các thư mục đã thay đổi
+manifest = Manifest(base_dir, enabled=not args.no_cache).refresh()
+print(f"Đã quét {base_dir}: {len(manifest.dirs)} thư mục ({manifest.listed} thư mục được quét lại)")
 
-# Tìm tất cả file amrfinder.txt với tìm kiếm đệ quy
-amrfinder_files = glob.glob(pattern, recursive=True)
+# Tất cả file *_amrfinder.txt trong base_dir và các thư mục con
+amrfinder_files = manifest.files(suffix="_amrfinder.txt")
 num_files = len(amrfinder_files)
 print(f"Đã tìm thấy {num_files} file amrfinder.txt")
 
@@ -30,63 +50,42 @@ if num_files > 0:
 if num_files == 0:
     print("⚠️ Không tìm thấy file nào. Đang kiểm tra thư mục...")
     
-    # Debug: Kiểm tra cấu trúc thư mục
-    if os.path.exists(base_dir):
+    # Debug: Kiểm tra cấu trúc thư mục (dùng kết quả quét ở trên, không quét lại)
+    if os.path.isdir(base_dir):
         print(f"✅ Thư mục base tồn tại: {base_dir}")
-        subdirs = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
+        subdirs = manifest.dirs.get(".", {}).get("subdirs", [])
         print(f"Các thư mục con: {subdirs[:5]}..." if len(subdirs) > 5 else f"Các thư mục con: {subdirs}")
         
-        # Thử tìm với pattern khác
-        alternative_patterns = [
-            os.path.join(base_dir, "**", "amrfinder.txt"),
-            os.path.join(base_dir, "**", "*amrfinder*"),
-            os.path.join(base_dir, "*", "*_amrfinder.txt"),
-            os.path.join(base_dir, "*", "amrfinder.txt")
-        ]
-        
-        print("\nThử các pattern khác:")
-        for alt_pattern in alternative_patterns:
-            alt_files = glob.glob(alt_pattern, recursive=True)
-            print(f"  Pattern: {alt_pattern}")
-            print(f"  Tìm được: {len(alt_files)} file")
-            if len(alt_files) > 0:
-                for f in alt_files[:3]:
-                    print(f"    - {f}")
-                if len(alt_files) > 3:
-                    print(f"    ... và {len(alt_files) - 3} file khác")
+        # Các file có tên gần giống
+        similar = sorted(os.path.join(base_dir, rel) for rel, _, _ in manifest.iter_files()
+                         if "amrfinder" in os.path.basename(rel))
+        print(f"\nCác file có 'amrfinder' trong tên: {len(similar)} file")
+        for f in similar[:3]:
+            print(f"    - {f}")
+        if len(similar) > 3:
+            print(f"    ... và {len(similar) - 3} file khác")
     else:
         print(f"❌ Thư mục base không tồn tại: {base_dir}")
     
     exit()
 
-gene_file_counter = Counter()
-success_files = 0
-failed_files = 0
+print(f"\nĐang xử lý {num_files} file (song song, {WORKERS or 'tự động'} luồng)...")
+print(f"Bộ lọc: {hit_filter.describe()}")
 
-print(f"\nĐang xử lý {num_files} file...")
+# Đọc tất cả file song song, chỉ lấy cột 'Element symbol'
+reports, diagnostics = load_reports(amrfinder_files, workers=WORKERS,
+                                    sample_fn=lambda p: sample_from_path(p, "_amrfinder.txt"), cache=report_cache,
+                                    reader=read_amrfinder, usecols=["Element symbol"], hit_filter=hit_filter)
 
-for i, filepath in enumerate(amrfinder_files, 1):
-    try:
-        # Hiển thị tiến trình
-        if i % 10 == 0 or i == num_files:
-            print(f"  Đang xử lý file {i}/{num_files}...")
-            
-        df = pd.read_csv(filepath, sep="\t", comment='#')
-        
-        # Kiểm tra cột tồn tại
-        if "Element symbol" in df.columns:
-            genes_in_file = set(df["Element symbol"].dropna())
-            gene_file_counter.update(genes_in_file)  # Đếm 1 lần cho gene xuất hiện trong file này
-            success_files += 1
-        else:
-            print(f"⚠️ Không tìm thấy cột 'Element symbol' trong {filepath}")
-            # Hiển thị các cột có sẵn
-            print(f"   Các cột có sẵn: {list(df.columns)}")
-            failed_files += 1
-            
-    except Exception as e:
-        print(f"❌ Lỗi đọc file {filepath}: {e}")
-        failed_files += 1
+for row in diagnostics[diagnostics["status"] == "error"].itertuples():
+    print(f"❌ Lỗi đọc file {row.path}: {row.error}")
+
+success_files = int((diagnostics["status"] != "error").sum())
+failed_files = len(diagnostics) - success_files
+
+# Đếm 1 lần cho gene xuất hiện trong mỗi file
+genes = reports.dropna(subset=["Element symbol"]).drop_duplicates(["sample", "Element symbol"])
+gene_file_counter = Counter(genes["Element symbol"])
 
 print(f"✅ Đọc thành công {success_files} file, lỗi {failed_files} file")
 
@@ -110,6 +109,7 @@ for i, (_, row) in enumerate(df_plot.head(10).iterrows(), 1):
 # Lưu dữ liệu ra file CSV
 csv_output = "amr_gene_file_frequency_plasmid.csv"
 df_plot.to_csv(csv_output, index=False)
+save_metadata(csv_output, hit_filter, files=success_files)
 print(f"✅ Đã lưu bảng thống kê (tỉ lệ file có gene): {csv_output}")
 
 # Vẽ biểu đồ
@@ -128,4 +128,4 @@ plt.savefig(plot_output, dpi=300, bbox_inches='tight')
 plt.close()
 print(f"✅ Đã lưu biểu đồ: {plot_output}")
 
-print(f"\n🎉 Hoàn thành! Đã phân tích {success_files} file và tìm được {len(gene_file_percentages)} gene duy nhất.")
\ No newline at end of file
+print(f"\n🎉 Hoàn thành! Đã phân tích {success_files} file và tìm được {len(gene_file_percentages)} gene duy nhất.")
\ No newline at end of file
@@ -1,36 +1,86 @@
 import pandas as pd
+import argparse
 import os
-import glob
+import sys
 
-def process_plasmid_files(input_folder='plasmidtyping_out', output_folder='processed_results'):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pipeline.cache import ReportCache
+from pipeline.manifest import Manifest
+from pipeline.plasmidtyping import (MIN_REF_COVERAGE, OUTFMT6_COLUMNS, REPORT_SUFFIX, best_replicon_hits,
+                                    fasta_lengths, read_cohort_hits)
+
+# Define headers for the plasmid typing results
+headers = OUTFMT6_COLUMNS
+
+# Typing panel used by run_plasmid_type.sh (for the reference lengths)
+PANEL_FASTA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'acinetobacterplasmidtype_feb2025.fasta')
+COHORT_OUTPUT = 'plasmid_replicons.csv'
+
+def read_blast_rows(file_path):
+    """
+    Read one BLAST outfmt 6 file into a DataFrame with the plasmid typing headers
+    
+    Args:
+        file_path (str): Path to a *_plasmidtyping.txt file
+    """
+    if os.path.getsize(file_path) == 0:
+        return pd.DataFrame(columns=headers)
+    return pd.read_csv(file_path, sep='\t', header=None, names=headers, dtype=str)
+
+def build_replicon_table(txt_files, output_path, panel_fasta=PANEL_FASTA, min_coverage=MIN_REF_COVERAGE):
     """
-    Process all .txt files in the input folder and add headers
+    Write one typed cohort table with the best replicon hit of every contig region
     
     Args:
-        input_folder (str): Path to folder containing .txt files
+        txt_files (list): *_plasmidtyping.txt files
+        output_path (str): Cohort CSV (sample, contig, replicon, pident, coverage, ...)
+        panel_fasta (str): Typing panel FASTA; without it coverage is not computed or filtered
+        min_coverage (float): Minimum % of the reference length covered by a hit
+    """
+    reference_lengths = None
+    if panel_fasta and os.path.exists(panel_fasta):
+        reference_lengths = fasta_lengths(panel_fasta)
+    else:
+        print(f"  Warning: panel {panel_fasta} not found, reference coverage not computed")
+    hits = read_cohort_hits(txt_files)
+    table = best_replicon_hits(hits, reference_lengths, min_coverage)
+    table.to_csv(output_path, index=False)
+    print(f"Cohort table: {len(table)} replicon calls from {len(hits)} hits "
+          f"in {table['sample'].nunique()} samples -> {output_path}")
+    return table
+
+def process_plasmid_files(input_folder='plasmidtyping_out', output_folder='processed_results', use_cache=True,
+                          per_sample=True, panel_fasta=PANEL_FASTA, min_coverage=MIN_REF_COVERAGE):
+    """
+    Process all *_plasmidtyping.txt reports in the input folder and add headers
+    
+    Args:
+        input_folder (str): Path to folder containing the *_plasmidtyping.txt reports
         output_folder (str): Path to folder where processed CSV files will be saved
+        use_cache (bool): Reuse parsed files from the Parquet cache when unchanged
+        per_sample (bool): Also write one CSV per sample (the cohort table is always written)
+        panel_fasta (str): Typing panel FASTA for the reference coverage
+        min_coverage (float): Minimum % reference coverage in the cohort table
     """
     
-    # Define headers for the plasmid typing results
-    headers = ['qseqid', 'sseqid', 'pident', 'length', 'mismatch', 
-               'gapopen', 'qstart', 'qend', 'sstart', 'send', 'evalue', 'bitscore']
+    report_cache = ReportCache(enabled=use_cache)
     
     # Create output folder if it doesn't exist
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     
-    # Get all .txt files in the input folder
-    txt_files = glob.glob(os.path.join(input_folder, '*.txt'))
+    # Get the BLAST reports from the manifest (other .txt files in the folder are not reports)
+    txt_files = Manifest(input_folder, enabled=use_cache).refresh().files(tool="plasmidtyping")
     
     if not txt_files:
-        print(f"No .txt files found in {input_folder}")
+        print(f"No *{REPORT_SUFFIX} files found in {input_folder}")
         return
     
-    print(f"Found {len(txt_files)} .txt files to process")
+    print(f"Found {len(txt_files)} *{REPORT_SUFFIX} files to process")
     
     processed_files = []
     
-    for file_path in txt_files:
+    for file_path in (txt_files if per_sample else []):
         try:
             # Get filename without extension for output naming
             filename = os.path.basename(file_path)
@@ -38,18 +88,14 @@ def process_plasmid_files(input_folder='plasmidtyping_out', output_folder='proce
             
             print(f"Processing: {filename}")
             
-            # Read the file
-            with open(file_path, 'r') as f:
-                rows = [line.strip().split() for line in f if line.strip()]
+            # Read the file (or reuse the cached parse)
+            df, _ = report_cache.load(file_path, read_blast_rows)
             
             # Skip empty files
-            if not rows:
+            if df.empty:
                 print(f"  Warning: {filename} is empty, skipping...")
                 continue
             
-            # Create DataFrame with headers
-            df = pd.DataFrame(rows, columns=headers)
-            
             # Display basic info about the file
             print(f"  Rows: {len(df)}, Columns: {len(df.columns)}")
             
@@ -64,10 +110,22 @@ def process_plasmid_files(input_folder='plasmidtyping_out', output_folder='proce
             print(f"  Error processing {filename}: {str(e)}")
     
     print(f"\nProcessing complete! {len(processed_files)} files processed successfully.")
+    
+    build_replicon_table(txt_files, os.path.join(output_folder, COHORT_OUTPUT), panel_fasta, min_coverage)
     return processed_files
 # Main execution
 if __name__ == "__main__":
     # Option 1: Process all files in a folder
+    parser = argparse.ArgumentParser(description="Add headers to plasmid typing results and build the cohort table")
+    parser.add_argument('--no-cache', action='store_true', help="Re-parse every file")
+    parser.add_argument('--cohort-only', action='store_true', help="Only write the cohort table")
+    parser.add_argument('--panel', default=PANEL_FASTA, help="Typing panel FASTA (reference lengths)")
+    parser.add_argument('--min-coverage', type=float, default=MIN_REF_COVERAGE,
+                        help="Minimum %% of the reference covered by a hit")
+    args = parser.parse_args()
+    
     print("=== Processing all files in plasmidtyping_out folder ===")
-    processed_files = process_plasmid_files('plasmidtyping_out', 'processed_results')
+    processed_files = process_plasmid_files('plasmidtyping_out', 'processed_results',
+                                            use_cache=not args.no_cache, per_sample=not args.cohort_only,
+                                            panel_fasta=args.panel, min_coverage=args.min_coverage)
     
\ No newline at end of file
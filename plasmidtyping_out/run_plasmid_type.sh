@@ -1,5 +1,8 @@
 #!/bin/bash
 
+# Per-sample -subject search. For one indexed BLAST search over all samples use:
+#   python -m pipeline.plasmidtyping --fasta-dir "$INPUT_DIR" --query "$QUERY_FILE" --output-dir "$OUTPUT_DIR"
+
 # Directory contain input and output
 INPUT_DIR="/home/kien1211/Downloads/fasta"
 OUTPUT_DIR="/home/kien1211/Downloads/plasmidtyping_out"
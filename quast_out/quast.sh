@@ -11,8 +11,16 @@ OUTPUT_DIR="/home/kien1211/Downloads/quast_out"
 
 mkdir -p "$OUTPUT_DIR"
 
+# Optional: only the FASTA files listed in $1, one path per line
+# (e.g. from: python -m pipeline.assembly_qc --flagged-list flagged.txt)
+if [[ -n "$1" ]]; then
+    mapfile -t FASTA_FILES < "$1"
+else
+    FASTA_FILES=("$INPUT_DIR"/*.fasta)
+fi
+
 #for loop run all fasta file
-for fastafile in "$INPUT_DIR"/*.fasta; do
+for fastafile in "${FASTA_FILES[@]}"; do
     #Check if files exist
     if [[ -f "$fastafile" ]]; then
         #Make sample_id from input